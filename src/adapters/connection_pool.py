@@ -0,0 +1,115 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+import logging
+import threading
+from typing import Dict
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.pool
+import psycopg2.extensions
+
+from utils.config import config
+
+__all__ = ('ConnectionPool', 'get_pool')
+
+logger = logging.getLogger(__name__)
+
+POOLS = dict()
+POOLS_LOCK = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of Postgres connections.
+
+    Up to min_size idle connections are kept open, a checkout blocks while max_size connections are in use.
+    A connection idle for longer than health_check_interval seconds is checked with SELECT 1
+    and replaced when broken.
+    """
+
+    def __init__(self, min_size: int, max_size: int, health_check_interval: int, **connect_kwargs):
+        self.pool = psycopg2.pool.ThreadedConnectionPool(min_size, max_size, connect_timeout=5, **connect_kwargs)
+        self.semaphore = threading.BoundedSemaphore(max_size)
+        self.health_check_interval = health_check_interval
+        self.last_used = dict()
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, autocommit: bool = True):
+        self.semaphore.acquire()
+        try:
+            conn = self.pool.getconn()
+            idle = time.time() - self.last_used.get(id(conn), 0)
+            if conn.closed or (idle > self.health_check_interval and not self.is_healthy(conn)):
+                logger.warning('Replacing broken pooled connection')
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            conn.autocommit = autocommit
+            return conn
+        except Exception:
+            self.semaphore.release()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        try:
+            self.pool.putconn(conn, close=close or bool(conn.closed))
+            # Connections above min_size are closed by the pool when they are returned
+            if conn.closed:
+                self.last_used.pop(id(conn), None)
+            else:
+                self.last_used[id(conn)] = time.time()
+        finally:
+            self.semaphore.release()
+
+    @contextmanager
+    def connection(self, autocommit: bool = True):
+        conn = self.getconn(autocommit)
+        broken = False
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def close(self):
+        self.pool.closeall()
+
+
+def get_pool(user: str, password: str, host: str, port: str, database: str) -> ConnectionPool:
+    # One pool per database and process, connections are never shared with forked workers
+    key = (os.getpid(), user, password, host, str(port), database)
+    with POOLS_LOCK:
+        pool = POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(config.DB_POOL_MIN, config.DB_POOL_MAX, config.DB_POOL_HEALTH_CHECK,
+                                  user=user, password=password, host=host, port=port, database=database)
+            POOLS[key] = pool
+        return pool
@@ -14,15 +14,16 @@
 
 import os
 import logging
-from typing import Tuple, List
+from typing import Tuple, List, Dict
 import pandas as pd
 from datetime import date
 from psycopg2 import sql
 
 __all__ = ('CSVFileHelper',)
 
+from utils.types import FetcherType
 from utils.adapter.abstract_adapter import AbstractAdapter
-from adapters.postgresql import PostgresqlHelper
+from adapters.postgresql import execute_reference_query
 
 logger = logging.getLogger(__name__)
 
@@ -100,43 +101,47 @@ colnames = {
     "diagnostics": [
         "table_name", "source", "validation_success",
         "error", "last_run_start", "last_run_stop",
-        "first_timestamp", "last_timestamp"
+        "first_timestamp", "last_timestamp", "unchanged"
     ]
 }
 
 
 class CSVFileHelper(AbstractAdapter):
     def __init__(self, csv_path: str):
+        super().__init__()
         self.csv_path = csv_path
         self.csv_file_name = None
-        self.temp_df = None
-        self.postgresql_reader = None
+        self.data_type = None
+        self.rows = None
         self.adm_division_cache = dict()
 
-    def upsert_temp_df(self, csv_file_name: str, data_type: str, data: dict):
+    @staticmethod
+    def row_key(data_type: str, data: Dict) -> Tuple:
+        if data_type == 'weather':
+            gid = data.get('gid')
+            return data.get('date'), tuple(gid) if isinstance(gid, list) else gid
+
+        key = (data.get('date'), data.get('countrycode'), data.get('adm_area_1'), data.get('adm_area_2'),
+               data.get('adm_area_3'))
+        if data_type == 'epidemiology_england_msoa':
+            key = key + (data.get('msoa'),)
+        return key
+
+    def upsert_rows(self, csv_file_name: str, data_type: str, data: List[Dict]):
+        # Rows of the current file are kept by their key until flush, an existing row is updated in place
         if self.csv_file_name != csv_file_name:
             self.flush()
             self.csv_file_name = csv_file_name
-            self.temp_df = pd.DataFrame(columns=colnames.get(data_type))
-
-        # check if row exists
-        row = self.temp_df[
-            (self.temp_df.date == data.get('date')) & \
-            (self.temp_df.countrycode == data.get('countrycode')) & \
-            (self.temp_df.adm_area_1 == data.get('adm_area_1')) & \
-            (self.temp_df.adm_area_2 == data.get('adm_area_2')) & \
-            (self.temp_df.adm_area_3 == data.get('adm_area_3'))
-            ]
-        if data_type == 'epidemiology_england_msoa':
-            row = row[(self.temp_df.msoa == data.get('msoa'))]
-        row = row.index.tolist()
+            self.data_type = data_type
+            self.rows = dict()
 
-        if row:
-            series = self.temp_df.iloc[row[0]]
-            for key, value in data.items():
-                series[key] = value
-        else:
-            self.temp_df = self.temp_df.append(data, ignore_index=True)
+        for row in data:
+            key = self.row_key(data_type, row)
+            existing = self.rows.get(key)
+            if existing is None:
+                self.rows[key] = row
+            else:
+                existing.update(row)
 
     def format_data(self, data):
         if isinstance(data.get('date'), pd.Timestamp):
@@ -149,15 +154,14 @@ class CSVFileHelper(AbstractAdapter):
 
     def get_adm_division(self, countrycode: str, adm_area_1: str = None, adm_area_2: str = None,
                          adm_area_3: str = None) -> Tuple:
-
-        if not self.postgresql_reader:
-            self.postgresql_reader = PostgresqlHelper(user='covid19', password='covid19', host='covid19db.org',
-                                                      port='5432', database_name='covid19')
+        resolver = self.adm_division_resolver()
+        if resolver is not None:
+            return resolver.get_adm_division(countrycode, adm_area_1, adm_area_2, adm_area_3)
 
         key = (countrycode, adm_area_1, adm_area_2, adm_area_3)
         if key in self.adm_division_cache:
             result = self.adm_division_cache.get(key)
-            result['country'], result['adm_area_1'], result['adm_area_2'], result['adm_area_3'], [result['gid']]
+            return result['country'], result['adm_area_1'], result['adm_area_2'], result['adm_area_3'], [result['gid']]
 
         sql_query = sql.SQL("""
             SELECT country, adm_area_1, adm_area_2, adm_area_3, gid from administrative_division
@@ -169,7 +173,7 @@ class CSVFileHelper(AbstractAdapter):
                 AND regexp_replace(COALESCE(adm_area_3, ''), '[^\w%%]+','','g')
                     ILIKE regexp_replace(%s, '[^\w%%]+','','g') """)
 
-        results = self.postgresql_reader.execute(sql_query, (countrycode, adm_area_1 or '', adm_area_2 or '', adm_area_3 or ''))
+        results = execute_reference_query(sql_query, (countrycode, adm_area_1 or '', adm_area_2 or '', adm_area_3 or ''))
         if not results:
             raise Exception(
                 f'Unable to find adm division for: {countrycode}, {adm_area_1}, {adm_area_2}, {adm_area_3}')
@@ -184,9 +188,20 @@ class CSVFileHelper(AbstractAdapter):
         self.check_if_gid_exists(kwargs)
         csv_file_name = f'{table_name}_{kwargs.get("source")}.csv'
         kwargs = self.format_data(kwargs)
-        self.upsert_temp_df(csv_file_name, table_name, kwargs)
+        self.upsert_rows(csv_file_name, table_name, [kwargs])
         logger.debug("Updating {} table with data: {}".format(table_name, list(kwargs.values())))
 
+    def upsert_batch_data(self, fetcher_type: FetcherType, table_name: str, records: List[Dict]):
+        sources = dict()
+        for record in records:
+            self.check_if_gid_exists(record)
+            sources.setdefault(record.get("source"), []).append(self.format_data(dict(record)))
+
+        for source, data in sources.items():
+            csv_file_name = f'{table_name}_{source}.csv'
+            self.upsert_rows(csv_file_name, table_name, data)
+            logger.debug(f"Updating {table_name} table with {len(data)} rows")
+
     def upsert_government_response_data(self, table_name: str = 'government_response', **kwargs):
         self.upsert_table_data(table_name, **kwargs)
 
@@ -204,9 +219,13 @@ class CSVFileHelper(AbstractAdapter):
         raise NotImplementedError("To be implemented")
 
     def flush(self):
-        if self.csv_file_name and self.temp_df is not None:
+        if self.csv_file_name and self.rows is not None:
+            columns = colnames.get(self.data_type, [])
+            df = pd.DataFrame(list(self.rows.values()))
+            df = df.reindex(columns=columns + [column for column in df.columns if column not in columns])
             csv_file_path = os.path.join(self.csv_path, self.csv_file_name)
-            self.temp_df.to_csv(csv_file_path, index=False, header=True)
+            df.to_csv(csv_file_path, index=False, header=True)
             logger.debug(f"Saving to CSV {csv_file_path}")
         self.csv_file_name = None
-        self.temp_df = None
+        self.data_type = None
+        self.rows = None
@@ -23,7 +23,7 @@ logger = logging.getLogger(__name__)
 
 class ExampleHelper(AbstractAdapter):
     def __init__(self):
-        pass
+        super().__init__()
 
     def get_adm_division(self, countrycode: str, adm_area_1: str = None, adm_area_2: str = None,
                          adm_area_3: str = None):
@@ -0,0 +1,125 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import logging
+from typing import Dict, List
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from adapters.csvfile import CSVFileHelper, colnames
+
+__all__ = ('ParquetFileHelper',)
+
+logger = logging.getLogger(__name__)
+
+PARQUET_COMPRESSION = 'zstd'
+PARTITION_FILE = 'part-0.parquet'
+
+STRING_COLUMNS = {'source', 'country', 'countrycode', 'adm_area_1', 'adm_area_2', 'adm_area_3', 'msoa', 'msoa_code',
+                  'm1_wildcard'}
+COLUMN_TYPES = {
+    'date': pa.date32(),
+    'gid': pa.list_(pa.string()),
+    **{column: pa.string() for column in STRING_COLUMNS}
+}
+
+
+def to_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class ParquetFileHelper(CSVFileHelper):
+    """
+    Writes every table as a Parquet dataset partitioned by source and month.
+
+    Partitions are Hive style directories, <table>/source=<source>/month=<yyyy-mm>/part-0.parquet,
+    rows of a run are merged into the partitions they belong to and each partition file is replaced atomically.
+    """
+
+    def __init__(self, parquet_path: str):
+        super().__init__(csv_path=parquet_path)
+        self.parquet_path = parquet_path
+
+    def format_data(self, data: Dict) -> Dict:
+        data['date'] = to_date(data.get('date'))
+        gid = data.get('gid')
+        data['gid'] = [str(value) for value in gid] if isinstance(gid, (list, tuple)) else [gid] if gid else None
+        for column in STRING_COLUMNS:
+            value = data.get(column)
+            if value is not None and not isinstance(value, str):
+                data[column] = str(value)
+        return data
+
+    @staticmethod
+    def table_schema(table_name: str, rows: List[Dict]) -> pa.Schema:
+        # Columns of the table come first, measures of known tables are stored as doubles
+        known_columns = colnames.get(table_name, [])
+        columns = [column for column in known_columns if column != 'source']
+        for row in rows:
+            columns.extend(column for column in row if column not in columns and column != 'source')
+
+        fields = []
+        for column in columns:
+            if column in COLUMN_TYPES:
+                data_type = COLUMN_TYPES[column]
+            elif column in known_columns:
+                data_type = pa.float64()
+            else:
+                data_type = pa.array([row.get(column) for row in rows], from_pandas=True).type
+                if pa.types.is_null(data_type):
+                    data_type = pa.string()
+            fields.append(pa.field(column, data_type))
+        return pa.schema(fields)
+
+    def write_partition(self, table_name: str, source: str, month: str, rows: Dict):
+        partition_path = os.path.join(self.parquet_path, table_name, f'source={source}', f'month={month}')
+        file_path = os.path.join(partition_path, PARTITION_FILE)
+        os.makedirs(partition_path, exist_ok=True)
+
+        if os.path.exists(file_path):
+            # Rows of earlier runs are kept unless they were sent again
+            existing = dict()
+            for row in pq.read_table(file_path).to_pylist():
+                row['source'] = source
+                existing[self.row_key(table_name, row)] = row
+            existing.update(rows)
+            rows = existing
+
+        rows = sorted(rows.values(), key=lambda row: row['date'])
+        schema = self.table_schema(table_name, rows)
+        table = pa.Table.from_pylist([{column: row.get(column) for column in schema.names} for row in rows],
+                                     schema=schema)
+
+        tmp_path = file_path + '.tmp'
+        pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION)
+        os.replace(tmp_path, file_path)
+        logger.debug(f"Saving {len(rows)} rows to Parquet {file_path}")
+
+    def flush(self):
+        if self.csv_file_name and self.rows:
+            partitions = dict()
+            for key, row in self.rows.items():
+                partitions.setdefault((row['source'], row['date'].strftime('%Y-%m')), dict())[key] = row
+
+            for (source, month), rows in partitions.items():
+                self.write_partition(self.data_type, source, month, rows)
+        self.csv_file_name = None
+        self.data_type = None
+        self.rows = None
@@ -12,20 +12,103 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import re
+import csv
 import time
 import json
 import datetime
 import logging
-from typing import Tuple, List
+from collections import Counter
+from typing import Tuple, List, Dict, Callable, Iterable
 import psycopg2.extras
 from psycopg2 import sql
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
+from utils.config import config
+from utils.types import FetcherType
 from utils.adapter.abstract_adapter import AbstractAdapter
+from utils.adapter.row_delta import RowDelta
+from utils.adm_division import adm_area_input, normalize_adm_area, like_pattern
+from adapters.connection_pool import get_pool
 
 MAX_ATTEMPT_FAIL = 10
-
-__all__ = ('PostgresqlHelper',)
+BATCH_PAGE_SIZE = 1000
+# Regions resolved by a single administrative_division query
+ADM_DIVISION_PAGE_SIZE = 1000
+# Batches with at least that many rows are streamed with COPY into a staging table
+COPY_MIN_ROWS = 1000
+COPY_NULL = '\\N'
+# Upserts of data tables return whether every written row was inserted, and what source_stats needs of it
+INSERTED_RETURNING = "(xmax = 0) AS inserted"
+STATS_RETURNING = INSERTED_RETURNING + ", source, country, date"
+# Rows returned by an upsert are aggregated on the server, grouped by source and country
+MERGE_QUERY = """WITH merged AS ({merge_query})
+                 SELECT source, country, min(date), max(date),
+                        count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+                 FROM merged GROUP BY source, country"""
+# Same rows without source_stats, one row of counts
+COUNT_QUERY = """WITH merged AS ({merge_query})
+                 SELECT NULL, NULL, NULL, NULL, count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+                 FROM merged"""
+# Fetcher types whose data is written into staging tables when input data is validated, types without a validator
+# are published from them unchanged
+STAGED_TYPES = [FetcherType.EPIDEMIOLOGY, FetcherType.MOBILITY, FetcherType.GOVERNMENT_RESPONSE, FetcherType.WEATHER]
+# Staging table shared by all sources, read by covid19_compare_tables
+SHARED_STAGING_TABLE = 'staging_epidemiology'
+
+GOVERNMENT_RESPONSE_DATA_KEYS = [
+    'c1_school_closing', 'c1_flag',
+    'c2_workplace_closing', 'c2_flag',
+    'c3_cancel_public_events', 'c3_flag',
+    'c4_restrictions_on_gatherings', 'c4_flag',
+    'c5_close_public_transport', 'c5_flag',
+    'c6_stay_at_home_requirements', 'c6_flag',
+    'c7_restrictions_on_internal_movement', 'c7_flag',
+    'c8_international_travel_controls',
+    'e1_income_support', 'e1_flag',
+    'e2_debtcontract_relief',
+    'e3_fiscal_measures',
+    'e4_international_support',
+    'h1_public_information_campaigns', 'h1_flag',
+    'h2_testing_policy',
+    'h3_contact_tracing',
+    'h4_emergency_investment_in_healthcare',
+    'h5_investment_in_vaccines',
+    'm1_wildcard',
+    'stringency_index',
+    'stringency_indexfordisplay',
+    'stringency_legacy_index',
+    'stringency_legacy_indexfordisplay',
+    'government_response_index',
+    'government_response_index_for_display',
+    'containment_health_index',
+    'containment_health_index_for_display',
+    'economic_support_index',
+    'economic_support_index_for_display',
+    'actions'
+]
+
+EPIDEMIOLOGY_DATA_KEYS = ['gid', 'tested', 'confirmed', 'quarantined', 'hospitalised', 'hospitalised_icu', 'dead',
+                          'recovered']
+
+EPIDEMIOLOGY_MSOA_DATA_KEYS = ['msoa', 'msoa_code', 'confirmed', 'dead', 'population']
+
+MOBILITY_DATA_KEYS = ['gid', 'transit_stations', 'residential', 'workplace', 'parks', 'retail_recreation',
+                      'grocery_pharmacy']
+
+WEATHER_COMPOSITE_KEY = ['date', 'countrycode', 'gid']
+
+DATA_KEYS = {
+    FetcherType.EPIDEMIOLOGY: EPIDEMIOLOGY_DATA_KEYS,
+    FetcherType.EPIDEMIOLOGY_MSOA: EPIDEMIOLOGY_MSOA_DATA_KEYS,
+    FetcherType.MOBILITY: MOBILITY_DATA_KEYS,
+    FetcherType.GOVERNMENT_RESPONSE: GOVERNMENT_RESPONSE_DATA_KEYS
+}
+
+# Public covid19db.org database, used to look up administrative divisions
+REFERENCE_DATABASE = dict(user='covid19', password='covid19', host='covid19db.org', port='5432', database='covid19')
+
+__all__ = ('PostgresqlHelper', 'execute_reference_query')
 
 logger = logging.getLogger(__name__)
 
@@ -35,32 +118,85 @@ def default(o):
         return o.isoformat()
 
 
+def copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (list, tuple)):
+        items = ('NULL' if item is None else
+                 '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value)
+        return '{' + ','.join(items) + '}'
+    if isinstance(value, dict):
+        return json.dumps(value, default=default)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def execute_reference_query(query: sql.Composable, data: Tuple = None, attempt: int = MAX_ATTEMPT_FAIL) -> List:
+    try:
+        with get_pool(**REFERENCE_DATABASE).connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(query, data)
+                return cur.fetchall()
+    except psycopg2.OperationalError as error:
+        if attempt > 0:
+            logger.error(f"Got error: {error}, query: {query}, data {data}, retrying")
+            time.sleep(1)
+            return execute_reference_query(query, data, attempt - 1)
+        raise error
+
+
+def copy_buffer(rows: List[Tuple]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(value) for value in row])
+    buffer.seek(0)
+    return buffer
+
+
 class PostgresqlHelper(AbstractAdapter):
     def __init__(self, user: str, password: str, host: str, port: str, database_name: str):
+        super().__init__()
         self.user = user
         self.password = password
         self.host = host
         self.port = port
         self.database_name = database_name
 
+        # Writes are committed in batches of commit_size rows or every commit_interval seconds,
+        # each statement is committed on its own when both are disabled
+        self.commit_size = config.DB_COMMIT_SIZE
+        self.commit_interval = config.DB_COMMIT_INTERVAL
+        self.transaction_mode = bool(self.commit_size or self.commit_interval)
+        self.pending_operations = []
+        self.pending_rows = 0
+        self.transaction_start = time.time()
+
+        self.statements = dict()
+        self.prepared_statements = set()
+        self.row_counts = Counter()
+        self.source_stats = dict()
+        self.source_stats_table = None
+        self.diagnostics_unchanged_column = None
+        self.row_delta = RowDelta.from_config(f'postgresql://{user}@{host}:{port}/{database_name}')
+
         self.conn = None
         self.cur = None
         self.open_connection()
         self.cursor()
 
-        self.postgresql_reader = None
-
     def reset_connection(self):
-        self.close_connection()
+        self.disconnect(broken=True)
         self.open_connection()
         self.cursor()
 
     def open_connection(self, attempt: int = MAX_ATTEMPT_FAIL):
         if not self.conn:
             try:
-                self.conn = psycopg2.connect(user=self.user, password=self.password, host=self.host,
-                                             port=self.port, database=self.database_name, connect_timeout=5)
-                self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                self.pool = get_pool(user=self.user, password=self.password, host=self.host,
+                                     port=self.port, database=self.database_name)
+                self.conn = self.pool.getconn(autocommit=not self.transaction_mode)
             except psycopg2.OperationalError as error:
                 if attempt > 0:
                     logger.error(f"Got error: {error}, reconnecting")
@@ -78,21 +214,253 @@ class PostgresqlHelper(AbstractAdapter):
             self.cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
             return self.cur
 
-    def execute(self, query: str, data: str = None, attempt: int = MAX_ATTEMPT_FAIL):
-        try:
+    def run_operation(self, operation: Callable, description: str, write: bool = False, rows: int = 1):
+        # In transaction mode a retry reconnects, which rolls back the open transaction,
+        # so the writes of the batch not committed yet are replayed before the operation
+        replay = False
+        for attempt in range(MAX_ATTEMPT_FAIL, -1, -1):
+            try:
+                if replay:
+                    for pending_operation in self.pending_operations:
+                        pending_operation()
+                result = operation()
+                if not self.transaction_mode:
+                    self.conn.commit()
+                break
+            except (psycopg2.DatabaseError, psycopg2.OperationalError) as error:
+                if attempt > 0:
+                    logger.error(f"Got error: {error}, {description}, retrying")
+                    time.sleep(1)
+                    self.reset_connection()
+                    replay = bool(self.pending_operations)
+                else:
+                    self.rollback()
+                    raise error
+
+        if write and self.transaction_mode:
+            self.pending_operations.append(operation)
+            self.pending_rows += rows
+            self.commit_if_due()
+        return result
+
+    def execute(self, query: str, data: str = None, write: bool = False):
+        # Writes return no rows, reads return the fetched rows
+        def operation():
             self.cur.execute(query, data)
-            self.conn.commit()
-        except (psycopg2.DatabaseError, psycopg2.OperationalError) as error:
-            if attempt > 0:
-                logger.error(f"Got error: {error}, query: {query}, data {data}, retrying")
-                time.sleep(1)
-                self.reset_connection()
-                self.execute(query, data, attempt - 1)
+            if not write and self.cur.description:
+                return self.cur.fetchall()
+            return []
+
+        return self.run_operation(operation, f"query: {query}, data {data}", write=write)
+
+    def fetch_groups(self) -> List[Tuple]:
+        # Rows of a counted upsert, see MERGE_QUERY: (source, country, min date, max date, inserted, updated)
+        return [tuple(row) for row in self.cur.fetchall()] if self.cur.description else []
+
+    def execute_values(self, table_name: str, query: sql.Composable, rows: List[Tuple]):
+        # Every page of a counted upsert returns its own groups, count_rows adds them up
+        fetch = self.counting(table_name)[1] is not None
+
+        def operation():
+            groups = psycopg2.extras.execute_values(self.cur, query, rows, page_size=BATCH_PAGE_SIZE, fetch=fetch)
+            return [tuple(row) for row in groups] if fetch else []
+
+        groups = self.run_operation(operation, f"query: {query}, rows: {len(rows)}", write=True, rows=len(rows))
+        self.count_rows(table_name, len(rows), groups)
+
+    def execute_copy(self, table_name: str, keys: Tuple, rows: List[Tuple], merge_query: sql.Composable):
+        # Session temporary table, so concurrent workers never see each other's rows
+        staging_table = sql.Identifier(f'copy_{table_name}')
+
+        def operation():
+            self.cur.execute(sql.SQL("""CREATE TEMP TABLE IF NOT EXISTS {staging_table}
+                                        (LIKE {table_name} INCLUDING DEFAULTS)""").format(
+                staging_table=staging_table, table_name=sql.Identifier(table_name)))
+            self.cur.execute(sql.SQL("TRUNCATE {staging_table}").format(staging_table=staging_table))
+            self.cur.copy_expert(sql.SQL("COPY {staging_table} ({keys}) FROM STDIN WITH (FORMAT csv, NULL {null})")
+                                 .format(staging_table=staging_table,
+                                         keys=sql.SQL(",").join(map(sql.Identifier, keys)),
+                                         null=sql.Literal(COPY_NULL)),
+                                 copy_buffer(rows))
+            self.cur.execute(merge_query)
+            return self.fetch_groups()
+
+        groups = self.run_operation(operation, f"table: {table_name}, rows: {len(rows)}", write=True, rows=len(rows))
+        self.count_rows(table_name, len(rows), groups)
+
+    @staticmethod
+    def conflict_action(table_name: str, update_keys: List[str], returning: str = None) -> sql.Composable:
+        # Rows whose data columns are all equal are left alone, so unchanged data creates no new row versions.
+        # Values are compared as text, json columns have no equality operator
+        returning = sql.SQL("RETURNING " + returning if returning else "")
+        if not update_keys:
+            return sql.SQL("NOTHING {returning}").format(returning=returning)
+
+        return sql.SQL("""UPDATE SET {update_data}
+                          WHERE ROW({current_data})::text IS DISTINCT FROM ROW({excluded_data})::text
+                          {returning}""").format(
+            returning=returning,
+            update_data=sql.SQL(",").join(
+                sql.SQL("{key}=EXCLUDED.{key}").format(key=sql.Identifier(k)) for k in update_keys),
+            current_data=sql.SQL(",").join(sql.Identifier(table_name, k) for k in update_keys),
+            excluded_data=sql.SQL(",").join(sql.Identifier('excluded', k) for k in update_keys)
+        )
+
+    def counting(self, table_name: str) -> Tuple[str, str]:
+        """
+        RETURNING clause of the upserts into a table and the query aggregating the returned rows, or None for both.
+        Rows of staging tables are counted when they are published, diagnostics are not counted
+        """
+        if table_name == 'diagnostics' or table_name.startswith('staging_'):
+            return None, None
+        if self.has_source_stats():
+            return STATS_RETURNING, MERGE_QUERY
+        return INSERTED_RETURNING, COUNT_QUERY
+
+    def counted_upsert(self, table_name: str, update_keys: List[str], upsert_query: str,
+                       **kwargs) -> sql.Composable:
+        # The upsert_query has table_name and conflict_action placeholders,
+        # its returned rows are aggregated on the server when they are counted
+        returning, aggregate_query = self.counting(table_name)
+        query = sql.SQL(upsert_query).format(
+            table_name=sql.Identifier(table_name),
+            conflict_action=self.conflict_action(table_name, update_keys, returning), **kwargs)
+        if aggregate_query is None:
+            return query
+        return sql.SQL(aggregate_query).format(merge_query=query)
+
+    def count_rows(self, table_name: str, rows: int, groups: List[Tuple]):
+        if self.counting(table_name)[1] is None:
+            return
+        inserted = sum(group[4] for group in groups)
+        updated = sum(group[5] for group in groups)
+        self.row_counts.update(inserted=inserted, updated=updated, unchanged=rows - inserted - updated)
+
+        if not self.has_source_stats():
+            return
+        for source, country, min_date, max_date, inserted, updated in groups:
+            stats = self.source_stats.get((table_name, source, country))
+            if stats is None:
+                self.source_stats[(table_name, source, country)] = [min_date, max_date, inserted]
             else:
-                raise error
-        except (Exception, psycopg2.Error) as error:
-            raise error
-        return self.cur.fetchall()
+                stats[0] = min(stats[0], min_date)
+                stats[1] = max(stats[1], max_date)
+                stats[2] += inserted
+
+    def has_source_stats(self) -> bool:
+        # Without the source_stats table, see sql/source_stats.sql, timestamps are aggregated from the data tables
+        if self.source_stats_table is None:
+            result = self.execute("SELECT to_regclass('source_stats') IS NOT NULL")
+            self.source_stats_table = bool(result[0][0])
+            if not self.source_stats_table:
+                logger.info("Table source_stats not found, diagnostics are aggregated from the data tables")
+        return self.source_stats_table
+
+    def write_source_stats(self):
+        # Stats of the rows written since the last call are merged in the transaction of the rows
+        if not self.source_stats:
+            return
+
+        stats, self.source_stats = self.source_stats, dict()
+        values = [key + tuple(value) for key, value in stats.items()]
+        sql_query = sql.SQL("""INSERT INTO source_stats (table_name, source, country, min_date, max_date, rows)
+                               VALUES %s
+                               ON CONFLICT (table_name, source, country) DO UPDATE
+                               SET min_date = LEAST(source_stats.min_date, EXCLUDED.min_date),
+                                   max_date = GREATEST(source_stats.max_date, EXCLUDED.max_date),
+                                   rows = source_stats.rows + EXCLUDED.rows""")
+
+        def operation():
+            psycopg2.extras.execute_values(self.cur, sql_query, values, page_size=BATCH_PAGE_SIZE)
+
+        self.run_operation(operation, f"source_stats, rows: {len(values)}", write=True, rows=0)
+
+    def reset_row_counts(self):
+        self.row_counts = Counter()
+
+    def get_row_counts(self) -> Dict:
+        return {key: self.row_counts[key] for key in ('inserted', 'updated', 'unchanged')}
+
+    def upsert_statement(self, table_name: str, keys: Tuple, conflict_target: List[str],
+                         update_keys: List[str]) -> Tuple[str, str, str, str]:
+        # Statements are composed once for every table and column set, and prepared on the server on first use
+        cache_key = (table_name, keys, tuple(conflict_target), tuple(update_keys))
+        statement = self.statements.get(cache_key)
+        if statement:
+            return statement
+
+        name = f'upsert_{len(self.statements)}'
+        upsert_query = self.counted_upsert(
+            table_name, update_keys,
+            """INSERT INTO {table_name} ({insert_keys}) VALUES ({insert_data})
+               ON CONFLICT (""" + ",".join(conflict_target) + """)
+               DO {conflict_action}""",
+            insert_keys=sql.SQL(",").join(map(sql.Identifier, keys)),
+            insert_data=sql.SQL(",").join(sql.SQL(f"${i}") for i in range(1, len(keys) + 1))
+        )
+        prepare_query = sql.SQL("PREPARE {name} AS {upsert_query}").format(
+            name=sql.Identifier(name), upsert_query=upsert_query)
+        execute_query = sql.SQL("EXECUTE {name} ({values})").format(
+            name=sql.Identifier(name),
+            values=sql.SQL(",").join(sql.Placeholder() for _ in keys)
+        )
+
+        statement = (name, table_name, prepare_query.as_string(self.conn), execute_query.as_string(self.conn))
+        self.statements[cache_key] = statement
+        return statement
+
+    def execute_prepared(self, statement: Tuple[str, str, str, str], values: Tuple):
+        name, table_name, prepare_query, execute_query = statement
+
+        def operation():
+            # Prepared statements live as long as the session, they are prepared again after a reconnect
+            if name not in self.prepared_statements:
+                self.cur.execute(prepare_query)
+                self.prepared_statements.add(name)
+            self.cur.execute(execute_query, values)
+            return self.fetch_groups()
+
+        groups = self.run_operation(operation, f"statement: {name}, data {values}", write=True)
+        self.count_rows(table_name, 1, groups)
+
+    def commit_if_due(self):
+        if self.commit_size and self.pending_rows >= self.commit_size:
+            self.commit()
+        elif self.commit_interval and time.time() - self.transaction_start >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        if self.conn:
+            self.write_source_stats()
+            self.conn.commit()
+            if self.pending_rows:
+                logger.debug(f"Committed {self.pending_rows} rows")
+        self.pending_operations = []
+        self.pending_rows = 0
+        self.transaction_start = time.time()
+
+    def rollback(self):
+        if self.transaction_mode:
+            self.source_stats = dict()
+        else:
+            # Every statement was committed on its own, stats of the rows written so far are kept
+            try:
+                self.write_source_stats()
+            except psycopg2.Error as error:
+                logger.error(f"Unable to write source stats: {error}")
+        if self.conn and not self.conn.closed:
+            try:
+                self.conn.rollback()
+            except psycopg2.Error as error:
+                logger.error(f"Unable to roll back: {error}")
+        if self.pending_rows:
+            logger.warning(f"Rolled back {self.pending_rows} rows")
+        self.pending_operations = []
+        self.pending_rows = 0
+        self.transaction_start = time.time()
+
+    def flush(self):
+        self.commit()
 
     def call_db_function_compare(self, source_code: str) -> int:
         self.cur.callproc('covid19_compare_tables', (source_code,))
@@ -100,22 +468,90 @@ class PostgresqlHelper(AbstractAdapter):
         compare_result = self.cur.fetchone()
         return compare_result[0]
 
-    def call_db_function_send_data(self, source_code: str):
-        self.cur.callproc('send_validated_data', [source_code])
-        logger.debug("Moving data to epidemiology")
+    def call_db_function_compare_dates(self, source_code: str) -> List[Dict]:
+        sql_query = sql.SQL("SELECT date, staging_rows, existing_rows FROM covid19_validation_window(%s, %s)")
+        logger.debug("Validating incoming data by date...")
+        staging_table = self.staging_tables.get(FetcherType.EPIDEMIOLOGY.value, 'staging_epidemiology')
+        return [dict(row) for row in self.execute(sql_query, (source_code, staging_table))]
+
+    @staticmethod
+    def staging_table_name(table_name: str, source: str) -> str:
+        if table_name == FetcherType.EPIDEMIOLOGY.value and config.VALIDATION_MODE != 'window':
+            return SHARED_STAGING_TABLE
+        return f"staging_{table_name}_" + re.sub(r'\W', '_', source.lower())
+
+    @staticmethod
+    def clear_staging_query(staging_table: str, source: str) -> sql.Composable:
+        # Rows of other sources in the shared table may still wait for validation in concurrent workers
+        if staging_table == SHARED_STAGING_TABLE:
+            return sql.SQL("DELETE FROM {staging_table} WHERE source = {source}").format(
+                staging_table=sql.Identifier(staging_table), source=sql.Literal(source))
+        return sql.SQL("TRUNCATE {staging_table}").format(staging_table=sql.Identifier(staging_table))
+
+    def start_staging(self, fetcher_type: FetcherType, source: str):
+        # Unlogged tables of a single source with the unique indexes of the target table, so upserts into them
+        # work the same way, writes of other sources and the WAL of the target table are not affected.
+        # The shared table of the full validation mode is only emptied of the rows of the source
+        self.staging_tables = dict()
+        if fetcher_type not in STAGED_TYPES or not source:
+            return
+
+        table_name = fetcher_type.value
+        staging_table = self.staging_table_name(table_name, source)
+        self.execute(sql.SQL("""CREATE UNLOGGED TABLE IF NOT EXISTS {staging_table}
+                                (LIKE {table_name} INCLUDING DEFAULTS INCLUDING INDEXES)""").format(
+            staging_table=sql.Identifier(staging_table), table_name=sql.Identifier(table_name)), write=True)
+        self.execute(self.clear_staging_query(staging_table, source), write=True)
+        self.commit()
+        self.staging_tables = {table_name: staging_table}
+
+    def publish_staging(self, fetcher_type: FetcherType, source: str):
+        # Validated rows are merged into the target table with one set based upsert, committed together
+        # with the stats of the written rows and the emptied staging table
+        table_name = fetcher_type.value
+        staging_table = self.staging_tables.get(table_name)
+        if not staging_table:
+            return
+
+        keys = tuple(row[0] for row in self.execute(
+            "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped "
+            "ORDER BY attnum", (staging_table,)))
+        rows = self.execute(sql.SQL("SELECT count(*) FROM {staging_table} WHERE source = %s").format(
+            staging_table=sql.Identifier(staging_table)), (source,))[0][0]
+        merge_query = self.counted_upsert(
+            table_name, self.update_keys(fetcher_type, keys),
+            """INSERT INTO {table_name} ({insert_keys})
+               SELECT {insert_keys} FROM {staging_table} WHERE source = {source}
+               ON CONFLICT ({conflict_target}) DO {conflict_action}""",
+            insert_keys=sql.SQL(",").join(map(sql.Identifier, keys)),
+            staging_table=sql.Identifier(staging_table),
+            source=sql.Literal(source),
+            conflict_target=sql.SQL(",".join(self.conflict_target(fetcher_type)))
+        )
 
-    def truncate_staging(self):
-        # TODO: Add more staging tables, currently only for epidemiology
-        sql_query = sql.SQL("""TRUNCATE staging_epidemiology; SELECT 1""")
-        self.execute(sql_query)
+        def operation():
+            self.cur.execute(merge_query)
+            groups = self.fetch_groups()
+            if table_name == FetcherType.EPIDEMIOLOGY.value and staging_table != SHARED_STAGING_TABLE:
+                # Digests of the windowed validation, see sql/covid19_validation_window.sql
+                self.cur.execute("SELECT epidemiology_digest_refresh(%s, %s)", (source, staging_table))
+            self.cur.execute(self.clear_staging_query(staging_table, source))
+            return groups
+
+        groups = self.run_operation(operation, f"publish {staging_table}, rows: {rows}", write=True, rows=rows)
+        self.count_rows(table_name, rows, groups)
+        self.commit()
+        self.staging_tables = dict()
+        logger.debug(f"Published {rows} rows from {staging_table} to {table_name}")
 
     def get_adm_division(self, countrycode: str, adm_area_1: str = None, adm_area_2: str = None,
                          adm_area_3: str = None) -> Tuple:
+        resolver = self.adm_division_resolver() if self.database_name == 'covid19_play' else None
+        if resolver is not None:
+            return resolver.get_adm_division(countrycode, adm_area_1, adm_area_2, adm_area_3)
+
         if self.database_name=='covid19_play':
-            if not self.postgresql_reader:
-                self.postgresql_reader = PostgresqlHelper(user='covid19', password='covid19', host='covid19db.org',
-                                                      port='5432', database_name='covid19')
-            execute = self.postgresql_reader.execute
+            execute = execute_reference_query
         else:
             execute = self.execute
 
@@ -129,7 +565,8 @@ class PostgresqlHelper(AbstractAdapter):
                 AND regexp_replace(COALESCE(adm_area_3, ''), '[^\w%%]+','','g')
                     ILIKE regexp_replace(%s, '[^\w%%]+','','g') """)
 
-        results = execute(sql_query, (countrycode, adm_area_1 or '', adm_area_2 or '', adm_area_3 or ''))
+        results = execute(sql_query, (countrycode, adm_area_input(adm_area_1), adm_area_input(adm_area_2),
+                                       adm_area_input(adm_area_3)))
         if not results:
             raise Exception(f'Unable to find adm division for: {countrycode}, {adm_area_1}, {adm_area_2}, {adm_area_3}')
         if len(results) > 1:
@@ -137,6 +574,54 @@ class PostgresqlHelper(AbstractAdapter):
         result = results[0]
         return result['country'], result['adm_area_1'], result['adm_area_2'], result['adm_area_3'], [result['gid']]
 
+    def get_adm_divisions(self, keys: Iterable[Tuple]) -> Dict[Tuple, Tuple]:
+        # Inputs without wildcards are compared by equality, which can use the administrative_division_match
+        # index, inputs with % or _ wildcards keep the ILIKE comparison of get_adm_division
+        if self.database_name == 'covid19_play' and self.adm_division_resolver() is not None:
+            return super().get_adm_divisions(keys)
+
+        execute = execute_reference_query if self.database_name == 'covid19_play' else self.execute
+
+        # Queries run without parameters, so % is not escaped and the expressions match the index definition
+        normalized = r"regexp_replace(COALESCE({column}, ''), '[^\w%]+', '', 'g')"
+        exact_match = sql.SQL(" AND ").join(
+            sql.SQL(f"lower({normalized.format(column='division.' + column)}) "
+                    f"= lower({normalized.format(column='region.' + column)})")
+            for column in ('adm_area_1', 'adm_area_2', 'adm_area_3'))
+        like_match = sql.SQL(" AND ").join(
+            sql.SQL(f"{normalized.format(column='division.' + column)} "
+                    f"ILIKE {normalized.format(column='region.' + column)}")
+            for column in ('adm_area_1', 'adm_area_2', 'adm_area_3'))
+
+        keys = list(dict.fromkeys(keys))
+        exact_keys, like_keys = [], []
+        for key in keys:
+            wildcard = any(like_pattern(normalize_adm_area(value))
+                           for value in key[1:])
+            (like_keys if wildcard else exact_keys).append(key)
+
+        matches = dict()
+        for match, match_keys in ((exact_match, exact_keys), (like_match, like_keys)):
+            for start in range(0, len(match_keys), ADM_DIVISION_PAGE_SIZE):
+                page = match_keys[start:start + ADM_DIVISION_PAGE_SIZE]
+                values = sql.SQL(",").join(
+                    sql.SQL("({})").format(sql.SQL(",").join(
+                        sql.Literal(value) for value in (start + i, key[0]) + tuple(
+                            adm_area_input(area) for area in key[1:])))
+                    for i, key in enumerate(page))
+                sql_query = sql.SQL("""
+                    SELECT region.idx, division.country, division.adm_area_1, division.adm_area_2,
+                           division.adm_area_3, division.gid
+                    FROM (VALUES {values}) AS region (idx, countrycode, adm_area_1, adm_area_2, adm_area_3)
+                    JOIN administrative_division division ON division.countrycode = region.countrycode
+                        AND {match}""").format(values=values, match=match)
+                for row in execute(sql_query):
+                    matches.setdefault(match_keys[row[0]], []).append(row)
+
+        # Same as get_adm_division, a key matching more than one division is not resolved
+        return {key: (rows[0][1], rows[0][2], rows[0][3], rows[0][4], [rows[0][5]])
+                for key, rows in matches.items() if len(rows) == 1}
+
     def upsert_table_data(self, table_name: str, data_keys: List, **kwargs):
         self.check_if_gid_exists(kwargs)
         target = ["date", "country", "countrycode", "COALESCE(adm_area_1, '')", "COALESCE(adm_area_2, '')",
@@ -145,109 +630,106 @@ class PostgresqlHelper(AbstractAdapter):
         if 'msoa' in data_keys:
             target.append('msoa')
 
-        sql_query = sql.SQL("""INSERT INTO {table_name} ({insert_keys}) VALUES ({insert_data})
-                                ON CONFLICT
-                                    (""" + ",".join(target) + """)
-                                DO
-                                    UPDATE SET {update_data}
-                                RETURNING *""").format(
-            table_name=sql.Identifier(table_name),
-            insert_keys=sql.SQL(",").join(map(sql.Identifier, kwargs.keys())),
-            insert_data=sql.SQL(",").join(map(sql.Placeholder, kwargs.keys())),
-            update_data=sql.SQL(",").join(
-                sql.Composed([sql.Identifier(k), sql.SQL("="), sql.Placeholder(k)]) for k in kwargs.keys() if
-                k in data_keys)
-        )
-
-        self.execute(sql_query, kwargs)
+        keys = tuple(kwargs.keys())
+        statement = self.upsert_statement(table_name, keys, target, [k for k in keys if k in data_keys])
+        self.execute_prepared(statement, tuple(kwargs.values()))
         logger.debug("Updating {} table with data: {}".format(table_name, list(kwargs.values())))
 
     def upsert_government_response_data(self, table_name: str = 'government_response', **kwargs):
-        government_response_data_fields = [
-            'c1_school_closing', 'c1_flag',
-            'c2_workplace_closing', 'c2_flag',
-            'c3_cancel_public_events', 'c3_flag',
-            'c4_restrictions_on_gatherings', 'c4_flag',
-            'c5_close_public_transport', 'c5_flag',
-            'c6_stay_at_home_requirements', 'c6_flag',
-            'c7_restrictions_on_internal_movement', 'c7_flag',
-            'c8_international_travel_controls',
-            'e1_income_support', 'e1_flag',
-            'e2_debtcontract_relief',
-            'e3_fiscal_measures',
-            'e4_international_support',
-            'h1_public_information_campaigns', 'h1_flag',
-            'h2_testing_policy',
-            'h3_contact_tracing',
-            'h4_emergency_investment_in_healthcare',
-            'h5_investment_in_vaccines',
-            'm1_wildcard',
-            'stringency_index',
-            'stringency_indexfordisplay',
-            'stringency_legacy_index',
-            'stringency_legacy_indexfordisplay',
-            'government_response_index',
-            'government_response_index_for_display',
-            'containment_health_index',
-            'containment_health_index_for_display',
-            'economic_support_index',
-            'economic_support_index_for_display',
-            'actions'
-        ]
-        self.upsert_table_data(table_name, government_response_data_fields, **kwargs)
+        self.upsert_table_data(table_name, GOVERNMENT_RESPONSE_DATA_KEYS, **kwargs)
 
     def upsert_epidemiology_data(self, table_name: str = 'epidemiology', data_keys: list = None, **kwargs):
         if not data_keys:
-            data_keys = ['gid', 'tested', 'confirmed', 'quarantined', 'hospitalised', 'hospitalised_icu', 'dead',
-                         'recovered']
+            data_keys = EPIDEMIOLOGY_DATA_KEYS
         self.upsert_table_data(table_name, data_keys, **kwargs)
 
     def upsert_mobility_data(self, table_name: str = 'mobility', **kwargs):
-        data_keys = ['gid', 'transit_stations', 'residential', 'workplace', 'parks', 'retail_recreation',
-                     'grocery_pharmacy']
-
-        self.upsert_table_data(table_name, data_keys, **kwargs)
+        self.upsert_table_data(table_name, MOBILITY_DATA_KEYS, **kwargs)
 
     def upsert_weather_data(self, table_name: str = 'weather', **kwargs):
-        composite_key = ['date', 'countrycode', 'gid']
-
         self.check_if_gid_exists(kwargs)
-        sql_query = sql.SQL("""INSERT INTO {table_name} ({insert_keys}) VALUES ({insert_data})
-                                ON CONFLICT
-                                    (date, gid)
-                                DO
-                                    UPDATE SET {update_data}
-                               RETURNING *
-                                    """).format(
-            table_name=sql.Identifier(table_name),
-            insert_keys=sql.SQL(",").join(map(sql.Identifier, kwargs.keys())),
-            insert_data=sql.SQL(",").join(map(sql.Placeholder, kwargs.keys())),
-            update_data=sql.SQL(",").join(
-                sql.Composed([sql.Identifier(k), sql.SQL("="), sql.Placeholder(k)]) for k in kwargs.keys() if
-                k not in composite_key)
-        )
-
-        self.execute(sql_query, kwargs)
+        keys = tuple(kwargs.keys())
+        statement = self.upsert_statement(table_name, keys, ['date', 'gid'],
+                                          [k for k in keys if k not in WEATHER_COMPOSITE_KEY])
+        self.execute_prepared(statement, tuple(kwargs.values()))
         logger.debug(
             "Updating {} table with data: {}".format(table_name, list(kwargs.values())))
 
+    @staticmethod
+    def conflict_target(fetcher_type: FetcherType) -> List[str]:
+        if fetcher_type == FetcherType.WEATHER:
+            return ['date', 'gid']
+
+        target = ["date", "country", "countrycode", "COALESCE(adm_area_1, '')", "COALESCE(adm_area_2, '')",
+                  "COALESCE(adm_area_3, '')", "source"]
+        if fetcher_type == FetcherType.EPIDEMIOLOGY_MSOA:
+            target.append('msoa')
+        return target
+
+    @staticmethod
+    def update_keys(fetcher_type: FetcherType, keys: Tuple) -> List[str]:
+        if fetcher_type == FetcherType.WEATHER:
+            return [k for k in keys if k not in WEATHER_COMPOSITE_KEY]
+        return [k for k in keys if k in DATA_KEYS.get(fetcher_type)]
+
+    def upsert_batch_data(self, fetcher_type: FetcherType, table_name: str, records: List[Dict]):
+        # A single INSERT ... ON CONFLICT statement can't update the same row twice,
+        # keep only the last record for every conflict key, grouped by column set
+        batches = dict()
+        for record in records:
+            self.check_if_gid_exists(record)
+            keys = tuple(record.keys())
+            batches.setdefault(keys, dict())[self.conflict_key(fetcher_type, record)] = record
+
+        for keys, batch in batches.items():
+            update_keys = self.update_keys(fetcher_type, keys)
+            conflict_clause = sql.SQL("ON CONFLICT (" + ",".join(self.conflict_target(fetcher_type)) + ") DO ")
+            insert_keys = sql.SQL(",").join(map(sql.Identifier, keys))
+            rows = [tuple(record.get(k) for k in keys) for record in batch.values()]
+
+            if len(rows) >= COPY_MIN_ROWS:
+                # Stream rows into a staging table and merge them with one set based statement
+                merge_query = self.counted_upsert(
+                    table_name, update_keys,
+                    """INSERT INTO {table_name} ({insert_keys})
+                       SELECT {insert_keys} FROM {staging_table}
+                       {conflict_clause}{conflict_action}""",
+                    insert_keys=insert_keys,
+                    staging_table=sql.Identifier(f'copy_{table_name}'),
+                    conflict_clause=conflict_clause
+                )
+                self.execute_copy(table_name, keys, rows, merge_query)
+            else:
+                sql_query = self.counted_upsert(
+                    table_name, update_keys,
+                    """INSERT INTO {table_name} ({insert_keys}) VALUES %s
+                       {conflict_clause}{conflict_action}""",
+                    insert_keys=insert_keys,
+                    conflict_clause=conflict_clause
+                )
+                self.execute_values(table_name, sql_query, rows)
+            logger.debug(f"Updating {table_name} table with {len(rows)} rows")
+
+    def has_diagnostics_unchanged_column(self) -> bool:
+        # The unchanged column is added by sql/diagnostics_unchanged.sql
+        if self.diagnostics_unchanged_column is None:
+            result = self.execute("""SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                                     WHERE table_name = 'diagnostics' AND column_name = 'unchanged')""")
+            self.diagnostics_unchanged_column = bool(result[0][0])
+            if not self.diagnostics_unchanged_column:
+                logger.info("Column diagnostics.unchanged not found, skipped runs are not recorded")
+        return self.diagnostics_unchanged_column
+
     def upsert_diagnostics(self, **kwargs):
         data_keys = ["validation_success", "error", "last_run_start", "last_run_stop", "first_timestamp",
-                     "last_timestamp", "details"]
-        sql_query = sql.SQL("""INSERT INTO diagnostics ({insert_keys}) VALUES ({insert_data})
-                                        ON CONFLICT
-                                            (table_name, source)
-                                        DO
-                                            UPDATE SET {update_data}
-                                        RETURNING *""").format(
-            insert_keys=sql.SQL(",").join(map(sql.Identifier, kwargs.keys())),
-            insert_data=sql.SQL(",").join(map(sql.Placeholder, kwargs.keys())),
-            update_data=sql.SQL(",").join(
-                sql.Composed([sql.Identifier(k), sql.SQL("="), sql.Placeholder(k)]) for k in kwargs.keys() if
-                k in data_keys)
-        )
-
-        self.execute(sql_query, kwargs)
+                     "last_timestamp", "details", "unchanged"]
+        if 'unchanged' in kwargs and not self.has_diagnostics_unchanged_column():
+            kwargs.pop('unchanged')
+        keys = tuple(kwargs.keys())
+        statement = self.upsert_statement('diagnostics', keys, ['table_name', 'source'],
+                                          [k for k in keys if k in data_keys])
+        self.execute_prepared(statement, tuple(kwargs.values()))
+        self.commit()
         logger.debug("Updating diagnostics table with data: {}".format(list(kwargs.values())))
 
     def get_data(self, table_name: str, source: str, date: str, gid: str):
@@ -257,46 +739,78 @@ class PostgresqlHelper(AbstractAdapter):
         return result[0] if len(result) == 1 else None
 
     def get_earliest_timestamp(self, table_name: str, source: str = None):
-        sql_str = """SELECT min(date) as date FROM {table_name}"""
-        if source:
-            sql_str = sql_str + """ WHERE source = %s"""
-
-        sql_query = sql.SQL(sql_str).format(table_name=sql.Identifier(table_name))
-
-        result = self.execute(sql_query, (source,))
-        return result[0]['date'] if len(result) > 0 else None
+        return self.get_timestamp('min', table_name, source)
 
     def get_latest_timestamp(self, table_name: str, source: str = None):
-        sql_str = """SELECT max(date) as date FROM {table_name}"""
+        return self.get_timestamp('max', table_name, source)
+
+    def get_timestamp(self, aggregate: str, table_name: str, source: str = None):
+        if self.has_source_stats():
+            self.write_source_stats()
+            sql_str = f"SELECT {aggregate}({aggregate}_date) as date FROM source_stats WHERE table_name = %s"
+            data = (table_name,)
+        else:
+            sql_str = f"SELECT {aggregate}(date) as date FROM {{table_name}}"
+            data = ()
         if source:
-            sql_str = sql_str + """ WHERE source = %s"""
+            sql_str = sql_str + (" AND" if data else " WHERE") + " source = %s"
+            data = data + (source,)
 
         sql_query = sql.SQL(sql_str).format(table_name=sql.Identifier(table_name))
 
-        result = self.execute(sql_query, (source,))
+        result = self.execute(sql_query, data)
         return result[0]['date'] if len(result) > 0 else None
 
     def get_details(self, table_name: str, source: str = None):
-        sql_str = """SELECT country, min(date) as min_date, max(date) as max_date  
-                     FROM {table_name}"""
+        if self.has_source_stats():
+            self.write_source_stats()
+            sql_str = """SELECT country, min(min_date) as min_date, max(max_date) as max_date, sum(rows)::bigint as rows
+                         FROM source_stats WHERE table_name = %s"""
+            data = (table_name,)
+        else:
+            sql_str = """SELECT country, min(date) as min_date, max(date) as max_date, count(*) as rows
+                         FROM {table_name}"""
+            data = ()
         if source:
-            sql_str = sql_str + """ WHERE source = %s"""
-        sql_str = sql_str + " GROUP BY country"
+            sql_str = sql_str + (" AND" if data else " WHERE") + " source = %s"
+            data = data + (source,)
+        sql_str = sql_str + " GROUP BY country ORDER BY country"
 
         sql_query = sql.SQL(sql_str).format(table_name=sql.Identifier(table_name))
 
-        result = self.execute(sql_query, (source,))
+        result = self.execute(sql_query, data)
         result_list = []
-        columns = ['country', 'min_date', 'max_date']
+        columns = ['country', 'min_date', 'max_date', 'rows']
         for row in result:
             result_list.append(dict(zip(columns, row)))
         return json.dumps(result_list, default=default)
 
-    def close_connection(self):
+    def max_concurrency(self, mode: str) -> int:
+        # Thread workers share the connection pool of the process with this adapter, which keeps its connection
+        if mode == 'process':
+            return None
+        return config.DB_POOL_MAX - 1
+
+    def disconnect(self, broken: bool = False):
+        # Returning the connection without commit rolls back the open transaction,
+        # a connection which failed is closed instead of being reused
         if self.conn:
-            if self.cur:
+            if self.cur and not self.cur.closed:
                 self.cur.close()
-            self.conn.close()
-            logger.debug("Closing connection")
+            if not broken and not self.conn.closed:
+                try:
+                    self.conn.rollback()
+                    with self.conn.cursor() as cur:
+                        cur.execute("DEALLOCATE ALL")
+                except psycopg2.Error:
+                    broken = True
+            self.pool.putconn(self.conn, close=broken)
+            logger.debug("Returning connection to the pool")
         self.conn = None
         self.cur = None
+        self.prepared_statements = set()
+
+    def close_connection(self):
+        if self.conn and not self.conn.closed:
+            self.commit()
+        self.disconnect()
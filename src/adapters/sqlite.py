@@ -12,17 +12,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import json
 import logging
 import sqlite3
-from typing import Dict
+from datetime import date
+from typing import Dict, List, Tuple
 import pandas as pd
 
 __all__ = ('SqliteHelper',)
 
+from utils.types import FetcherType
 from utils.adapter.abstract_adapter import AbstractAdapter
+from utils.adapter.row_delta import RowDelta
 
 logger = logging.getLogger(__name__)
 
+# Writes are committed on flush, a crash loses at most the data of the running plugin.
+# The write transaction stays open while a plugin runs, so plugins are run one at a time
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-262144',
+    'PRAGMA temp_store=MEMORY'
+)
+SQLITE_TIMEOUT = 600
+# Single row upserts are buffered and written with executemany
+BATCH_SIZE = 10000
+
 sql_create_epidemiology_table = """
     CREATE TABLE IF NOT EXISTS epidemiology (
         source text NOT NULL,
@@ -97,7 +114,7 @@ sql_create_government_response_table = """
     ) WITHOUT ROWID"""
 
 sql_create_mobility_table = """
-    CREATE TABLE IF NOT EXISTS government_response (
+    CREATE TABLE IF NOT EXISTS mobility (
         source text NOT NULL,
         date date NOT NULL,
         country text NOT NULL,
@@ -191,6 +208,8 @@ sql_create_diagnostics_table = """
         last_run_stop date, 
         first_timestamp date, 
         last_timestamp date,
+        details text,
+        unchanged text,
         UNIQUE (table_name, source),
         PRIMARY KEY (table_name, source)
     ) WITHOUT ROWID"""
@@ -204,20 +223,22 @@ def update_type(val):
 
 class SqliteHelper(AbstractAdapter):
     def __init__(self, sqlite_file_path: str):
+        super().__init__()
         self.sqlite_file_path = sqlite_file_path
+        self.row_delta = RowDelta.from_config(f'sqlite://{os.path.abspath(sqlite_file_path)}')
 
         self.conn = None
         self.cur = None
+        self.pending_query = None
+        self.pending_rows = []
         self.open_connection()
         self.cursor()
         self.create_tables()
 
     def open_connection(self):
-        self.conn = None
-        try:
-            self.conn = sqlite3.connect(self.sqlite_file_path)
-        except Exception as e:
-            print(e)
+        self.conn = sqlite3.connect(self.sqlite_file_path, timeout=SQLITE_TIMEOUT)
+        for pragma in SQLITE_PRAGMAS:
+            self.conn.execute(pragma)
 
     def create_tables(self):
         self.execute(sql_create_epidemiology_table)
@@ -225,23 +246,46 @@ class SqliteHelper(AbstractAdapter):
         self.execute(sql_create_mobility_table)
         self.execute(sql_create_weather_table)
         self.execute(sql_create_diagnostics_table)
+        columns = [row[1] for row in self.execute('PRAGMA table_info(diagnostics)')]
+        if 'details' not in columns:
+            self.execute('ALTER TABLE diagnostics ADD COLUMN details text')
+        if 'unchanged' not in columns:
+            self.execute('ALTER TABLE diagnostics ADD COLUMN unchanged text')
+        self.conn.commit()
 
     def cursor(self):
         self.cur = self.conn.cursor()
         return self.cur
 
-    def execute(self, query: str, data: str = None):
-        try:
-            if data:
-                self.cur.execute(query, data)
-            else:
-                self.cur.execute(query)
-            self.conn.commit()
-        except Exception as ex:
-            print(ex)
-
+    def execute(self, query: str, data: Tuple = None) -> List:
+        # Runs in the open transaction, buffered rows are written first so reads see them
+        self.write_pending()
+        self.cur.execute(query, data or ())
         return self.cur.fetchall()
 
+    def execute_many(self, query: str, rows: List):
+        self.write_pending()
+        self.cur.executemany(query, rows)
+
+    def write_pending(self):
+        if self.pending_rows:
+            query, rows = self.pending_query, self.pending_rows
+            self.pending_query, self.pending_rows = None, []
+            self.cur.executemany(query, rows)
+            logger.debug(f"Written {len(rows)} buffered rows")
+
+    def flush(self):
+        self.write_pending()
+        self.conn.commit()
+
+    def rollback(self):
+        self.pending_query, self.pending_rows = None, []
+        self.conn.rollback()
+
+    def max_concurrency(self, mode: str) -> int:
+        # Workers would wait for the write transaction of each other on the same file
+        return 1
+
     def format_data(self, data: Dict):
         # Add adm_area values if don't exist
         data['adm_area_1'] = data.get('adm_area_1')
@@ -252,9 +296,12 @@ class SqliteHelper(AbstractAdapter):
         return {k: ('' if 'adm' in k and v is None else v) for k, v in data.items()}
 
     def get_adm_division(self, countrycode: str, adm_area_1: str = None, adm_area_2: str = None,
-                         adm_area_3: str = None):
-        # TODO: Implement get division
-        raise NotImplementedError("To be implemented")
+                         adm_area_3: str = None) -> Tuple:
+        resolver = self.adm_division_resolver()
+        if resolver is None:
+            raise Exception(f'Unable to find adm division for: {countrycode}, {adm_area_1}, {adm_area_2}, '
+                            f'{adm_area_3}, ADM_DIVISION_SNAPSHOT is not set')
+        return resolver.get_adm_division(countrycode, adm_area_1, adm_area_2, adm_area_3)
 
     def upsert_table_data(self, table_name: str, **kwargs):
         self.check_if_gid_exists(kwargs)
@@ -264,9 +311,30 @@ class SqliteHelper(AbstractAdapter):
             insert_keys=",".join([key for key in kwargs.keys()]),
             insert_data=",".join('?' * len(kwargs)),
         )
-        self.execute(sql_query, [update_type(val) for val in kwargs.values()])
+        # Rows are buffered while they go to the same table with the same columns, so their order is kept
+        if sql_query != self.pending_query or len(self.pending_rows) >= BATCH_SIZE:
+            self.write_pending()
+            self.pending_query = sql_query
+        self.pending_rows.append([update_type(val) for val in kwargs.values()])
         logger.debug("Updating {} table with data: {}".format(table_name, list(kwargs.values())))
 
+    def upsert_batch_data(self, fetcher_type: FetcherType, table_name: str, records: List[Dict]):
+        batches = dict()
+        for record in records:
+            self.check_if_gid_exists(record)
+            record = self.format_data(dict(record))
+            batches.setdefault(tuple(record.keys()), []).append(
+                [update_type(val) for val in record.values()])
+
+        for keys, rows in batches.items():
+            sql_query = """INSERT OR REPLACE INTO {table_name} ({insert_keys}) VALUES ({insert_data})""".format(
+                table_name=table_name,
+                insert_keys=",".join(keys),
+                insert_data=",".join('?' * len(keys)),
+            )
+            self.execute_many(sql_query, rows)
+            logger.debug(f"Updating {table_name} table with {len(rows)} rows")
+
     def upsert_government_response_data(self, table_name: str = 'government_response', **kwargs):
         self.upsert_table_data(table_name, **kwargs)
 
@@ -280,35 +348,58 @@ class SqliteHelper(AbstractAdapter):
         self.upsert_table_data(table_name, **kwargs)
 
     def upsert_diagnostics(self, **kwargs):
-        sql_query = """INSERT OR REPLACE INTO diagnostics ({insert_keys}) VALUES ({insert_data})""".format(
+        # Columns not given, like the details of a skipped run, keep their values
+        update_keys = [key for key in kwargs.keys() if key not in ('table_name', 'source')]
+        sql_query = """INSERT INTO diagnostics ({insert_keys}) VALUES ({insert_data})
+                       ON CONFLICT (table_name, source) DO UPDATE SET {update_data}""".format(
             insert_keys=",".join([key for key in kwargs.keys()]),
             insert_data=",".join('?' * len(kwargs)),
+            update_data=",".join(f"{key}=excluded.{key}" for key in update_keys)
         )
         self.execute(sql_query, [update_type(val) for val in kwargs.values()])
+        self.conn.commit()
         logger.debug("Updating diagnostics table with data: {}".format(list(kwargs.values())))
 
+    @staticmethod
+    def parse_date(value: str) -> date:
+        # Dates are stored as ISO 8601 text
+        return date.fromisoformat(value[:10]) if value else None
+
     def get_earliest_timestamp(self, table_name: str, source: str = None):
         sql_str = """SELECT min(date) as date FROM {table_name}"""
         if source:
-            sql_str = sql_str + """ WHERE source = %s"""
+            sql_str = sql_str + """ WHERE source = ?"""
 
         sql_query = sql_str.format(table_name=table_name)
 
-        result = self.execute(sql_query, (source,))
-        return result[0]['date'] if len(result) > 0 else None
+        result = self.execute(sql_query, (source,) if source else None)
+        return self.parse_date(result[0][0]) if len(result) > 0 else None
 
     def get_latest_timestamp(self, table_name: str, source: str = None):
         sql_str = """SELECT max(date) as date FROM {table_name}"""
         if source:
-            sql_str = sql_str + """ WHERE source = %s"""
+            sql_str = sql_str + """ WHERE source = ?"""
+
+        sql_query = sql_str.format(table_name=table_name)
+
+        result = self.execute(sql_query, (source,) if source else None)
+        return self.parse_date(result[0][0]) if len(result) > 0 else None
+
+    def get_details(self, table_name: str, source: str = None):
+        sql_str = """SELECT country, min(date) as min_date, max(date) as max_date, count(*) as rows FROM {table_name}"""
+        if source:
+            sql_str = sql_str + """ WHERE source = ?"""
+        sql_str = sql_str + " GROUP BY country"
 
         sql_query = sql_str.format(table_name=table_name)
 
-        result = self.execute(sql_query, (source,))
-        return result[0]['date'] if len(result) > 0 else None
+        result = self.execute(sql_query, (source,) if source else None)
+        columns = ['country', 'min_date', 'max_date', 'rows']
+        return json.dumps([dict(zip(columns, row)) for row in result])
 
     def close_connection(self):
         if self.conn:
+            self.flush()
             if self.cur:
                 self.cur.close()
             self.conn.close()
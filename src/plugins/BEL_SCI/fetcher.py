@@ -24,18 +24,23 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+CASES_URL = 'https://epistat.sciensano.be/Data/COVID19BE_CASES_AGESEX.csv'
+HOSPITALISED_URL = 'https://epistat.sciensano.be/Data/COVID19BE_HOSP.csv'
+DEATHS_URL = 'https://epistat.sciensano.be/Data/COVID19BE_MORT.csv'
+
 
 class BEL_SCIFetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'BEL_SCI'
+    PREFETCH_URLS = (CASES_URL, HOSPITALISED_URL, DEATHS_URL)
+    SKIP_UNCHANGED = True
 
     def region_fetch(self):
         logger.debug('Fetching region-level information')
         # a csv file to be downloaded
         # REGIONS are hard-coded, which was simple as there are only 3 provinces in Belgium
 
-        confirmed_url = 'https://epistat.sciensano.be/Data/COVID19BE_CASES_AGESEX.csv'
-        raw_confirmed = pd.read_csv(confirmed_url)
+        raw_confirmed = pd.read_csv(self.open_url(CASES_URL))
 
         regions = np.array(['Brussels', 'Flanders', 'Wallonia'] * len(
             pd.date_range(raw_confirmed['DATE'].dropna().iloc[0], raw_confirmed['DATE'].dropna().iloc[-1])))
@@ -50,8 +55,7 @@ class BEL_SCIFetcher(BaseEpidemiologyFetcher):
         confirmed['CASES'] = confirmed['CASES'].fillna(0)
         confirmed = confirmed.groupby(['DATE', 'REGION']).sum().groupby(['REGION']).cumsum()
 
-        hospitalised_url = 'https://epistat.sciensano.be/Data/COVID19BE_HOSP.csv'
-        raw_hospitalised = pd.read_csv(hospitalised_url)
+        raw_hospitalised = pd.read_csv(self.open_url(HOSPITALISED_URL))
 
         regions = np.array(['Brussels', 'Flanders', 'Wallonia'] * len(
             pd.date_range(raw_hospitalised['DATE'].dropna().iloc[0], raw_hospitalised['DATE'].dropna().iloc[-1])))
@@ -68,8 +72,7 @@ class BEL_SCIFetcher(BaseEpidemiologyFetcher):
         hospitalised['NEW_IN'] = hospitalised['NEW_IN'].fillna(0)
         hospitalised = hospitalised.groupby(['DATE', 'REGION']).sum().groupby(['REGION']).cumsum()
 
-        death_url = 'https://epistat.sciensano.be/Data/COVID19BE_MORT.csv'
-        raw_death = pd.read_csv(death_url)
+        raw_death = pd.read_csv(self.open_url(DEATHS_URL))
 
         regions = np.array(['Brussels', 'Flanders', 'Wallonia'] * len(
             pd.date_range(raw_death['DATE'].dropna().iloc[0], raw_death['DATE'].dropna().iloc[-1])))
@@ -91,11 +94,9 @@ class BEL_SCIFetcher(BaseEpidemiologyFetcher):
         return data
 
     def province_fetch(self):
-        confirmed_url = 'https://epistat.sciensano.be/Data/COVID19BE_CASES_AGESEX.csv'
-        raw_confirmed = pd.read_csv(confirmed_url)
+        raw_confirmed = pd.read_csv(self.open_url(CASES_URL))
 
-        hospitalised_url = 'https://epistat.sciensano.be/Data/COVID19BE_HOSP.csv'
-        raw_hospitalised = pd.read_csv(hospitalised_url)
+        raw_hospitalised = pd.read_csv(self.open_url(HOSPITALISED_URL))
 
         flanders_provinces = list(raw_confirmed[raw_confirmed['REGION'] == 'Flanders']['PROVINCE'].unique())
         wallonia_provinces = list(raw_confirmed[raw_confirmed['REGION'] == 'Wallonia']['PROVINCE'].unique())
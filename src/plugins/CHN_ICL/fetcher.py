@@ -26,6 +26,8 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+DATA_URL = 'https://github.com/mrc-ide/covid19_mainland_China_report/blob/master/Data/extracted_epidemic_trend.xlsx?raw=true'
+
 """
     site-location: https://github.com/mrc-ide/covid19_mainland_China_report
     COVID19 data for Mainland China created and maintained by mrc-ide
@@ -42,10 +44,12 @@ logger = logging.getLogger(__name__)
 class CHN_ICL_Fetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'CHN_ICL'
+    PREFETCH_URLS = (DATA_URL,)
+    SKIP_UNCHANGED_PAYLOAD = True
 
     def fetch(self, name):
-        url = "https://github.com/mrc-ide/covid19_mainland_China_report/blob/master/Data/extracted_epidemic_trend.xlsx?raw=true"
-        return pd.read_excel(url, sheet_name=name)
+        # The workbook is downloaded once and read for every sheet
+        return pd.read_excel(self.open_url(DATA_URL), sheet_name=name)
 
     # Get the last date indices if more than one cells contain the same date
     def get_last_indices(self, date_list):
@@ -12,9 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import logging
 from datetime import datetime
-import requests
 import os
 import sys
 import csv
@@ -26,6 +26,8 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+MSOA_URL = 'https://coronavirus.data.gov.uk/downloads/msoa_data/MSOAs_latest.json'
+
 
 class EnglandMSOAFetcher(BaseEpidemiologyFetcher):
     ''' a fetcher to collect data from Public Health England'''
@@ -34,10 +36,11 @@ class EnglandMSOAFetcher(BaseEpidemiologyFetcher):
 
     SOURCE = 'GBR_PHE'  # Public Health England
     START_DATE = '2020-02-28'
+    PREFETCH_URLS = (MSOA_URL,)
+    SKIP_UNCHANGED_PAYLOAD = True
 
     def fetch_msoa(self):
-        url = 'https://coronavirus.data.gov.uk/downloads/msoa_data/MSOAs_latest.json'
-        data = requests.get(url).json()
+        data = json.load(self.open_url(MSOA_URL))
         return data["data"]
 
     def week_parse(self, week_number):
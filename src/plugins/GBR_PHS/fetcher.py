@@ -20,7 +20,7 @@
 import logging
 import pandas as pd
 from datetime import datetime, timedelta
-from utils.helper import int_or_none
+from utils.helper import int_or_none_series
 
 __all__ = ('ScotlandFetcher',)
 
@@ -61,71 +61,39 @@ class ScotlandFetcher(BaseEpidemiologyFetcher):
                 datetimeobj = datetimeobj - timedelta(days=1)
                 attempts = attempts - 1
 
+    def parse(self, data, input_adm_area_2):
+        regions = self.adm_translator.tr_frame(
+            pd.DataFrame({'input_adm_area_1': 'Scotland', 'input_adm_area_2': input_adm_area_2}, index=data.index),
+            ['input_adm_area_1', 'input_adm_area_2'],
+            return_original_if_failure=True
+        )
+        return pd.DataFrame({
+            'date': pd.to_datetime(data['Date'].astype(str), format='%Y%m%d').dt.strftime('%Y-%m-%d'),
+            'country': 'United Kingdom',
+            'countrycode': 'GBR',
+            'adm_area_1': regions['adm_area_1'],
+            'adm_area_2': regions['adm_area_2'],
+            'tested': int_or_none_series(data['TotalTests']),
+            'confirmed': int_or_none_series(data['CumulativePositive']),
+            'dead': int_or_none_series(data['CumulativeDeaths']),
+            'gid': regions['gid']
+        })
+
     def run(self):
         logger.debug('Fetching country-level and health-board information')
         logger.warning('GIDs are approximations of health boards by local authorities')
         data = self.fetch_health_board()
 
-        for index, record in data.iterrows():
-            date = datetime.strptime(str(record['Date']), '%Y%m%d').strftime('%Y-%m-%d')
-            input_adm_area_2 = record['HBName'] if record['HBName'] != 'Scotland' else None
-            confirmed = int_or_none(record['CumulativePositive'])
-            deaths = int_or_none(record['CumulativeDeaths'])
-            tested = int_or_none(record['TotalTests'])
-
-            success, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_translator.tr(
-                input_adm_area_1='Scotland',
-                input_adm_area_2=input_adm_area_2,
-                return_original_if_failure=True
-            )
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United Kingdom',
-                'countrycode': 'GBR',
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'tested': tested,
-                'confirmed': confirmed,
-                'dead': deaths,
-                'gid': gid
-            }
-
-            self.upsert_data(**upsert_obj)
+        input_adm_area_2 = data['HBName'].map(lambda name: name if name != 'Scotland' else None)
+        self.upsert_frame(self.parse(data, input_adm_area_2))
 
         logger.debug('Fetching local authority information')
         data = self.fetch_local_authority()
 
-        for index, record in data.iterrows():
-            date = datetime.strptime(str(record['Date']), '%Y%m%d').strftime('%Y-%m-%d')
-            input_adm_area_2 = record['CAName']
-            confirmed = int_or_none(record['CumulativePositive'])
-            deaths = int_or_none(record['CumulativeDeaths'])
-            tested = int_or_none(record['TotalTests'])
-
-            success, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_translator.tr(
-                input_adm_area_1='Scotland',
-                input_adm_area_2=input_adm_area_2,
-                return_original_if_failure=True
-            )
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United Kingdom',
-                'countrycode': 'GBR',
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'tested': tested,
-                'confirmed': confirmed,
-                'dead': deaths,
-                'gid': gid
-            }
-
-            self.upsert_data(**upsert_obj)
-
-            # upsert this at level three as well for mapping
-            upsert_obj['adm_area_3'] = adm_area_2
-            upsert_obj['gid'] = [upsert_obj['gid'][0].split('_')[0] + '.1_1']
-            self.upsert_data(**upsert_obj)
+        local_authority_data = self.parse(data, data['CAName'])
+        self.upsert_frame(local_authority_data)
+
+        # upsert this at level three as well for mapping
+        local_authority_data['adm_area_3'] = local_authority_data['adm_area_2']
+        local_authority_data['gid'] = local_authority_data['gid'].map(lambda gid: [gid[0].split('_')[0] + '.1_1'])
+        self.upsert_frame(local_authority_data)
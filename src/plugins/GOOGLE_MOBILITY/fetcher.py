@@ -34,84 +34,102 @@ class GoogleMobilityFetcher(BaseMobilityFetcher):
         url = 'https://www.gstatic.com/covid19/mobility/Global_Mobility_Report.csv'
         return pd.read_csv(url, low_memory=False)
 
+    def get_mobility_region_input(self, country_region_code, country_region, sub_region_1, sub_region_2):
+        country, countrycode = self.country_codes_translator.get_country_info(
+            country_a2_code=country_region_code,
+            country_name=country_region)
+
+        if pd.isna(countrycode):
+            logger.warning(f'Unable to process: {country_region_code}, {country_region}, '
+                           f'{sub_region_1}, {sub_region_2}')
+            return None
+
+        input_adm_area_1 = sub_region_1.strip() if pd.notna(sub_region_1) else None
+        input_adm_area_2 = sub_region_2.strip() if pd.notna(sub_region_2) else None
+
+        if countrycode == 'USA':
+            if input_adm_area_2:
+                input_adm_area_2 = remove_words(input_adm_area_2, words=['County', 'Parish']) \
+                    .replace('St.', 'Saint').strip()
+        elif countrycode == 'GBR' and input_adm_area_1:
+            # Use sub_region_1 as adm_area_2 for Great Britain
+            # Skip sub_region_2
+            if input_adm_area_2:
+                return None
+            input_adm_area_2 = input_adm_area_1
+            input_adm_area_1 = '%'
+        elif countrycode == 'JAM' and input_adm_area_1:
+            input_adm_area_1 = remove_words(input_adm_area_1, words=['Parish']) \
+                .replace('St.', 'Saint').strip()
+        elif input_adm_area_1:
+            input_adm_area_1 = remove_words(
+                input_adm_area_1,
+                words=['Province', 'District', 'County', 'Region', 'Governorate', 'State of', 'Department'])
+
+        return country, countrycode, input_adm_area_1, input_adm_area_2
+
+    def get_mobility_region(self, region_input, adm_area_1, adm_area_2, gid, unknown_regions):
+        country, countrycode, input_adm_area_1, input_adm_area_2 = region_input
+
+        if not gid:
+            key = (countrycode, input_adm_area_1, input_adm_area_2, '')
+            if key not in unknown_regions:
+                logger.warning(
+                    f'Unable to find translation for: "{countrycode}", '
+                    f'"{input_adm_area_1}", "{input_adm_area_2}" ')
+            unknown_regions.add(key)
+            return None
+
+        return country, countrycode, adm_area_1, adm_area_2, gid
+
     def run(self):
         data = self.fetch()
 
         unknown_regions = set()
-        region_cache = dict()
-
-        for index, record in data.iterrows():
-            date = record['date']
-
-            country, countrycode = self.country_codes_translator.get_country_info(
-                country_a2_code=record['country_region_code'],
-                country_name=record['country_region'])
-
-            if pd.isna(countrycode):
-                logger.warning(f'Unable to process: {record}')
-                continue
-
-            input_adm_area_1 = record['sub_region_1'].strip() if pd.notna(record['sub_region_1']) else None
-            input_adm_area_2 = record['sub_region_2'].strip() if pd.notna(record['sub_region_2']) else None
-
-            if countrycode == 'USA':
-                if input_adm_area_2:
-                    input_adm_area_2 = remove_words(input_adm_area_2, words=['County', 'Parish']) \
-                        .replace('St.', 'Saint').strip()
-            elif countrycode == 'GBR' and input_adm_area_1:
-                # Use sub_region_1 as adm_area_2 for Great Britain
-                # Skip sub_region_2
-                if input_adm_area_2:
-                    continue
-                input_adm_area_2 = input_adm_area_1
-                input_adm_area_1 = '%'
-            elif countrycode == 'JAM' and input_adm_area_1:
-                input_adm_area_1 = remove_words(input_adm_area_1, words=['Parish']) \
-                    .replace('St.', 'Saint').strip()
-            elif input_adm_area_1:
-                input_adm_area_1 = remove_words(
-                    input_adm_area_1,
-                    words=['Province', 'District', 'County', 'Region', 'Governorate', 'State of', 'Department'])
-
-            key = (countrycode, input_adm_area_1, input_adm_area_2, '')
 
-            # FOR DEBUGGING PURPOSE ONLY
-            # if key in region_cache:
-            #     continue
-
-            if key in region_cache:
-                adm_area_1, adm_area_2, adm_area_3, gid = region_cache.get(key)
-            else:
-                adm_area_1, adm_area_2, adm_area_3, gid = self.get_region(
-                    countrycode, input_adm_area_1, input_adm_area_2,
-                    suppress_exception=True)
-                region_cache[key] = (adm_area_1, adm_area_2, adm_area_3, gid)
-
-            if not gid:
-                if key not in unknown_regions:
-                    logger.warning(
-                        f'Unable to find translation for: "{countrycode}", '
-                        f'"{input_adm_area_1}", "{input_adm_area_2}" ')
-                unknown_regions.add(key)
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': country,
-                'countrycode': countrycode,
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'gid': gid,
-                'transit_stations': record['transit_stations_percent_change_from_baseline'],
-                'residential': record['residential_percent_change_from_baseline'],
-                'workplace': record['workplaces_percent_change_from_baseline'],
-                'parks': record['parks_percent_change_from_baseline'],
-                'retail_recreation': record['retail_and_recreation_percent_change_from_baseline'],
-                'grocery_pharmacy': record['grocery_and_pharmacy_percent_change_from_baseline']
-            }
-
-            if gid:
-                self.upsert_data(**upsert_obj)
+        # Every distinct region is resolved once and mapped back to all its rows
+        region_columns = ['country_region_code', 'country_region', 'sub_region_1', 'sub_region_2']
+        region_data = data[region_columns].astype(object)
+        region_data = region_data.where(region_data.notna(), None)
+        keys = list(zip(*(region_data[column] for column in region_columns)))
+
+        region_inputs = dict()
+        for key in keys:
+            if key not in region_inputs:
+                region_inputs[key] = self.get_mobility_region_input(*key)
+
+        # Distinct region inputs are translated as one frame, regions missing in translation.csv are looked up together
+        input_keys = [key for key, region_input in region_inputs.items() if region_input]
+        inputs = pd.DataFrame([region_inputs[key] for key in input_keys],
+                              columns=['country', 'countrycode', 'input_adm_area_1', 'input_adm_area_2'])
+        input_regions = self.get_regions(inputs, ['input_adm_area_1', 'input_adm_area_2'],
+                                         countrycode_column='countrycode', suppress_exception=True)
+
+        regions = dict.fromkeys(region_inputs)
+        for key, adm_area_1, adm_area_2, gid in zip(input_keys, input_regions['adm_area_1'],
+                                                    input_regions['adm_area_2'], input_regions['gid']):
+            regions[key] = self.get_mobility_region(region_inputs[key], adm_area_1, adm_area_2, gid, unknown_regions)
+
+        resolved = [regions[key] for key in keys]
+        data = data[[region is not None for region in resolved]].reset_index(drop=True)
+        region_columns = ['country', 'countrycode', 'adm_area_1', 'adm_area_2', 'gid']
+        data[region_columns] = pd.DataFrame([region for region in resolved if region is not None],
+                                            columns=region_columns)
+
+        self.upsert_frame(data, columns={
+            'date': 'date',
+            'country': 'country',
+            'countrycode': 'countrycode',
+            'adm_area_1': 'adm_area_1',
+            'adm_area_2': 'adm_area_2',
+            'gid': 'gid',
+            'transit_stations': 'transit_stations_percent_change_from_baseline',
+            'residential': 'residential_percent_change_from_baseline',
+            'workplace': 'workplaces_percent_change_from_baseline',
+            'parks': 'parks_percent_change_from_baseline',
+            'retail_recreation': 'retail_and_recreation_percent_change_from_baseline',
+            'grocery_pharmacy': 'grocery_and_pharmacy_percent_change_from_baseline'
+        })
 
         # FOR DEBUGGING PURPOSE ONLY - save unknown regions into CSV file
         logger.warning('Unknown regions total: {}'.format(len(unknown_regions)))
@@ -19,7 +19,7 @@ import pandas as pd
 import numpy as np
 
 from utils.fetcher.base_government_response import BaseGovernmentResponseFetcher
-from .utils import parser, to_int
+from .utils import parser, to_int_series
 from datetime import datetime, timedelta
 
 __all__ = ('StringencyFetcher',)
@@ -62,55 +62,59 @@ class StringencyFetcher(BaseGovernmentResponseFetcher):
     def run(self):
         # RAW Govtrack data
         raw_govtrack_data = self.fetch_csv()
-        for index, record in raw_govtrack_data.iterrows():
-            if pd.isna(record['English short name lower case']):
-                logger.error(f"Unable to decode: {record['CountryCode']} -> {record['CountryName']} ")
+        for index, record in raw_govtrack_data[raw_govtrack_data['English short name lower case'].isna()].iterrows():
+            logger.error(f"Unable to decode: {record['CountryCode']} -> {record['CountryName']} ")
 
-            upsert_obj = {
-                'source': self.SOURCE,
-                'gid': record['CountryCode'],
-                'country': record['English short name lower case'],
-                'countrycode': record['CountryCode'],
-                'date': pd.to_datetime(record['Date'], format='%Y%m%d').strftime('%Y-%m-%d'),
-                'c1_school_closing': to_int(record['C1_School closing']),
-                'c1_flag': to_int(record['C1_Flag']),
-                'c2_workplace_closing': to_int(record['C2_Workplace closing']),
-                'c2_flag': to_int(record['C2_Flag']),
-                'c3_cancel_public_events': to_int(record['C3_Cancel public events']),
-                'c3_flag': to_int(record['C3_Flag']),
-                'c4_restrictions_on_gatherings': to_int(record['C4_Restrictions on gatherings']),
-                'c4_flag': to_int(record['C4_Flag']),
-                'c5_close_public_transport': to_int(record['C5_Close public transport']),
-                'c5_flag': to_int(record['C5_Flag']),
-                'c6_stay_at_home_requirements': to_int(record['C6_Stay at home requirements']),
-                'c6_flag': to_int(record['C6_Flag']),
-                'c7_restrictions_on_internal_movement': to_int(record['C7_Restrictions on internal movement']),
-                'c7_flag': to_int(record['C7_Flag']),
-                'c8_international_travel_controls': to_int(record['C8_International travel controls']),
-                'e1_income_support': to_int(record['E1_Income support']),
-                'e1_flag': to_int(record['E1_Flag']),
-                'e2_debtcontract_relief': to_int(record['E2_Debt/contract relief']),
-                'e3_fiscal_measures': record['E3_Fiscal measures'],
-                'e4_international_support': record['E4_International support'],
-                'h1_public_information_campaigns': to_int(record['H1_Public information campaigns']),
-                'h1_flag': to_int(record['H1_Flag']),
-                'h2_testing_policy': to_int(record['H2_Testing policy']),
-                'h3_contact_tracing': to_int(record['H3_Contact tracing']),
-                'h4_emergency_investment_in_healthcare': record['H4_Emergency investment in healthcare'],
-                'h5_investment_in_vaccines': record['H5_Investment in vaccines'],
-                'm1_wildcard': record['M1_Wildcard'],
-                'stringency_index': record['StringencyIndex'],
-                'stringency_indexfordisplay': record['StringencyIndexForDisplay'],
-                'stringency_legacy_index': record['StringencyLegacyIndex'],
-                'stringency_legacy_indexfordisplay': record['StringencyLegacyIndexForDisplay'],
-                'government_response_index': record['GovernmentResponseIndex'],
-                'government_response_index_for_display': record['GovernmentResponseIndexForDisplay'],
-                'containment_health_index': record['ContainmentHealthIndex'],
-                'containment_health_index_for_display': record['ContainmentHealthIndexForDisplay'],
-                'economic_support_index': record['EconomicSupportIndex'],
-                'economic_support_index_for_display': record['EconomicSupportIndexForDisplay']
-            }
-            self.upsert_data(**upsert_obj)
+        int_columns = {
+            'c1_school_closing': 'C1_School closing',
+            'c1_flag': 'C1_Flag',
+            'c2_workplace_closing': 'C2_Workplace closing',
+            'c2_flag': 'C2_Flag',
+            'c3_cancel_public_events': 'C3_Cancel public events',
+            'c3_flag': 'C3_Flag',
+            'c4_restrictions_on_gatherings': 'C4_Restrictions on gatherings',
+            'c4_flag': 'C4_Flag',
+            'c5_close_public_transport': 'C5_Close public transport',
+            'c5_flag': 'C5_Flag',
+            'c6_stay_at_home_requirements': 'C6_Stay at home requirements',
+            'c6_flag': 'C6_Flag',
+            'c7_restrictions_on_internal_movement': 'C7_Restrictions on internal movement',
+            'c7_flag': 'C7_Flag',
+            'c8_international_travel_controls': 'C8_International travel controls',
+            'e1_income_support': 'E1_Income support',
+            'e1_flag': 'E1_Flag',
+            'e2_debtcontract_relief': 'E2_Debt/contract relief',
+            'h1_public_information_campaigns': 'H1_Public information campaigns',
+            'h1_flag': 'H1_Flag',
+            'h2_testing_policy': 'H2_Testing policy',
+            'h3_contact_tracing': 'H3_Contact tracing'
+        }
+        columns = {
+            'gid': 'CountryCode',
+            'country': 'English short name lower case',
+            'countrycode': 'CountryCode',
+            'e3_fiscal_measures': 'E3_Fiscal measures',
+            'e4_international_support': 'E4_International support',
+            'h4_emergency_investment_in_healthcare': 'H4_Emergency investment in healthcare',
+            'h5_investment_in_vaccines': 'H5_Investment in vaccines',
+            'm1_wildcard': 'M1_Wildcard',
+            'stringency_index': 'StringencyIndex',
+            'stringency_indexfordisplay': 'StringencyIndexForDisplay',
+            'stringency_legacy_index': 'StringencyLegacyIndex',
+            'stringency_legacy_indexfordisplay': 'StringencyLegacyIndexForDisplay',
+            'government_response_index': 'GovernmentResponseIndex',
+            'government_response_index_for_display': 'GovernmentResponseIndexForDisplay',
+            'containment_health_index': 'ContainmentHealthIndex',
+            'containment_health_index_for_display': 'ContainmentHealthIndexForDisplay',
+            'economic_support_index': 'EconomicSupportIndex',
+            'economic_support_index_for_display': 'EconomicSupportIndexForDisplay'
+        }
+
+        upsert_df = pd.DataFrame({column: raw_govtrack_data[csv_column] for column, csv_column in columns.items()})
+        upsert_df['date'] = pd.to_datetime(raw_govtrack_data['Date'], format='%Y%m%d').dt.strftime('%Y-%m-%d')
+        for column, csv_column in int_columns.items():
+            upsert_df[column] = to_int_series(raw_govtrack_data[csv_column])
+        self.upsert_frame(upsert_df)
 
         # GOVTRACK data from API
         govtrack_data = self.fetch()
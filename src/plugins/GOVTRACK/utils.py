@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import pandas as pd
 from typing import Dict
 
@@ -41,3 +42,8 @@ def parser(api_data: Dict, country_codes_translator: CountryCodesTranslator):
 
 def to_int(data):
     return int(data) if pd.notna(data) else None
+
+
+def to_int_series(data: pd.Series) -> pd.Series:
+    # Same as to_int for every value of the series
+    return np.trunc(pd.to_numeric(data).astype(float)).astype('Int64')
@@ -28,24 +28,28 @@ __all__ = ('IndiaCOVINDFetcher',)
 
 logger = logging.getLogger(__name__)
 
+CASES_URL = 'https://api.covid19india.org/csv/latest/case_time_series.csv'
+TESTED_URL = 'https://api.covid19india.org/csv/latest/tested_numbers_icmr_data.csv'
+STATE_CASES_URL = 'https://api.covid19india.org/csv/latest/state_wise_daily.csv'
+STATE_TESTED_URL = 'https://api.covid19india.org/csv/latest/statewise_tested_numbers_data.csv'
+
 
 class IndiaCOVINDFetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'IND_COVIND'
+    PREFETCH_URLS = (CASES_URL, TESTED_URL, STATE_CASES_URL, STATE_TESTED_URL)
+    SKIP_UNCHANGED = True
 
     def fetch_cases(self):
-        url = 'https://api.covid19india.org/csv/latest/case_time_series.csv'
-        return pd.read_csv(url,
+        return pd.read_csv(self.open_url(CASES_URL),
                            index_col='Date_YMD',
                            usecols=['Date_YMD', 'Total Confirmed', 'Total Recovered', 'Total Deceased'],
                            parse_dates=['Date_YMD'],
                            date_parser=lambda d: pd.to_datetime(d, format='%Y-%m-%d'))
 
     def fetch_tested(self):
-        url = 'https://api.covid19india.org/csv/latest/tested_numbers_icmr_data.csv'
-
         # Return the last update on each day
-        return pd.read_csv(url,
+        return pd.read_csv(self.open_url(TESTED_URL),
                            index_col='Update Time Stamp',
                            usecols=['Update Time Stamp', 'Total Samples Tested'],
                            parse_dates=['Update Time Stamp'],
@@ -55,10 +59,8 @@ class IndiaCOVINDFetcher(BaseEpidemiologyFetcher):
             .last()
 
     def fetch_state_cases(self):
-        url = 'https://api.covid19india.org/csv/latest/state_wise_daily.csv'
-
         # Return cumulative sums for each state
-        return pd.read_csv(url,
+        return pd.read_csv(self.open_url(STATE_CASES_URL),
                            index_col=['Date_YMD', 'Status'],
                            usecols=[c for c in range(1, 41) if c != 3],
                            parse_dates=['Date_YMD'],
@@ -69,10 +71,8 @@ class IndiaCOVINDFetcher(BaseEpidemiologyFetcher):
             .stack(level=0)
 
     def fetch_state_tested(self):
-        url = 'https://api.covid19india.org/csv/latest/statewise_tested_numbers_data.csv'
-
         # Return the last update on each day for each state
-        return pd.read_csv(url,
+        return pd.read_csv(self.open_url(STATE_TESTED_URL),
                            index_col=['Updated On', 'State'],
                            usecols=['Updated On', 'State', 'Total Tested'],
                            parse_dates=['Updated On'],
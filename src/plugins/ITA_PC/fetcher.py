@@ -26,18 +26,23 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+DATA_URL = 'https://raw.githubusercontent.com/pcm-dpc/COVID-19/master/'
+REGIONS_URL = DATA_URL + 'dati-regioni/dpc-covid19-ita-regioni.csv'
+PROVINCES_URL = DATA_URL + 'dati-province/dpc-covid19-ita-province.csv'
+
 
 class ItalyPCFetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'ITA_PC'
+    PREFETCH_URLS = (REGIONS_URL, PROVINCES_URL)
+    SKIP_UNCHANGED = True
 
-    def fetch(self, category):
-        return pd.read_csv(f'https://raw.githubusercontent.com/pcm-dpc/COVID-19/'
-                           f'master/dati-{category}/dpc-covid19-ita-{category}.csv')
+    def fetch(self, url):
+        return pd.read_csv(self.open_url(url))
 
     def run(self):
         logger.debug('Going to fetch Protezione Civile data for regions')
-        data = self.fetch('regioni')
+        data = self.fetch(REGIONS_URL)
 
         for index, record in data.iterrows():
             # data,stato,codice_regione,denominazione_regione,lat,long,ricoverati_con_sintomi,
@@ -82,7 +87,7 @@ class ItalyPCFetcher(BaseEpidemiologyFetcher):
             self.upsert_data(**upsert_obj)
 
         logger.debug('Going to fetch Protezione Civile data for provinces')
-        data = self.fetch('province')
+        data = self.fetch(PROVINCES_URL)
 
         for index, record in data.iterrows():
             # data,stato,codice_regione,denominazione_regione,codice_provincia,
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
 import logging
 import pandas as pd
 
@@ -31,6 +30,17 @@ class UnitedStatesCTPFetcher(BaseEpidemiologyFetcher):
         return pd.read_csv(f'https://covidtracking.com/api/v1/{category}/daily.csv',
                            usecols=usecols)
 
+    def parse(self, data):
+        return pd.DataFrame({
+            'date': pd.to_datetime(data['date'].astype(int).astype(str), format='%Y%m%d').dt.strftime('%Y-%m-%d'),
+            'tested': data['totalTestResults'].astype('Int64'),
+            'confirmed': data['positive'].astype('Int64'),
+            'recovered': data['recovered'].astype('Int64'),
+            'dead': data['death'].astype('Int64'),
+            'hospitalised': data['hospitalizedCumulative'].astype('Int64'),
+            'hospitalised_icu': data['inIcuCumulative'].astype('Int64')
+        })
+
     def run(self):
         logger.debug('Fetching country-level information')
         data = self.fetch('us',
@@ -42,29 +52,11 @@ class UnitedStatesCTPFetcher(BaseEpidemiologyFetcher):
                            'death',
                            'totalTestResults'])
 
-        for index, record in data.iterrows():
-            date = datetime.strptime(str(int(record[0])), '%Y%m%d').strftime('%Y-%m-%d')
-            confirmed = int(record[1]) if pd.notna(record[1]) else None
-            hospitalised = int(record[2]) if pd.notna(record[2]) else None
-            hospitalised_icu = int(record[3]) if pd.notna(record[3]) else None
-            recovered = int(record[4]) if pd.notna(record[4]) else None
-            dead = int(record[5]) if pd.notna(record[5]) else None
-            tested = int(record[6]) if pd.notna(record[6]) else None
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United States',
-                'countrycode': 'USA',
-                'tested': tested,
-                'confirmed': confirmed,
-                'recovered': recovered,
-                'dead': dead,
-                'hospitalised': hospitalised,
-                'hospitalised_icu': hospitalised_icu,
-                'gid': ['USA']
-            }
-            self.upsert_data(**upsert_obj)
+        self.upsert_frame(self.parse(data), constants={
+            'country': 'United States',
+            'countrycode': 'USA',
+            'gid': ['USA']
+        })
 
         logger.debug('Fetching regional information')
         data = self.fetch('states',
@@ -77,38 +69,13 @@ class UnitedStatesCTPFetcher(BaseEpidemiologyFetcher):
                            'death',
                            'totalTestResults'])
 
-        for index, record in data.iterrows():
-            date = datetime.strptime(str(int(record[0])), '%Y%m%d').strftime('%Y-%m-%d')
-            state = record[1]
-            confirmed = int(record[2]) if pd.notna(record[2]) else None
-            hospitalised = int(record[3]) if pd.notna(record[3]) else None
-            hospitalised_icu = int(record[4]) if pd.notna(record[4]) else None
-            recovered = int(record[5]) if pd.notna(record[5]) else None
-            dead = int(record[6]) if pd.notna(record[6]) else None
-            tested = int(record[7]) if pd.notna(record[7]) else None
-
-            success, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_translator.tr(
-                country_code='USA',
-                input_adm_area_1=state,
-                input_adm_area_2=None,
-                input_adm_area_3=None,
-                return_original_if_failure=True
-            )
+        regions = self.adm_translator.tr_frame(
+            data, ['state'],
+            country_code='USA',
+            return_original_if_failure=True
+        )
 
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United States',
-                'countrycode': 'USA',
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'adm_area_3': adm_area_3,
-                'tested': tested,
-                'confirmed': confirmed,
-                'recovered': recovered,
-                'dead': dead,
-                'hospitalised': hospitalised,
-                'hospitalised_icu': hospitalised_icu,
-                'gid': gid
-            }
-            self.upsert_data(**upsert_obj)
+        self.upsert_frame(pd.concat([self.parse(data), regions], axis=1), constants={
+            'country': 'United States',
+            'countrycode': 'USA'
+        })
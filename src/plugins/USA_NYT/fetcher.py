@@ -26,84 +26,58 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+DATA_URL = 'https://raw.githubusercontent.com/nytimes/covid-19-data/master/'
+COUNTIES_URL = DATA_URL + 'us-counties.csv'
+STATES_URL = DATA_URL + 'us-states.csv'
+
 
 class UnitedStatesNYTFetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'USA_NYT'
-
-    def fetch(self, category):
-        return pd.read_csv(f'https://raw.githubusercontent.com/nytimes/covid-19-data/'
-                           f'master/{category}.csv')
+    PREFETCH_URLS = (COUNTIES_URL, STATES_URL)
+    SKIP_UNCHANGED = True
+
+    def fetch(self, url):
+        return pd.read_csv(self.open_url(url))
+
+    def upsert_records(self, data, regions):
+        self.upsert_frame(pd.DataFrame({
+            'source': self.SOURCE,
+            'date': data['date'],
+            'country': 'United States',
+            'countrycode': 'USA',
+            'adm_area_1': regions['adm_area_1'],
+            'adm_area_2': regions['adm_area_2'],
+            'adm_area_3': regions['adm_area_3'],
+            'confirmed': data['cases'].astype(int),
+            'dead': data['deaths'].astype('Int64'),
+            'gid': regions['gid']
+        }))
 
     def run(self):
         logger.debug('Going to fetch the NY Times US counties')
-        data = self.fetch('us-counties')
-
-        for index, record in data.iterrows():
-            # date,county,state,fips,cases,deaths
-            date = record[0]
-            county = record[1]
-            state = record[2]
-            cases = int(record[4])
-            deaths = int(record[5]) if pd.notna(record[5]) else None
-
-            # Skip "Unknown" counties and a few cities
-            if county in ('Unknown', 'Wrangell City and Borough', 'Baltimore',
-                          'Joplin', 'Kansas City', 'St. Louis city'):
-                continue
-            if state == 'Virginia' and county in ('Franklin city', 'Richmond'):
-                continue
+        # date,county,state,fips,cases,deaths
+        data = self.fetch(COUNTIES_URL)
 
-            success, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_translator.tr(
-                country_code='USA',
-                input_adm_area_1=state,
-                input_adm_area_2=county,
-                input_adm_area_3=None,
-                return_original_if_failure=True
-            )
+        # Skip "Unknown" counties and a few cities
+        data = data[~data['county'].isin(('Unknown', 'Wrangell City and Borough', 'Baltimore',
+                                          'Joplin', 'Kansas City', 'St. Louis city'))]
+        data = data[~((data['state'] == 'Virginia') & data['county'].isin(('Franklin city', 'Richmond')))]
 
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United States',
-                'countrycode': 'USA',
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'adm_area_3': adm_area_3,
-                'confirmed': cases,
-                'dead': deaths,
-                'gid': gid
-            }
-            self.upsert_data(**upsert_obj)
+        regions = self.adm_translator.tr_frame(
+            data, ['state', 'county'],
+            country_code='USA',
+            return_original_if_failure=True
+        )
+        self.upsert_records(data, regions)
 
         logger.debug('Going to fetch the NY Times US States')
-        data = self.fetch('us-states')
-
-        for index, record in data.iterrows():
-            # date,state,fips,cases,deaths
-            date = record[0]
-            state = record[1]
-            cases = int(record[3])
-            deaths = int(record[4])
-
-            success, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_translator.tr(
-                country_code='USA',
-                input_adm_area_1=state,
-                input_adm_area_2=None,
-                input_adm_area_3=None,
-                return_original_if_failure=True
-            )
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'United States',
-                'countrycode': 'USA',
-                'adm_area_1': adm_area_1,
-                'adm_area_2': adm_area_2,
-                'adm_area_3': adm_area_3,
-                'confirmed': cases,
-                'dead': deaths,
-                'gid': gid
-            }
-            self.upsert_data(**upsert_obj)
+        # date,state,fips,cases,deaths
+        data = self.fetch(STATES_URL)
+
+        regions = self.adm_translator.tr_frame(
+            data, ['state'],
+            country_code='USA',
+            return_original_if_failure=True
+        )
+        self.upsert_records(data, regions)
@@ -24,6 +24,21 @@ __all__ = ('METDailyWeatherFetcher',)
 
 logger = logging.getLogger(__name__)
 
+WEATHER_COLUMNS = [
+    'source', 'date', 'gid', 'country', 'countrycode', 'adm_area_1', 'adm_area_2', 'adm_area_3', 'samplesize',
+    'precipitation_max_avg', 'precipitation_max_std', 'precipitation_mean_avg', 'precipitation_mean_std',
+    'humidity_max_avg', 'humidity_max_std', 'humidity_mean_avg', 'humidity_mean_std', 'humidity_min_avg',
+    'humidity_min_std', 'sunshine_max_avg', 'sunshine_max_std', 'sunshine_mean_avg', 'sunshine_mean_std',
+    'temperature_max_avg', 'temperature_max_std', 'temperature_mean_avg', 'temperature_mean_std',
+    'temperature_min_avg', 'temperature_min_std', 'windgust_max_avg', 'windgust_max_std', 'windgust_mean_avg',
+    'windgust_mean_std', 'windgust_min_avg', 'windgust_min_std', 'windspeed_max_avg', 'windspeed_max_std',
+    'windspeed_mean_avg', 'windspeed_mean_std', 'windspeed_min_avg', 'windspeed_min_std',
+    'cloudaltitude_max_valid', 'cloudaltitude_max_avg', 'cloudaltitude_max_std', 'cloudaltitude_min_valid',
+    'cloudaltitude_min_avg', 'cloudaltitude_min_std', 'cloudaltitude_mean_valid', 'cloudaltitude_mean_avg',
+    'cloudaltitude_mean_std', 'cloudfrac_max_avg', 'cloudfrac_max_std', 'cloudfrac_min_avg',
+    'cloudfrac_min_std', 'cloudfrac_mean_avg', 'cloudfrac_mean_std'
+]
+
 
 class METDailyWeatherFetcher(BaseWeatherFetcher):
     LOAD_PLUGIN = True
@@ -70,63 +85,4 @@ class METDailyWeatherFetcher(BaseWeatherFetcher):
             if new_data is None:
                 continue
 
-            for index, row in new_data.iterrows():
-                upsert_obj = {
-                    'source': row['source'],
-                    'date': row['date'],
-                    'gid': [row['gid']],
-                    'country': row['country'],
-                    'countrycode': row['countrycode'],
-                    'adm_area_1': row['adm_area_1'],
-                    'adm_area_2': row['adm_area_2'],
-                    'adm_area_3': row['adm_area_3'],
-                    'samplesize': row['samplesize'],
-                    'precipitation_max_avg': row['precipitation_max_avg'],
-                    'precipitation_max_std': row['precipitation_max_std'],
-                    'precipitation_mean_avg': row['precipitation_mean_avg'],
-                    'precipitation_mean_std': row['precipitation_mean_std'],
-                    'humidity_max_avg': row['humidity_max_avg'],
-                    'humidity_max_std': row['humidity_max_std'],
-                    'humidity_mean_avg': row['humidity_mean_avg'],
-                    'humidity_mean_std': row['humidity_mean_std'],
-                    'humidity_min_avg': row['humidity_min_avg'],
-                    'humidity_min_std': row['humidity_min_std'],
-                    'sunshine_max_avg': row['sunshine_max_avg'],
-                    'sunshine_max_std': row['sunshine_max_std'],
-                    'sunshine_mean_avg': row['sunshine_mean_avg'],
-                    'sunshine_mean_std': row['sunshine_mean_std'],
-                    'temperature_max_avg': row['temperature_max_avg'],
-                    'temperature_max_std': row['temperature_max_std'],
-                    'temperature_mean_avg': row['temperature_mean_avg'],
-                    'temperature_mean_std': row['temperature_mean_std'],
-                    'temperature_min_avg': row['temperature_min_avg'],
-                    'temperature_min_std': row['temperature_min_std'],
-                    'windgust_max_avg': row['windgust_max_avg'],
-                    'windgust_max_std': row['windgust_max_std'],
-                    'windgust_mean_avg': row['windgust_mean_avg'],
-                    'windgust_mean_std': row['windgust_mean_std'],
-                    'windgust_min_avg': row['windgust_min_avg'],
-                    'windgust_min_std': row['windgust_min_std'],
-                    'windspeed_max_avg': row['windspeed_max_avg'],
-                    'windspeed_max_std': row['windspeed_max_std'],
-                    'windspeed_mean_avg': row['windspeed_mean_avg'],
-                    'windspeed_mean_std': row['windspeed_mean_std'],
-                    'windspeed_min_avg': row['windspeed_min_avg'],
-                    'windspeed_min_std': row['windspeed_min_std'],
-                    'cloudaltitude_max_valid': row['cloudaltitude_max_valid'],
-                    'cloudaltitude_max_avg': row['cloudaltitude_max_avg'],
-                    'cloudaltitude_max_std': row['cloudaltitude_max_std'],
-                    'cloudaltitude_min_valid': row['cloudaltitude_min_valid'],
-                    'cloudaltitude_min_avg': row['cloudaltitude_min_avg'],
-                    'cloudaltitude_min_std': row['cloudaltitude_min_std'],
-                    'cloudaltitude_mean_valid': row['cloudaltitude_mean_valid'],
-                    'cloudaltitude_mean_avg': row['cloudaltitude_mean_avg'],
-                    'cloudaltitude_mean_std': row['cloudaltitude_mean_std'],
-                    'cloudfrac_max_avg': row['cloudfrac_max_avg'],
-                    'cloudfrac_max_std': row['cloudfrac_max_std'],
-                    'cloudfrac_min_avg': row['cloudfrac_min_avg'],
-                    'cloudfrac_min_std': row['cloudfrac_min_std'],
-                    'cloudfrac_mean_avg': row['cloudfrac_mean_avg'],
-                    'cloudfrac_mean_std': row['cloudfrac_mean_std']
-                }
-                self.upsert_data(**upsert_obj)
+            self.upsert_frame(new_data[WEATHER_COLUMNS])
@@ -69,81 +69,59 @@ class WorldECDCFetcher(BaseEpidemiologyFetcher):
     def run(self):
         data = self.fetch()
 
-        for index, record in data.iterrows():
-
-            date = record['year_week']
-
-            country_code = record['country_code']
-            if pd.isna(country_code):
-                continue
-
+        countries_data = data[data['country_code'].notna()]
+        countries = dict()
+        for country_code in countries_data['country_code'].unique():
             country, adm_area_1, adm_area_2, adm_area_3, gid = self.data_adapter.get_adm_division(country_code)
-            confirmed = int(record['cases'])
-            dead = int(record['deaths'])
-
             if gid is None:
                 logger.error(f'No GID for : {country_code}')
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date.strftime('%Y-%m-%d'),
-                'country': country,
-                'countrycode': country_code,
-                'adm_area_1': None,
-                'adm_area_2': None,
-                'adm_area_3': None,
-                'gid': [country_code],
-                'confirmed': confirmed,
-                'dead': dead
-            }
-            self.upsert_data(**upsert_obj)
+            countries[country_code] = country
+
+        self.upsert_frame(pd.DataFrame({
+            'date': countries_data['year_week'].dt.strftime('%Y-%m-%d'),
+            'country': countries_data['country_code'].map(countries),
+            'countrycode': countries_data['country_code'],
+            'gid': countries_data['country_code'],
+            'confirmed': countries_data['cases'].astype(int),
+            'dead': countries_data['deaths'].astype(int)
+        }), constants={
+            'adm_area_1': None,
+            'adm_area_2': None,
+            'adm_area_3': None
+        })
 
         # now group by continent
         grouped = data.groupby(['year_week', 'continent'], as_index=False)
         continentaldf = grouped[['cases', 'deaths']].sum()
-
-        for index, record in continentaldf.iterrows():
-            date = record['year_week']
-            continent = 'Other continent' if record['continent'] == 'Other' else record['continent']
-            confirmed = int(record['cases'])
-            dead = int(record['deaths'])
-
-            continent_code = continents_codes.get(continent)
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date.strftime('%Y-%m-%d'),
-                'country': continent,
-                'countrycode': continent_code,
-                'adm_area_1': None,
-                'adm_area_2': None,
-                'adm_area_3': None,
-                'gid': None,
-                'confirmed': confirmed,
-                'dead': dead
-            }
-            self.upsert_data(**upsert_obj)
+        continents = continentaldf['continent'].replace('Other', 'Other continent')
+
+        self.upsert_frame(pd.DataFrame({
+            'date': continentaldf['year_week'].dt.strftime('%Y-%m-%d'),
+            'country': continents,
+            'countrycode': continents.map(continents_codes),
+            'confirmed': continentaldf['cases'].astype(int),
+            'dead': continentaldf['deaths'].astype(int)
+        }), constants={
+            'adm_area_1': None,
+            'adm_area_2': None,
+            'adm_area_3': None,
+            'gid': None
+        })
 
         # now group for global figure
 
         grouped = continentaldf.groupby(['year_week'], as_index=False)
         globaldf = grouped[['cases', 'deaths']].sum()
 
-        for index, record in globaldf.iterrows():
-            date = record['year_week']
-            confirmed = int(record['cases'])
-            dead = int(record['deaths'])
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date.strftime('%Y-%m-%d'),
-                'country': 'World',
-                'countrycode': 'WRD',
-                'adm_area_1': None,
-                'adm_area_2': None,
-                'adm_area_3': None,
-                'gid': None,
-                'confirmed': confirmed,
-                'dead': dead
-            }
-            self.upsert_data(**upsert_obj)
+        self.upsert_frame(pd.DataFrame({
+            'date': globaldf['year_week'].dt.strftime('%Y-%m-%d'),
+            'confirmed': globaldf['cases'].astype(int),
+            'dead': globaldf['deaths'].astype(int)
+        }), constants={
+            'country': 'World',
+            'countrycode': 'WRD',
+            'adm_area_1': None,
+            'adm_area_2': None,
+            'adm_area_3': None,
+            'gid': None
+        })
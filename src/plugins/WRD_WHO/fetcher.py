@@ -23,74 +23,66 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 
 logger = logging.getLogger(__name__)
 
+DATA_URL = 'https://covid19.who.int/WHO-COVID-19-global-data.csv'
+
 
 class WorldWHOFetcher(BaseEpidemiologyFetcher):
     ''' a fetcher to collect data for world data from World Health Organization (WHO)'''
     LOAD_PLUGIN = True
     SOURCE = 'WRD_WHO'  # World Health Organization (WHO)
+    PREFETCH_URLS = (DATA_URL,)
+    SKIP_UNCHANGED_PAYLOAD = True
 
     def fetch(self):
         # a csv file to be downloaded
-        url = 'https://covid19.who.int/WHO-COVID-19-global-data.csv'
-        return pd.read_csv(url)
+        return pd.read_csv(self.open_url(DATA_URL))
 
     def run(self):
         data = self.fetch()
-        missing_country_codes = set()
-
-        for index, record in data.iterrows():
-
-            date = str(record[0])
-            country_a2_code = str(record[1])
-            country_origin = str(record[2])
-            confirmed = int(record[5])
-            dead = int(record[7])
-
-            country, countrycode = self.country_codes_translator.get_country_info(
-                country_a2_code=country_a2_code)
 
-            if pd.isna(countrycode):
-                missing_country_codes.add(country_origin)
-                continue
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': country,
-                'countrycode': countrycode,
-                'adm_area_1': None,
-                'adm_area_2': None,
-                'adm_area_3': None,
-                'gid': [countrycode],
-                'confirmed': confirmed,
-                'dead': dead,
-            }
-
-            self.upsert_data(**upsert_obj)
+        # Date_reported,Country_code,Country,WHO_region,New_cases,Cumulative_cases,New_deaths,Cumulative_deaths
+        country_a2_codes = data['Country_code'].astype(str)
+        country_info = {
+            country_a2_code: self.country_codes_translator.get_country_info(country_a2_code=country_a2_code)
+            for country_a2_code in country_a2_codes.unique()
+        }
+        countries = country_a2_codes.map(lambda country_a2_code: country_info[country_a2_code][0])
+        countrycodes = country_a2_codes.map(lambda country_a2_code: country_info[country_a2_code][1])
+
+        missing = countrycodes.isna()
+        missing_country_codes = set(data.loc[missing, 'Country'].astype(str))
+
+        countries_data = data[~missing]
+        self.upsert_frame(pd.DataFrame({
+            'date': countries_data['Date_reported'].astype(str),
+            'country': countries[~missing],
+            'countrycode': countrycodes[~missing],
+            'confirmed': countries_data['Cumulative_cases'].astype(int),
+            'dead': countries_data['Cumulative_deaths'].astype(int),
+            'gid': countrycodes[~missing]
+        }), constants={
+            'adm_area_1': None,
+            'adm_area_2': None,
+            'adm_area_3': None
+        })
 
         # global figure
         grouped = data.groupby(['Date_reported'], as_index=False)
         globaldf = grouped[['Cumulative_cases', 'Cumulative_deaths']].sum()
         globaldf.sort_values(['Date_reported'], inplace=True)
 
-        for index, record in globaldf.iterrows():
-            date = str(record['Date_reported'])
-            total_confirmed = int(record['Cumulative_cases'])
-            total_deaths = int(record['Cumulative_deaths'])
-
-            upsert_obj = {
-                'source': self.SOURCE,
-                'date': date,
-                'country': 'World',
-                'countrycode': 'WRD',
-                'adm_area_1': None,
-                'adm_area_2': None,
-                'adm_area_3': None,
-                'gid': None,
-                'confirmed': total_confirmed,
-                'dead': total_deaths
-            }
-            self.upsert_data(**upsert_obj)
+        self.upsert_frame(globaldf, columns={
+            'date': 'Date_reported',
+            'confirmed': 'Cumulative_cases',
+            'dead': 'Cumulative_deaths'
+        }, constants={
+            'country': 'World',
+            'countrycode': 'WRD',
+            'adm_area_1': None,
+            'adm_area_2': None,
+            'adm_area_3': None,
+            'gid': None
+        })
 
         for country in missing_country_codes:
             logger.warning(f'Unable to find country code for {country}')
@@ -34,10 +34,18 @@ from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
 """
 logger = logging.getLogger(__name__)
 
+DATA_URL = 'https://raw.githubusercontent.com/dsfsi/covid19za/master/data/'
+TESTING_URL = DATA_URL + 'covid19za_timeline_testing.csv'
+CONFIRMED_URL = DATA_URL + 'covid19za_provincial_cumulative_timeline_confirmed.csv'
+RECOVERED_URL = DATA_URL + 'covid19za_provincial_cumulative_timeline_recoveries.csv'
+DEATHS_URL = DATA_URL + 'covid19za_provincial_cumulative_timeline_deaths.csv'
+
 
 class ZAF_DSFSIFetcher(BaseEpidemiologyFetcher):
     LOAD_PLUGIN = True
     SOURCE = 'ZAF_DSFSI'
+    PREFETCH_URLS = (TESTING_URL, CONFIRMED_URL, RECOVERED_URL, DEATHS_URL)
+    SKIP_UNCHANGED = True
 
     @staticmethod
     def int_parser(x):
@@ -49,15 +57,11 @@ class ZAF_DSFSIFetcher(BaseEpidemiologyFetcher):
         province_columns = ['EC', 'FS', 'GP', 'KZN', 'LP', 'MP', 'NC', 'NW', 'WC', 'total']
 
         # Collect countrywide testing data
-        countrywide_df = pd.read_csv(
-            'https://raw.githubusercontent.com/dsfsi/covid19za/master/data/covid19za_timeline_testing.csv')
+        countrywide_df = pd.read_csv(self.open_url(TESTING_URL))
         # Collect various provincial data
-        confirmed_df = pd.read_csv(
-            'https://raw.githubusercontent.com/dsfsi/covid19za/master/data/covid19za_provincial_cumulative_timeline_confirmed.csv')
-        recovered_df = pd.read_csv(
-            'https://raw.githubusercontent.com/dsfsi/covid19za/master/data/covid19za_provincial_cumulative_timeline_recoveries.csv')
-        dead_df = pd.read_csv(
-            'https://raw.githubusercontent.com/dsfsi/covid19za/master/data/covid19za_provincial_cumulative_timeline_deaths.csv')
+        confirmed_df = pd.read_csv(self.open_url(CONFIRMED_URL))
+        recovered_df = pd.read_csv(self.open_url(RECOVERED_URL))
+        dead_df = pd.read_csv(self.open_url(DEATHS_URL))
         logger.debug('Fetching South African data from ZAF_DSFSI')
 
         # For each province, create a DataFrame with relevant parts of the three data sets
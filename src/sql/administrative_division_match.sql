@@ -0,0 +1,10 @@
+-- Expression index used by the bulk administrative division lookup of the fetchers, names are normalized
+-- the same way as the input regions: characters other than word characters and % removed, lower cased
+
+CREATE INDEX IF NOT EXISTS administrative_division_match
+    ON administrative_division (
+        countrycode,
+        lower(regexp_replace(COALESCE(adm_area_1, ''), '[^\w%]+', '', 'g')),
+        lower(regexp_replace(COALESCE(adm_area_2, ''), '[^\w%]+', '', 'g')),
+        lower(regexp_replace(COALESCE(adm_area_3, ''), '[^\w%]+', '', 'g'))
+    );
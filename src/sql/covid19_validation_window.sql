@@ -0,0 +1,105 @@
+-- Windowed validation of incoming epidemiology data: only the dates present in the staging table of a source are
+-- compared, against digests of the epidemiology rows of every source and date.
+-- A digest is the sum of the row hashes, so it doesn't depend on row order. Rows are hashed by their region and data
+-- columns only (EPIDEMIOLOGY_DATA_KEYS of the Postgres adapter), other columns never make a re-fetch fail validation.
+-- Digests are refreshed for the published dates when validated data is published, see PostgresqlHelper.publish_staging.
+
+CREATE TABLE IF NOT EXISTS epidemiology_digest (
+    source text NOT NULL,
+    date date NOT NULL,
+    digest numeric NOT NULL,
+    rows bigint NOT NULL,
+    PRIMARY KEY (source, date)
+);
+
+-- Triggers of an earlier version of this script, which wrote the digests on every upsert
+
+DROP TRIGGER IF EXISTS epidemiology_digest_insert ON epidemiology;
+DROP TRIGGER IF EXISTS epidemiology_digest_update ON epidemiology;
+DROP TRIGGER IF EXISTS epidemiology_digest_delete ON epidemiology;
+DROP FUNCTION IF EXISTS covid19_schema.epidemiology_digest_update();
+
+-- FUNCTION: covid19_schema.epidemiology_digest_refresh(text, regclass)
+
+-- Digests of the dates of a source present in its staging table, computed again from epidemiology
+
+CREATE OR REPLACE FUNCTION covid19_schema.epidemiology_digest_refresh(
+	source_code text,
+	staging_table regclass)
+    RETURNS void
+    LANGUAGE 'plpgsql'
+AS $BODY$
+BEGIN
+    EXECUTE format($QUERY$
+        INSERT INTO epidemiology_digest (source, date, digest, rows)
+        SELECT $1, epidemiology.date,
+               sum(hashtextextended(ROW(epidemiology.country, epidemiology.countrycode, epidemiology.adm_area_1,
+                                        epidemiology.adm_area_2, epidemiology.adm_area_3, epidemiology.gid,
+                                        epidemiology.tested, epidemiology.confirmed, epidemiology.quarantined,
+                                        epidemiology.hospitalised, epidemiology.hospitalised_icu,
+                                        epidemiology.dead, epidemiology.recovered)::text, 0)),
+               count(*)
+        FROM epidemiology
+        WHERE epidemiology.source = $1
+            AND epidemiology.date IN (SELECT DISTINCT staging_row.date FROM %s staging_row
+                                      WHERE staging_row.source = $1)
+        GROUP BY epidemiology.date
+        ON CONFLICT (source, date) DO UPDATE SET digest = EXCLUDED.digest, rows = EXCLUDED.rows
+    $QUERY$, staging_table) USING source_code;
+END
+$BODY$;
+
+ALTER FUNCTION covid19_schema.epidemiology_digest_refresh(text, regclass)
+    OWNER TO covid19_read_write;
+
+-- Digests of the existing rows, rows written without validation afterwards are covered again once their dates
+-- are published
+
+TRUNCATE epidemiology_digest;
+
+INSERT INTO epidemiology_digest (source, date, digest, rows)
+SELECT source, date,
+       sum(hashtextextended(ROW(country, countrycode, adm_area_1, adm_area_2, adm_area_3, gid, tested, confirmed,
+                                quarantined, hospitalised, hospitalised_icu, dead, recovered)::text, 0)),
+       count(*)
+FROM epidemiology GROUP BY source, date;
+
+-- FUNCTION: covid19_schema.covid19_validation_window(text, regclass)
+
+-- Dates of the incoming source data whose rows differ from the existing ones, dates not in epidemiology yet are new
+-- and not reported. Staging rows are hashed by the same columns as the epidemiology rows.
+
+DROP FUNCTION IF EXISTS covid19_schema.covid19_validation_window(text);
+
+CREATE OR REPLACE FUNCTION covid19_schema.covid19_validation_window(
+	source_code text,
+	staging_table regclass)
+    RETURNS TABLE (date date, staging_rows bigint, existing_rows bigint)
+    LANGUAGE 'plpgsql'
+    STABLE
+AS $BODY$
+BEGIN
+    RETURN QUERY EXECUTE format($QUERY$
+        WITH staging AS (
+            SELECT staging_row.date,
+                   sum(hashtextextended(ROW(staging_row.country, staging_row.countrycode, staging_row.adm_area_1,
+                                            staging_row.adm_area_2, staging_row.adm_area_3, staging_row.gid,
+                                            staging_row.tested, staging_row.confirmed, staging_row.quarantined,
+                                            staging_row.hospitalised, staging_row.hospitalised_icu,
+                                            staging_row.dead, staging_row.recovered)::text, 0)) AS digest,
+                   count(*) AS rows
+            FROM %s staging_row
+            WHERE staging_row.source = $1
+            GROUP BY staging_row.date
+        )
+        SELECT staging.date, staging.rows, existing.rows
+        FROM staging
+        JOIN epidemiology_digest existing ON existing.source = $1 AND existing.date = staging.date
+        WHERE existing.rows > 0 AND (existing.digest <> staging.digest OR existing.rows <> staging.rows)
+        ORDER BY staging.date
+    $QUERY$, staging_table) USING source_code;
+END
+$BODY$;
+
+ALTER FUNCTION covid19_schema.covid19_validation_window(text, regclass)
+    OWNER TO covid19_read_write;
@@ -0,0 +1,4 @@
+-- Marks runs skipped because the source data didn't change since the last run. The other columns of a skipped run
+-- are written as for any run, details are kept from the last run which wrote data.
+
+ALTER TABLE diagnostics ADD COLUMN IF NOT EXISTS unchanged boolean;
@@ -0,0 +1,27 @@
+-- Date ranges and row numbers of every table, source and country, kept up to date by the fetchers as they write rows,
+-- so diagnostics don't aggregate the data tables. The table is filled once from the existing data.
+
+CREATE TABLE IF NOT EXISTS source_stats (
+    table_name text NOT NULL,
+    source text NOT NULL,
+    country text NOT NULL,
+    min_date date NOT NULL,
+    max_date date NOT NULL,
+    rows bigint NOT NULL,
+    PRIMARY KEY (table_name, source, country)
+);
+
+TRUNCATE source_stats;
+
+INSERT INTO source_stats (table_name, source, country, min_date, max_date, rows)
+SELECT 'epidemiology', source, country, min(date), max(date), count(*) FROM epidemiology GROUP BY source, country
+UNION ALL
+SELECT 'epidemiology_england_msoa', source, country, min(date), max(date), count(*) FROM epidemiology_england_msoa
+GROUP BY source, country
+UNION ALL
+SELECT 'government_response', source, country, min(date), max(date), count(*) FROM government_response
+GROUP BY source, country
+UNION ALL
+SELECT 'mobility', source, country, min(date), max(date), count(*) FROM mobility GROUP BY source, country
+UNION ALL
+SELECT 'weather', source, country, min(date), max(date), count(*) FROM weather GROUP BY source, country;
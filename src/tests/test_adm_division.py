@@ -0,0 +1,82 @@
+import os
+import csv
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from adapters.sqlite import SqliteHelper
+from utils.config import config
+from utils.adm_division import SNAPSHOT_COLUMNS, AdmDivisionResolver, write_snapshot
+
+divisions = [
+    ('GBR', 'United Kingdom', None, None, None, 'GBR'),
+    ('GBR', 'United Kingdom', 'England', None, None, 'GBR.1_1'),
+    ('GBR', 'United Kingdom', 'England', 'Kingston upon Hull, City of', None, 'GBR.1.1_1'),
+    ('GBR', 'United Kingdom', 'England', 'Bath and North East Somerset', None, 'GBR.1.2_1'),
+    ('GBR', 'United Kingdom', 'England', 'Bath-Somerset', None, 'GBR.1.3_1'),
+    ('FRA', 'France', "Provence-Alpes-Côte d'Azur", None, None, 'FRA.1_1'),
+]
+
+
+class AdmDivisionResolverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'administrative_division.sqlite')
+        self.assertEqual(write_snapshot(self.snapshot_path, (dict(zip(SNAPSHOT_COLUMNS, row)) for row in divisions)),
+                         len(divisions))
+        self.resolver = AdmDivisionResolver(self.snapshot_path)
+
+    def tearDown(self):
+        self.resolver.conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_names_matched_without_case_and_punctuation(self):
+        self.assertEqual(self.resolver.get_adm_division('GBR', 'ENGLAND', 'Kingston upon Hull City of'),
+                         ('United Kingdom', 'England', 'Kingston upon Hull, City of', None, ['GBR.1.1_1']))
+        self.assertEqual(self.resolver.get_adm_division('FRA', "Provence Alpes Côte d'Azur")[-1], ['FRA.1_1'])
+        self.assertEqual(self.resolver.get_adm_division('GBR')[-1], ['GBR'])
+
+    def test_nan_matched_as_empty_area(self):
+        self.assertEqual(self.resolver.get_adm_division('GBR', 'England', float('nan'))[-1], ['GBR.1_1'])
+
+    def test_wildcards(self):
+        self.assertEqual(self.resolver.get_adm_division('GBR', 'England', 'Kingston%')[-1], ['GBR.1.1_1'])
+        with self.assertRaisesRegex(Exception, 'Ambiguous'):
+            self.resolver.get_adm_division('GBR', 'England', 'Bath%Somerset')
+
+    def test_missing_division(self):
+        with self.assertRaisesRegex(Exception, 'Unable to find'):
+            self.resolver.get_adm_division('GBR', 'Wales')
+
+    def test_snapshot_read_only(self):
+        with self.assertRaises(Exception):
+            self.resolver.conn.execute("DELETE FROM administrative_division")
+
+
+class SqliteAdmDivisionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'administrative_division.csv')
+        with open(self.snapshot_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(SNAPSHOT_COLUMNS)
+            writer.writerows(divisions)
+        self.adapter = SqliteHelper(os.path.join(self.tmp_dir.name, 'covid19.sqlite'))
+
+    def tearDown(self):
+        self.adapter.close_connection()
+        self.tmp_dir.cleanup()
+
+    def test_csv_snapshot_resolved(self):
+        with mock.patch.object(config, 'ADM_DIVISION_SNAPSHOT', self.snapshot_path):
+            self.assertEqual(self.adapter.get_adm_division('GBR', 'England', 'Kingston%')[-1], ['GBR.1.1_1'])
+            self.assertEqual(self.adapter.get_adm_divisions([('GBR', 'England', None, None),
+                                                             ('GBR', 'England', 'Bath%', None)]),
+                             {('GBR', 'England', None, None): ('United Kingdom', 'England', None, None, ['GBR.1_1'])})
+
+    def test_snapshot_not_configured(self):
+        with mock.patch.object(config, 'ADM_DIVISION_SNAPSHOT', None):
+            with self.assertRaisesRegex(Exception, 'ADM_DIVISION_SNAPSHOT'):
+                self.adapter.get_adm_division('GBR', 'England')
@@ -2,7 +2,11 @@ import unittest
 import unittest.mock as mock
 from io import StringIO
 
+import numpy as np
+import pandas as pd
+
 from utils.administrative_division_translator.translator import AdmTranslator
+from utils.fetcher.abstract_fetcher import AbstractFetcher
 
 translation_csv = """\
 input_adm_area_1,input_adm_area_2,input_adm_area_3,adm_area_1,adm_area_2,adm_area_3,gid
@@ -10,6 +14,29 @@ england,county durham,,England,County Durham,,GBR.1.30_1
 england,darlington,,England,Darlington,,GBR.1.23_1"""
 
 
+countrycode_translation_csv = """\
+countrycode,input_adm_area_1,input_adm_area_2,input_adm_area_3,adm_area_1,adm_area_2,adm_area_3,gid
+GBR,england,,,England,,,GBR.1_1
+GBR,england,county durham,,England,County Durham,,GBR.1.30_1
+FRA,Ile de France,,,Île-de-France,,,FRA.11_1
+FRA,Corse,,,Corse,,,
+USA,New York,1,,New York,Kings,,USA.33.1_1"""
+
+
+def same_value(actual, expected) -> bool:
+    # None and NaN are different values
+    if isinstance(actual, float) and isinstance(expected, float) and np.isnan(actual) and np.isnan(expected):
+        return True
+    return type(actual) == type(expected) and actual == expected
+
+
+class RegionFetcher(AbstractFetcher):
+    SOURCE = 'TST_REGIONS'
+
+    def run(self):
+        pass
+
+
 class AdmDivisionTranslatorTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -65,3 +92,165 @@ class AdmDivisionTranslatorTestCase(unittest.TestCase):
         self.assertIsNone(adm_area_2)
         self.assertIsNone(adm_area_3)
         self.assertIsNone(gid)
+
+    def test_adm_division_translation_normalized_input(self):
+        success, adm_area_1, adm_area_2, adm_area_3, gid = self.translator.tr(
+            country_code='GBR',
+            input_adm_area_1='England',
+            input_adm_area_2='County Durham ',
+            input_adm_area_3=None,
+            return_original_if_failure=False,
+            suppress_exception=False)
+
+        self.assertTrue(success)
+        self.assertTrue(adm_area_2 == 'County Durham')
+        self.assertTrue(gid == ['GBR.1.30_1'])
+
+    def test_adm_division_translation_cached_failure(self):
+        for return_original_if_failure in [False, True, False]:
+            success, adm_area_1, adm_area_2, adm_area_3, gid = self.translator.tr(
+                country_code='GBR',
+                input_adm_area_1='Unknown',
+                return_original_if_failure=return_original_if_failure,
+                suppress_exception=True)
+
+            self.assertFalse(success)
+            self.assertEqual(adm_area_1, 'Unknown' if return_original_if_failure else None)
+            self.assertIsNone(gid)
+
+
+translation_with_countrycode_csv = """\
+countrycode,input_adm_area_1,input_adm_area_2,input_adm_area_3,adm_area_1,adm_area_2,adm_area_3,gid
+USA,georgia,,,Georgia,,,USA.11_1
+GEO,georgia,,,,,,GEO"""
+
+
+class AdmDivisionTranslatorCountryCodeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = mock.patch('os.path.exists')
+        mock_thing = self.patcher.start()
+        mock_thing.side_effect = lambda x: True
+        self.translator = AdmTranslator(csv_fname=StringIO(translation_with_countrycode_csv))
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_adm_division_translation_country_code(self):
+        success, adm_area_1, adm_area_2, adm_area_3, gid = self.translator.tr(
+            country_code='GEO', input_adm_area_1='Georgia')
+        self.assertTrue(success)
+        self.assertIsNone(adm_area_1)
+        self.assertTrue(gid == ['GEO'])
+
+        success, adm_area_1, adm_area_2, adm_area_3, gid = self.translator.tr(
+            country_code='USA', input_adm_area_1='Georgia')
+        self.assertTrue(success)
+        self.assertTrue(adm_area_1 == 'Georgia')
+        self.assertTrue(gid == ['USA.11_1'])
+
+    def test_adm_division_translation_without_country_code(self):
+        success, adm_area_1, adm_area_2, adm_area_3, gid = self.translator.tr(input_adm_area_1='Georgia')
+        self.assertTrue(success)
+        self.assertTrue(gid == ['USA.11_1'])
+
+
+class AdmDivisionFrameTranslatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = mock.patch('os.path.exists')
+        mock_thing = self.patcher.start()
+        mock_thing.side_effect = lambda x: True
+        self.translator = AdmTranslator(csv_fname=StringIO(translation_csv))
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_adm_division_frame_translation(self):
+        data = pd.DataFrame({
+            'region': ['england', 'England', 'england', 'Unknown', 'england'],
+            'subregion': ['county durham', 'Darlington', None, 'county durham', float('nan')]
+        }, index=[10, 11, 12, 13, 14])
+
+        for return_original_if_failure in [True, False]:
+            result = self.translator.tr_frame(data, ['region', 'subregion'], country_code='GBR',
+                                              return_original_if_failure=return_original_if_failure,
+                                              suppress_exception=True)
+            self.assertEqual(result.index.tolist(), data.index.tolist())
+            for index, row in data.iterrows():
+                expected = self.translator.tr('GBR', row['region'], row['subregion'], None,
+                                              return_original_if_failure=return_original_if_failure,
+                                              suppress_exception=True)[1:]
+                actual = tuple(result.loc[index, ['adm_area_1', 'adm_area_2', 'adm_area_3', 'gid']])
+                self.assertEqual(len(actual), len(expected))
+                for a, e in zip(actual, expected):
+                    self.assertTrue(a == e or (pd.isna(a) and pd.isna(e)), f'{actual} != {expected}')
+
+        result = self.translator.tr_frame(data, ['region', 'subregion'], country_code='GBR')
+        self.assertEqual(result.loc[10, 'gid'], ['GBR.1.30_1'])
+        self.assertEqual(result.loc[11, 'adm_area_2'], 'Darlington')
+        self.assertIsNone(result.loc[13, 'gid'])
+
+
+    def test_frame_translation_matches_tr(self):
+        with mock.patch('os.path.exists', return_value=True):
+            translator = AdmTranslator(csv_fname=StringIO(countrycode_translation_csv))
+        nan = float('nan')
+        data = pd.DataFrame({
+            'countrycode': ['GBR', 'GBR', 'GBR', 'GBR', 'FRA', 'FRA', 'FRA', None, '', nan, 'USA', 'USA', 'GBR'],
+            'region': ['England', 'ENG LAND', 'england', 'england', 'ile de france', 'Corse', None, 'england',
+                       'england', 'england', 'New York', 'New York', 'Wales'],
+            'subregion': [None, nan, 'County Durham', 'countydurham', None, None, None, None,
+                          None, None, 1, '1', nan]
+        }, index=[5, 3, 3, 8, 1, 2, 7, 9, 4, 6, 0, 11, 10])
+
+        for return_original_if_failure in [True, False]:
+            result = translator.tr_frame(data, ['region', 'subregion'], countrycode_column='countrycode',
+                                         return_original_if_failure=return_original_if_failure,
+                                         suppress_exception=True)
+            self.assertEqual(result.index.tolist(), data.index.tolist())
+            for position, row in enumerate(data.itertuples(index=False)):
+                expected = translator.tr(row.countrycode, row.region, row.subregion, None,
+                                         return_original_if_failure=return_original_if_failure,
+                                         suppress_exception=True)[1:]
+                actual = tuple(result.iloc[position])
+                for a, e in zip(actual, expected):
+                    self.assertTrue(same_value(a, e), f'row {position}: {actual} != {expected}')
+
+        result = translator.tr_frame(data, ['region', 'subregion'], countrycode_column='countrycode',
+                                     suppress_exception=True)
+        self.assertEqual(result.gid.tolist()[:5], [['GBR.1_1'], None, ['GBR.1.30_1'], ['GBR.1.30_1'], ['FRA.11_1']])
+        self.assertEqual(result.gid.iloc[10:12].tolist(), [None, ['USA.33.1_1']])
+        with self.assertRaisesRegex(Exception, 'Unable to get GID'):
+            translator.tr_frame(data, ['region', 'subregion'], countrycode_column='countrycode')
+
+
+class BulkRegionResolutionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.adapter = mock.MagicMock()
+        self.adapter.get_adm_divisions.return_value = {
+            ('GBR', 'Wales', None, None): ('United Kingdom', 'Wales', None, None, ['GBR.4_1'])
+        }
+        with mock.patch('os.path.exists', return_value=True):
+            translator = AdmTranslator(csv_fname=StringIO(translation_csv))
+        with mock.patch.object(AbstractFetcher, 'load_adm_translator', return_value=translator):
+            self.fetcher = RegionFetcher(self.adapter)
+
+    def test_missing_regions_resolved_in_one_lookup(self):
+        data = pd.DataFrame({'region': ['england', 'Wales', 'Wales', 'Unknown'],
+                             'subregion': ['county durham', None, None, None]})
+        result = self.fetcher.get_regions(data, ['region', 'subregion'], countrycode='GBR')
+
+        self.adapter.get_adm_divisions.assert_called_once_with(
+            [('GBR', 'Wales', None, None), ('GBR', 'Unknown', None, None)])
+        self.adapter.get_adm_division.assert_not_called()
+        self.assertEqual(result.index.tolist(), data.index.tolist())
+        self.assertEqual(result.gid.tolist(), [['GBR.1.30_1'], ['GBR.4_1'], ['GBR.4_1'], None])
+        self.assertEqual(result.adm_area_1.tolist(), ['England', 'Wales', 'Wales', 'Unknown'])
+
+    def test_empty_frame(self):
+        data = pd.DataFrame({'region': [], 'subregion': []}, dtype=object)
+        result = self.fetcher.get_regions(data, ['region', 'subregion'], countrycode='GBR')
+        self.assertTrue(result.empty)
+        self.adapter.get_adm_divisions.assert_not_called()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+import pandas as pd
+
+from utils.types import FetcherType
+from adapters.sqlite import SqliteHelper
+from adapters.csvfile import CSVFileHelper
+from adapters.parquetfile import ParquetFileHelper
+
+records = [
+    {'source': 'TST', 'date': '2020-05-01', 'country': 'United Kingdom', 'countrycode': 'GBR',
+     'adm_area_1': 'England', 'adm_area_2': None, 'adm_area_3': None, 'gid': ['GBR.1_1'], 'confirmed': 10},
+    {'source': 'TST', 'date': '2020-05-02', 'country': 'United Kingdom', 'countrycode': 'GBR',
+     'adm_area_1': 'England', 'adm_area_2': None, 'adm_area_3': None, 'gid': ['GBR.1_1'], 'confirmed': 20},
+    {'source': 'TST', 'date': '2020-05-01', 'country': 'United Kingdom', 'countrycode': 'GBR',
+     'adm_area_1': 'England', 'adm_area_2': None, 'adm_area_3': None, 'gid': ['GBR.1_1'], 'confirmed': 15},
+]
+
+
+class BatchUpsertTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_sqlite_upsert_many(self):
+        adapter = SqliteHelper(sqlite_file_path=os.path.join(self.path, 'test.db'))
+        adapter.upsert_many(FetcherType.EPIDEMIOLOGY, [dict(record) for record in records])
+
+        result = adapter.execute("SELECT date, confirmed, gid FROM epidemiology ORDER BY date")
+        self.assertEqual(result, [('2020-05-01', 15, 'GBR.1_1'), ('2020-05-02', 20, 'GBR.1_1')])
+        adapter.close_connection()
+
+    def test_sqlite_buffered_rows_committed_on_flush(self):
+        db_path = os.path.join(self.path, 'test.db')
+        adapter = SqliteHelper(sqlite_file_path=db_path)
+        adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **records[0])
+        self.assertEqual(adapter.execute("SELECT confirmed FROM epidemiology"), [(10,)])
+        adapter.flush()
+
+        adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **records[2])
+        adapter.rollback()
+        adapter.close_connection()
+
+        adapter = SqliteHelper(sqlite_file_path=db_path)
+        self.assertEqual(adapter.execute("SELECT confirmed FROM epidemiology"), [(10,)])
+        with self.assertRaises(sqlite3.OperationalError):
+            adapter.execute("SELECT missing_column FROM epidemiology")
+        adapter.close_connection()
+
+    def test_sqlite_timestamps_and_diagnostics(self):
+        adapter = SqliteHelper(sqlite_file_path=os.path.join(self.path, 'test.db'))
+        adapter.upsert_many(FetcherType.EPIDEMIOLOGY, [dict(record) for record in records])
+        self.assertEqual(adapter.get_earliest_timestamp('epidemiology', 'TST'), date(2020, 5, 1))
+        self.assertEqual(adapter.get_latest_timestamp('epidemiology', 'TST'), date(2020, 5, 2))
+        self.assertIsNone(adapter.get_latest_timestamp('epidemiology', 'NONE'))
+
+        adapter.upsert_diagnostics(table_name='epidemiology', source='TST', error='no', details='[]', unchanged=False)
+        adapter.upsert_diagnostics(table_name='epidemiology', source='TST', error='yes', unchanged=True)
+        self.assertEqual(adapter.execute("SELECT error, details, unchanged FROM diagnostics"), [('yes', '[]', '1')])
+        adapter.close_connection()
+
+    def test_missing_gids_kept_per_adapter(self):
+        adapter = SqliteHelper(sqlite_file_path=os.path.join(self.path, 'test.db'))
+        other_adapter = SqliteHelper(sqlite_file_path=os.path.join(self.path, 'other.db'))
+        adapter.upsert_many(FetcherType.EPIDEMIOLOGY, [dict(records[0], gid=None)])
+
+        self.assertEqual(adapter.missing_gids, {('TST', 'GBR', 'England', None, None)})
+        self.assertEqual(other_adapter.missing_gids, set())
+        adapter.publish_missing_gids()
+        self.assertEqual(adapter.missing_gids, set())
+        adapter.close_connection()
+        other_adapter.close_connection()
+
+    def test_csv_upsert_frame(self):
+        adapter = CSVFileHelper(csv_path=self.path)
+        adapter.upsert_frame(FetcherType.EPIDEMIOLOGY, pd.DataFrame(records))
+        adapter.flush()
+
+        df = pd.read_csv(os.path.join(self.path, 'epidemiology_TST.csv')).sort_values('date')
+        self.assertEqual(df.date.tolist(), ['2020-05-01', '2020-05-02'])
+        self.assertEqual(df.confirmed.tolist(), [15, 20])
+        self.assertEqual(df.gid.tolist(), ['GBR.1_1', 'GBR.1_1'])
+
+    def test_csv_upsert_data_updates_row(self):
+        adapter = CSVFileHelper(csv_path=self.path)
+        for record in records:
+            adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **record)
+        adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **dict(records[1], dead=1))
+        adapter.flush()
+
+        df = pd.read_csv(os.path.join(self.path, 'epidemiology_TST.csv')).sort_values('date')
+        self.assertEqual(df.confirmed.tolist(), [15, 20])
+        self.assertEqual(df.dead.fillna(0).tolist(), [0, 1])
+
+    def test_parquet_partitions_merged(self):
+        adapter = ParquetFileHelper(parquet_path=self.path)
+        adapter.upsert_frame(FetcherType.EPIDEMIOLOGY, pd.DataFrame(records[:2]))
+        adapter.flush()
+        adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **records[2])
+        adapter.upsert_data(FetcherType.EPIDEMIOLOGY, **dict(records[0], date='2020-06-01', confirmed=30))
+        adapter.flush()
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, 'epidemiology', 'source=TST'))),
+                         ['month=2020-05', 'month=2020-06'])
+        df = pd.read_parquet(os.path.join(self.path, 'epidemiology')).sort_values('date')
+        self.assertEqual(df.confirmed.tolist(), [15, 20, 30])
+        self.assertEqual(df.source.astype(str).tolist(), ['TST', 'TST', 'TST'])
+        self.assertEqual(df.gid.map(list).tolist(), [['GBR.1_1']] * 3)
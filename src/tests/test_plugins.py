@@ -0,0 +1,230 @@
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from utils.plugins import Plugins, PrefetchLookahead
+from utils.plugin_manifest import PluginManifest
+from utils.types import FetcherType
+from utils.fetcher.abstract_fetcher import AbstractFetcher
+from utils.diagnostics import Diagnostics
+
+
+class SuccessfulFetcher(AbstractFetcher):
+    SOURCE = 'TST_OK'
+
+    def run(self):
+        pass
+
+
+class FailingFetcher(AbstractFetcher):
+    SOURCE = 'TST_FAIL'
+
+    def run(self):
+        raise ValueError('Fetch failed')
+
+
+class MobilityFetcher(AbstractFetcher):
+    TYPE = FetcherType.MOBILITY
+    SOURCE = 'TST_MOBILITY'
+
+    def run(self):
+        pass
+
+
+class PluginsConcurrencyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch.object(Plugins, 'search_for_plugins', return_value=[SuccessfulFetcher, FailingFetcher]):
+            self.plugins = Plugins()
+        self.plugins.run_only_plugins = None
+        self.plugins.validate_input_data = False
+        self.plugins.plugin_concurrency = 2
+
+        self.adapters = []
+        self.patcher = mock.patch('utils.plugins.DataAdapter.get_adapter', side_effect=self.create_adapter)
+        self.patcher.start()
+        self.diagnostics_patcher = mock.patch('utils.plugins.Diagnostics')
+        self.diagnostics_patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.diagnostics_patcher.stop()
+
+    def create_adapter(self):
+        adapter = mock.MagicMock()
+        self.adapters.append(adapter)
+        return adapter
+
+    def test_run_plugins_concurrently(self):
+        with mock.patch.object(AbstractFetcher, 'load_adm_translator'):
+            results = self.plugins.run_plugins_concurrently([SuccessfulFetcher, FailingFetcher])
+
+        results = {result['plugin']: result for result in results}
+        self.assertFalse(results['SuccessfulFetcher']['error'])
+        self.assertTrue(results['FailingFetcher']['error'])
+        self.assertIsNotNone(results['FailingFetcher']['end_time'])
+
+        # Each plugin got its own adapter, closed after the run
+        self.assertEqual(len(self.adapters), 2)
+        for adapter in self.adapters:
+            adapter.close_connection.assert_called_once()
+
+    def test_worker_count_limited_by_adapter(self):
+        adapter = self.create_adapter()
+        adapter.max_concurrency.return_value = 1
+        self.assertEqual(self.plugins.worker_count(adapter), 1)
+
+        adapter.max_concurrency.return_value = None
+        self.assertEqual(self.plugins.worker_count(adapter), 2)
+
+    def test_staged_data_without_validator_published(self):
+        adapter = self.create_adapter()
+        with mock.patch('utils.plugins.validate_incoming_data') as validate_incoming_data:
+            self.assertTrue(Plugins.validate_consistency(MobilityFetcher, MobilityFetcher, adapter))
+
+        validate_incoming_data.assert_not_called()
+        adapter.publish_staging.assert_called_once_with(FetcherType.MOBILITY, 'TST_MOBILITY')
+
+    def test_unchanged_source_skipped(self):
+        adapter = self.create_adapter()
+        with mock.patch.object(AbstractFetcher, 'load_adm_translator'), \
+                mock.patch.object(FailingFetcher, 'is_source_modified', return_value=False):
+            result = self.plugins.run_single_plugin(adapter, FailingFetcher)
+
+        self.assertFalse(result['error'])
+        self.assertTrue(result['validation'])
+        self.assertTrue(result['unchanged'])
+        adapter.flush.assert_not_called()
+
+    def test_row_counts_reported(self):
+        adapter = self.create_adapter()
+        adapter.get_row_counts.return_value = {'inserted': 1, 'updated': 2, 'unchanged': 3}
+        with mock.patch.object(AbstractFetcher, 'load_adm_translator'):
+            result = self.plugins.run_single_plugin(adapter, SuccessfulFetcher)
+
+        adapter.reset_row_counts.assert_called_once()
+        self.assertEqual(result['rows'], {'inserted': 1, 'updated': 2, 'unchanged': 3})
+
+
+class PrefetchLookaheadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.plugins = [type(f'Fetcher{number}', (SuccessfulFetcher,), {'PREFETCH_URLS': (f'http://{number}',)})
+                        for number in range(4)]
+        self.patcher = mock.patch('utils.plugins.prefetcher')
+        self.prefetcher = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def submitted(self):
+        return [call[0][0] for call in self.prefetcher.submit.call_args_list]
+
+    def test_next_plugins_prefetched(self):
+        lookahead = PrefetchLookahead(self.plugins, 2)
+        lookahead.start(self.plugins[0])
+        self.assertEqual(self.submitted(), [('http://1',), ('http://2',)])
+
+        self.prefetcher.reset_mock()
+        lookahead.start(self.plugins[3])
+        lookahead.start(self.plugins[1])
+        self.assertEqual(self.submitted(), [])
+
+    def test_disabled(self):
+        PrefetchLookahead(self.plugins, 0).start(self.plugins[0])
+        self.prefetcher.submit.assert_not_called()
+
+    def test_job_prefetches_one_plugin_ahead(self):
+        with mock.patch.object(Plugins, 'search_for_plugins', return_value=self.plugins):
+            plugins = Plugins()
+        plugins.run_only_plugins = None
+        plugins.plugin_concurrency = 1
+        plugins.prefetch_lookahead = 1
+        adapter = mock.MagicMock()
+        adapter.max_concurrency.return_value = None
+
+        started = []
+        with mock.patch.object(Plugins, 'run_single_plugin',
+                               side_effect=lambda data_adapter, plugin: started.append(self.submitted()) or {}), \
+                mock.patch.object(Plugins, 'log_job_summary'), mock.patch('utils.plugins.Diagnostics'):
+            plugins.run_plugins_job(adapter)
+
+        self.assertEqual(started, [[('http://1',)], [('http://1',), ('http://2',)],
+                                   [('http://1',), ('http://2',), ('http://3',)],
+                                   [('http://1',), ('http://2',), ('http://3',)]])
+
+
+class DiagnosticsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.config_patcher = mock.patch.multiple('utils.diagnostics.config', CSV=None, PARQUET=None, DB_NAME='covid19',
+                                                  DIAGNOSTICS_URL=None)
+        self.config_patcher.start()
+        self.adapter = mock.MagicMock()
+        with mock.patch.object(AbstractFetcher, 'load_adm_translator'):
+            self.fetcher = SuccessfulFetcher(self.adapter)
+        self.fetcher.get_details = mock.MagicMock(return_value='details')
+
+    def tearDown(self):
+        self.config_patcher.stop()
+
+    def test_unchanged_run_recorded(self):
+        Diagnostics(self.fetcher).update_diagnostics_info(validation=True, error=False, start_time=0, end_time=1,
+                                                          unchanged=True)
+        data = self.adapter.upsert_diagnostics.call_args[1]
+        self.assertTrue(data['unchanged'])
+        self.assertNotIn('details', data)
+
+        Diagnostics(self.fetcher).update_diagnostics_info(validation=True, error=False, start_time=0, end_time=1)
+        data = self.adapter.upsert_diagnostics.call_args[1]
+        self.assertFalse(data['unchanged'])
+        self.assertEqual(data['details'], 'details')
+
+
+class PluginManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.plugins_path = os.path.join(self.tmp_dir.name, 'plugins')
+        os.makedirs(os.path.join(self.plugins_path, 'TST_MANIFEST'))
+        self.module_path = os.path.join(self.plugins_path, 'TST_MANIFEST', 'fetcher.py')
+        self.write_module("SOURCE = 'TST_MANIFEST'")
+        self.manifest = PluginManifest(self.plugins_path, os.path.join(self.tmp_dir.name, 'manifest.json'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_module(self, source_line: str):
+        with open(self.module_path, 'w') as f:
+            f.write('import not_installed_module\n'
+                    'from utils.fetcher.base_mobility import BaseMobilityFetcher\n\n'
+                    "DATA_URL = 'https://example.com/'\n\n\n"
+                    'class ManifestFetcher(BaseMobilityFetcher):\n'
+                    '    LOAD_PLUGIN = True\n'
+                    "    PREFETCH_URLS = (DATA_URL + 'data.csv',)\n"
+                    f'    {source_line}\n')
+
+    def test_plugins_listed_without_import(self):
+        plugins = self.manifest.plugins()
+
+        self.assertEqual(len(plugins), 1)
+        self.assertEqual(plugins[0].__name__, 'ManifestFetcher')
+        self.assertEqual(plugins[0].module, 'TST_MANIFEST.fetcher')
+        self.assertEqual(plugins[0].SOURCE, 'TST_MANIFEST')
+        self.assertEqual(plugins[0].TYPE, FetcherType.MOBILITY)
+        self.assertEqual(plugins[0].PREFETCH_URLS, ('https://example.com/data.csv',))
+        self.assertNotIn('TST_MANIFEST.fetcher', sys.modules)
+
+    def test_manifest_updated_on_change(self):
+        self.manifest.plugins()
+        self.write_module("SOURCE = 'TST_MANIFEST_CHANGED'")
+
+        with mock.patch.object(PluginManifest, 'parse_module', wraps=PluginManifest.parse_module) as parse_module:
+            plugins = self.manifest.plugins()
+            self.assertEqual(parse_module.call_count, 1)
+            self.assertEqual(plugins[0].SOURCE, 'TST_MANIFEST_CHANGED')
+
+            self.manifest.plugins()
+            self.assertEqual(parse_module.call_count, 1)
@@ -0,0 +1,218 @@
+import io
+import csv
+import datetime
+import unittest
+import unittest.mock as mock
+from collections import Counter
+
+from psycopg2 import sql
+
+from utils.config import config
+from utils.types import FetcherType
+from adapters.postgresql import PostgresqlHelper, COPY_NULL, copy_value, copy_buffer
+
+
+def render(query: sql.Composable) -> str:
+    # Text of a composed query without a connection, identifiers and literals are quoted the simple way
+    if isinstance(query, sql.Composed):
+        return ''.join(render(part) for part in query)
+    if isinstance(query, sql.Identifier):
+        return '.'.join(f'"{string}"' for string in query.strings)
+    if isinstance(query, sql.Literal):
+        return f"'{query.wrapped}'"
+    if isinstance(query, sql.Placeholder):
+        return '%s'
+    return query.string
+
+
+def normalize(query: str) -> str:
+    return ' '.join(query.split())
+
+
+def create_adapter(source_stats: bool = False) -> PostgresqlHelper:
+    # Adapter without a connection, operations run directly on a mocked cursor
+    adapter = PostgresqlHelper.__new__(PostgresqlHelper)
+    adapter.database_name = 'covid19'
+    adapter.row_counts = Counter()
+    adapter.source_stats = dict()
+    adapter.source_stats_table = source_stats
+    adapter.diagnostics_unchanged_column = None
+    adapter.staging_tables = dict()
+    adapter.cur = mock.MagicMock()
+    adapter.execute = mock.MagicMock(return_value=[])
+    adapter.commit = mock.MagicMock()
+    adapter.run_operation = lambda operation, description, write=False, rows=1: operation()
+    return adapter
+
+
+class CopyEncodingTestCase(unittest.TestCase):
+
+    def test_copy_value(self):
+        self.assertEqual(copy_value(None), COPY_NULL)
+        self.assertEqual(copy_value(['GBR.1_1', None, 'a"b', 'c\\d']), '{"GBR.1_1",NULL,"a\\"b","c\\\\d"}')
+        self.assertEqual(copy_value({'a': 'b"c', 'date': datetime.date(2020, 5, 1)}),
+                         '{"a": "b\\"c", "date": "2020-05-01"}')
+        self.assertEqual(copy_value(datetime.date(2020, 5, 1)), '2020-05-01')
+        self.assertEqual(copy_value(10), 10)
+        self.assertEqual(copy_value(''), '')
+
+    def test_copy_buffer(self):
+        row = ('tab\there', 'line\nbreak', 'back\\slash', None, '', ['GBR.1_1'], {'k': 'v'})
+        buffer = copy_buffer([row])
+        text = buffer.getvalue()
+
+        # NULL stays unquoted, quoted \N would be read as text
+        self.assertIn(f',{COPY_NULL},,', text)
+        self.assertEqual(next(csv.reader(io.StringIO(text))),
+                         ['tab\there', 'line\nbreak', 'back\\slash', COPY_NULL, '', '{"GBR.1_1"}', '{"k": "v"}'])
+
+
+class ConflictActionTestCase(unittest.TestCase):
+
+    def test_update_changed_rows(self):
+        query = render(PostgresqlHelper.conflict_action('epidemiology', ['confirmed', 'dead'], 'x AS y'))
+        self.assertEqual(normalize(query),
+                         'UPDATE SET "confirmed"=EXCLUDED."confirmed","dead"=EXCLUDED."dead" '
+                         'WHERE ROW("epidemiology"."confirmed","epidemiology"."dead")::text '
+                         'IS DISTINCT FROM ROW("excluded"."confirmed","excluded"."dead")::text RETURNING x AS y')
+
+    def test_nothing_without_update_keys(self):
+        self.assertEqual(normalize(render(PostgresqlHelper.conflict_action('weather', []))), 'NOTHING')
+        self.assertEqual(normalize(render(PostgresqlHelper.conflict_action('weather', [], 'x'))), 'NOTHING RETURNING x')
+
+    def test_counting(self):
+        adapter = create_adapter()
+        self.assertEqual(adapter.counting('diagnostics'), (None, None))
+        self.assertEqual(adapter.counting('staging_epidemiology'), (None, None))
+        returning, aggregate_query = adapter.counting('epidemiology')
+        self.assertEqual(returning, '(xmax = 0) AS inserted')
+        self.assertNotIn('GROUP BY', aggregate_query)
+
+        adapter = create_adapter(source_stats=True)
+        returning, aggregate_query = adapter.counting('epidemiology')
+        self.assertEqual(returning, '(xmax = 0) AS inserted, source, country, date')
+        self.assertIn('GROUP BY source, country', aggregate_query)
+
+    def test_count_rows(self):
+        adapter = create_adapter(source_stats=True)
+        adapter.count_rows('epidemiology', 10, [
+            ('SRC', 'France', datetime.date(2020, 5, 2), datetime.date(2020, 5, 3), 2, 1),
+            ('SRC', 'France', datetime.date(2020, 5, 1), datetime.date(2020, 5, 2), 1, 0),
+        ])
+        self.assertEqual(adapter.get_row_counts(), {'inserted': 3, 'updated': 1, 'unchanged': 6})
+        self.assertEqual(adapter.source_stats, {
+            ('epidemiology', 'SRC', 'France'): [datetime.date(2020, 5, 1), datetime.date(2020, 5, 3), 3]})
+
+        adapter.count_rows('staging_epidemiology', 5, [])
+        self.assertEqual(adapter.get_row_counts(), {'inserted': 3, 'updated': 1, 'unchanged': 6})
+
+
+class StagingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.validation_mode = config.VALIDATION_MODE
+
+    def tearDown(self):
+        config.VALIDATION_MODE = self.validation_mode
+
+    def test_shared_staging_table_cleared_per_source(self):
+        config.VALIDATION_MODE = 'full'
+        adapter = create_adapter()
+        adapter.start_staging(FetcherType.EPIDEMIOLOGY, 'SRC')
+
+        queries = [normalize(render(call[0][0])) for call in adapter.execute.call_args_list]
+        self.assertEqual(queries[-1], 'DELETE FROM "staging_epidemiology" WHERE source = \'SRC\'')
+        self.assertEqual(adapter.staging_tables, {'epidemiology': 'staging_epidemiology'})
+
+        adapter.start_staging(FetcherType.MOBILITY, 'SRC')
+        self.assertEqual(adapter.staging_tables, {'mobility': 'staging_mobility_src'})
+        self.assertEqual(normalize(render(adapter.execute.call_args_list[-1][0][0])), 'TRUNCATE "staging_mobility_src"')
+
+    def test_window_staging_table_per_source(self):
+        config.VALIDATION_MODE = 'window'
+        adapter = create_adapter()
+        adapter.start_staging(FetcherType.EPIDEMIOLOGY, 'SRC-1')
+
+        queries = [normalize(render(call[0][0])) for call in adapter.execute.call_args_list]
+        self.assertEqual(queries, [
+            'CREATE UNLOGGED TABLE IF NOT EXISTS "staging_epidemiology_src_1" '
+            '(LIKE "epidemiology" INCLUDING DEFAULTS INCLUDING INDEXES)',
+            'TRUNCATE "staging_epidemiology_src_1"'])
+
+    def test_publish_staging(self):
+        adapter = create_adapter(source_stats=True)
+        adapter.staging_tables = {'epidemiology': 'staging_epidemiology_src'}
+        adapter.execute.side_effect = [[('source',), ('date',), ('country',), ('countrycode',), ('confirmed',)],
+                                       [(4,)]]
+        adapter.cur.fetchall.return_value = [
+            ('SRC', 'France', datetime.date(2020, 5, 1), datetime.date(2020, 5, 2), 1, 2)]
+        adapter.publish_staging(FetcherType.EPIDEMIOLOGY, 'SRC')
+
+        queries = [normalize(render(call[0][0]) if isinstance(call[0][0], sql.Composable) else call[0][0])
+                   for call in adapter.cur.execute.call_args_list]
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries[0].startswith(
+            'WITH merged AS (INSERT INTO "epidemiology" ("source","date","country","countrycode","confirmed") '
+            'SELECT "source","date","country","countrycode","confirmed" FROM "staging_epidemiology_src" '
+            'WHERE source = \'SRC\' ON CONFLICT (date,country,countrycode,'))
+        self.assertIn('UPDATE SET "confirmed"=EXCLUDED."confirmed"', queries[0])
+        self.assertIn('RETURNING (xmax = 0) AS inserted, source, country, date)', queries[0])
+        self.assertTrue(queries[0].endswith('GROUP BY source, country'))
+        self.assertEqual(queries[1], 'SELECT epidemiology_digest_refresh(%s, %s)')
+        self.assertEqual(queries[2], 'TRUNCATE "staging_epidemiology_src"')
+
+        adapter.commit.assert_called_once()
+        self.assertEqual(adapter.staging_tables, dict())
+        self.assertEqual(adapter.get_row_counts(), {'inserted': 1, 'updated': 2, 'unchanged': 1})
+        self.assertEqual(adapter.source_stats[('epidemiology', 'SRC', 'France')][2], 1)
+
+
+class DiagnosticsTestCase(unittest.TestCase):
+
+    def test_unchanged_stored_when_column_exists(self):
+        adapter = create_adapter()
+        adapter.upsert_statement = mock.MagicMock(return_value='statement')
+        adapter.execute_prepared = mock.MagicMock()
+        adapter.execute.return_value = [(True,)]
+        adapter.upsert_diagnostics(table_name='epidemiology', source='SRC', error=False, unchanged=True)
+
+        adapter.upsert_statement.assert_called_once_with('diagnostics', ('table_name', 'source', 'error', 'unchanged'),
+                                                         ['table_name', 'source'], ['error', 'unchanged'])
+        adapter.execute_prepared.assert_called_once_with('statement', ('epidemiology', 'SRC', False, True))
+
+    def test_unchanged_left_out_without_column(self):
+        adapter = create_adapter()
+        adapter.upsert_statement = mock.MagicMock(return_value='statement')
+        adapter.execute_prepared = mock.MagicMock()
+        adapter.execute.return_value = [(False,)]
+        adapter.upsert_diagnostics(table_name='epidemiology', source='SRC', error=False, unchanged=True)
+        adapter.upsert_diagnostics(table_name='epidemiology', source='SRC', error=False, unchanged=False)
+
+        adapter.execute.assert_called_once()
+        self.assertEqual(adapter.execute_prepared.call_args[0][1], ('epidemiology', 'SRC', False))
+
+
+class AdmDivisionsQueryTestCase(unittest.TestCase):
+
+    def test_regions_matched_in_one_query(self):
+        adapter = create_adapter()
+        adapter.execute.return_value = [(0, 'United Kingdom', 'England', None, None, 'GBR.1_1')]
+        keys = [('GBR', 'England', float('nan'), None), ('GBR', 'Eng%', None, None)]
+
+        with mock.patch.object(PostgresqlHelper, 'adm_division_resolver', return_value=None):
+            result = adapter.get_adm_divisions(keys)
+
+        self.assertEqual(adapter.execute.call_count, 2)
+        exact_query = normalize(render(adapter.execute.call_args_list[0][0][0]))
+        like_query = normalize(render(adapter.execute.call_args_list[1][0][0]))
+        self.assertIn("FROM (VALUES ('0','GBR','England','',''))", exact_query)
+        self.assertIn("lower(regexp_replace(COALESCE(division.adm_area_1, ''), '[^\\w%]+', '', 'g')) = "
+                      "lower(regexp_replace(COALESCE(region.adm_area_1, ''), '[^\\w%]+', '', 'g'))", exact_query)
+        self.assertIn("FROM (VALUES ('0','GBR','Eng%','',''))", like_query)
+        self.assertIn("ILIKE regexp_replace(COALESCE(region.adm_area_1, ''), '[^\\w%]+', '', 'g')", like_query)
+        self.assertEqual(result, {keys[0]: ('United Kingdom', 'England', None, None, ['GBR.1_1']),
+                                  keys[1]: ('United Kingdom', 'England', None, None, ['GBR.1_1'])})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+
+from utils.prefetch import Prefetcher, Download
+
+
+class PrefetcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.prefetcher = Prefetcher(max_workers=2, timeout=1,
+                                     state_path=os.path.join(self.tmp_dir.name, 'http_state.sqlite'))
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def download(self, url, conditional=False):
+        if url.startswith('parallel'):
+            # Fails unless both downloads run at the same time
+            self.barrier.wait()
+        return Download(url.encode(), f'"{url}"', None)
+
+    def test_prefetched_urls_downloaded_concurrently(self):
+        with mock.patch.object(Prefetcher, 'download', side_effect=self.download) as download:
+            self.prefetcher.submit(['parallel_1', 'parallel_2'])
+
+            self.assertEqual(self.prefetcher.get('parallel_1').read(), b'parallel_1')
+            self.assertEqual(self.prefetcher.get('parallel_2').read(), b'parallel_2')
+            self.assertEqual(self.prefetcher.get('parallel_1').read(), b'parallel_1')
+            self.assertEqual(download.call_count, 2)
+
+    def test_url_downloaded_on_request(self):
+        with mock.patch.object(Prefetcher, 'download', side_effect=self.download) as download:
+            self.prefetcher.submit(['url_1'])
+            self.prefetcher.get('url_1')
+            self.prefetcher.release(['url_1'])
+
+            self.assertEqual(self.prefetcher.get('url_1').read(), b'url_1')
+            self.assertEqual(self.prefetcher.get('url_2').read(), b'url_2')
+            self.assertEqual(download.call_count, 3)
+
+
+class ConditionalDownloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.prefetcher = Prefetcher(max_workers=2, timeout=1,
+                                     state_path=os.path.join(self.tmp_dir.name, 'http_state.sqlite'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def response(status_code, content=b'', headers=None):
+        response = mock.MagicMock(status_code=status_code, content=content, headers=headers or {})
+        return response
+
+    def test_validators_sent_after_state_saved(self):
+        url = 'https://example.com/data.csv'
+        with mock.patch('utils.prefetch.requests.get',
+                        return_value=self.response(200, b'a,b', {'ETag': '"v1"'})) as get:
+            self.assertTrue(self.prefetcher.is_modified([url]))
+            self.assertEqual(get.call_args[1]['headers'], {})
+
+            # Nothing is saved until the data were processed
+            self.prefetcher.release([url])
+            self.assertTrue(self.prefetcher.is_modified([url]))
+            self.prefetcher.save_state([url])
+            self.prefetcher.release([url])
+
+        with mock.patch('utils.prefetch.requests.get', return_value=self.response(304)) as get:
+            self.assertFalse(self.prefetcher.is_modified([url]))
+            self.assertEqual(get.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+
+        with mock.patch('utils.prefetch.requests.get', return_value=self.response(200, b'a,b')) as get:
+            # Unchanged data are downloaded again when read
+            self.assertEqual(self.prefetcher.get(url).read(), b'a,b')
+            self.assertEqual(get.call_args[1]['headers'], {})
+
+    def test_unchanged_payload_detected_by_hash(self):
+        url = 'https://example.com/data.csv'
+        with mock.patch('utils.prefetch.requests.get', return_value=self.response(200, b'a,b')):
+            self.assertTrue(self.prefetcher.is_modified([url], conditional=False, compare_content=True))
+            self.prefetcher.save_state([url])
+            self.prefetcher.release([url])
+
+            self.assertFalse(self.prefetcher.is_modified([url], conditional=False, compare_content=True))
+            self.prefetcher.release([url])
+
+        with mock.patch('utils.prefetch.requests.get', return_value=self.response(200, b'a,c')):
+            self.assertTrue(self.prefetcher.is_modified([url], conditional=False, compare_content=True))
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from adapters.sqlite import SqliteHelper
+from utils.adapter.row_delta import RowDelta
+from utils.types import FetcherType
+
+
+def record(date: str, confirmed: int) -> dict:
+    return {'source': 'TST', 'date': date, 'country': 'United Kingdom', 'countrycode': 'GBR',
+            'adm_area_1': 'England', 'adm_area_2': None, 'adm_area_3': None, 'gid': ['GBR.1_1'],
+            'confirmed': confirmed}
+
+
+class RowDeltaTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp_dir.name, 'row_state.sqlite')
+        self.adapter = SqliteHelper(os.path.join(self.tmp_dir.name, 'covid19.sqlite'))
+        self.adapter.row_delta = RowDelta(self.state_path, 'test')
+
+    def tearDown(self):
+        self.adapter.close_connection()
+        self.tmp_dir.cleanup()
+
+    def upsert(self, records: list) -> list:
+        with mock.patch.object(SqliteHelper, 'upsert_batch_data') as upsert_batch_data:
+            self.adapter.upsert_many(FetcherType.EPIDEMIOLOGY, records)
+        return upsert_batch_data.call_args[0][2] if upsert_batch_data.called else []
+
+    def test_unchanged_rows_not_written_after_save(self):
+        records = [record('2020-01-01', 1), record('2020-01-02', 2)]
+        self.assertEqual(len(self.upsert(records)), 2)
+        self.adapter.save_row_state()
+
+        self.assertEqual(self.upsert(records), [])
+        self.assertEqual(self.upsert([record('2020-01-01', 1), record('2020-01-02', 3)]),
+                         [record('2020-01-02', 3)])
+
+        # Hashes are read back from the state file by a new run
+        self.adapter.save_row_state()
+        self.adapter.row_delta = RowDelta(self.state_path, 'test')
+        self.assertEqual(self.upsert([record('2020-01-02', 3)]), [])
+
+    def test_discarded_rows_written_again(self):
+        self.upsert([record('2020-01-01', 1)])
+        self.adapter.discard_row_state()
+
+        self.assertEqual(len(self.upsert([record('2020-01-01', 1)])), 1)
+
+    def test_row_reverted_within_run_written(self):
+        self.upsert([record('2020-01-01', 1)])
+        self.adapter.save_row_state()
+
+        self.assertEqual(len(self.upsert([record('2020-01-01', 2), record('2020-01-01', 1)])), 2)
@@ -0,0 +1,36 @@
+import datetime
+import unittest
+import unittest.mock as mock
+
+from utils.config import config
+from utils.types import FetcherType
+from utils.validation import validate_incoming_data
+
+
+class WindowValidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_adapter = mock.Mock()
+        patcher = mock.patch.object(config, 'VALIDATION_MODE', 'window')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_data_sent_without_differences(self):
+        self.data_adapter.call_db_function_compare_dates.return_value = []
+
+        self.assertTrue(validate_incoming_data(self.data_adapter, FetcherType.EPIDEMIOLOGY, 'TST'))
+        self.data_adapter.call_db_function_compare.assert_not_called()
+        self.data_adapter.publish_staging.assert_called_once_with(FetcherType.EPIDEMIOLOGY, 'TST')
+
+    def test_differences_reported_by_date(self):
+        self.data_adapter.call_db_function_compare_dates.return_value = [
+            {'date': datetime.date(2020, 3, 1), 'staging_rows': 2, 'existing_rows': 2},
+            {'date': datetime.date(2020, 3, 2), 'staging_rows': 1, 'existing_rows': 3}
+        ]
+
+        with mock.patch('utils.validation.send_email') as send_email:
+            self.assertFalse(validate_incoming_data(self.data_adapter, FetcherType.EPIDEMIOLOGY, 'TST'))
+        self.data_adapter.publish_staging.assert_not_called()
+        message = send_email.call_args[0][2]
+        self.assertIn('2020-03-01: 2 incoming rows, 2 existing rows', message)
+        self.assertIn('2020-03-02: 1 incoming rows, 3 existing rows', message)
@@ -0,0 +1,450 @@
+import math
+import unittest
+import unittest.mock as mock
+from datetime import datetime as dt, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.helper import int_or_none, int_or_none_series, remove_words
+from utils.adapter.abstract_adapter import AbstractAdapter
+from plugins.GOVTRACK.utils import to_int, to_int_series
+from plugins.USA_CTP.fetcher import UnitedStatesCTPFetcher
+from plugins.WRD_ECDC.fetcher import WorldECDCFetcher, continents_codes
+from plugins.WRD_WHO.fetcher import WorldWHOFetcher
+from plugins.GBR_PHS.fetcher import ScotlandFetcher
+from plugins.GOVTRACK.fetcher import StringencyFetcher
+from plugins.WEATHER.fetcher import METDailyWeatherFetcher, WEATHER_COLUMNS
+from plugins.GOOGLE_MOBILITY.fetcher import GoogleMobilityFetcher
+
+nan = float('nan')
+
+adm_divisions = {
+    ('GBR', None, None, None): ('United Kingdom', None, None, None, ['GBR']),
+    ('FRA', None, None, None): ('France', None, None, None, ['FRA']),
+    ('GBR', '%', 'Greater London', None): ('United Kingdom', 'England', 'Greater London', None, ['GBR.1.33_1']),
+    ('USA', 'New York', 'Kings', None): ('United States', 'New York', 'Kings', None, ['USA.33.24_1'])
+}
+
+
+class RecordingAdapter(AbstractAdapter):
+    """ Records rows written by single row upserts and by batches """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def upsert_row(self, fetcher_type, table_name, data):
+        self.records.append(data)
+
+    def upsert_batch_data(self, fetcher_type, table_name, records):
+        self.records.extend(records)
+
+    def upsert_government_response_data(self, table_name, **kwargs):
+        raise NotImplementedError()
+
+    def upsert_epidemiology_data(self, table_name, **kwargs):
+        raise NotImplementedError()
+
+    def upsert_mobility_data(self, table_name, **kwargs):
+        raise NotImplementedError()
+
+    def get_adm_division(self, countrycode, adm_area_1=None, adm_area_2=None, adm_area_3=None):
+        key = (countrycode, adm_area_1 or None, adm_area_2 or None, adm_area_3 or None)
+        if key not in adm_divisions:
+            raise Exception(f'Unable to find: {key}')
+        return adm_divisions[key]
+
+
+def normalize_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    # upsert_frame writes NaN as NULL
+    if value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def normalize(records):
+    # Rows in any order, types of the values are compared as well
+    return sorted(repr(sorted((key, normalize_value(value)) for key, value in record.items())) for record in records)
+
+
+def usa_ctp_old(fetcher, national, states):
+    for index, record in national.iterrows():
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE,
+            'date': dt.strptime(str(int(record[0])), '%Y%m%d').strftime('%Y-%m-%d'),
+            'country': 'United States',
+            'countrycode': 'USA',
+            'tested': int(record[6]) if pd.notna(record[6]) else None,
+            'confirmed': int(record[1]) if pd.notna(record[1]) else None,
+            'recovered': int(record[4]) if pd.notna(record[4]) else None,
+            'dead': int(record[5]) if pd.notna(record[5]) else None,
+            'hospitalised': int(record[2]) if pd.notna(record[2]) else None,
+            'hospitalised_icu': int(record[3]) if pd.notna(record[3]) else None,
+            'gid': ['USA']
+        })
+
+    for index, record in states.iterrows():
+        success, adm_area_1, adm_area_2, adm_area_3, gid = fetcher.adm_translator.tr(
+            country_code='USA', input_adm_area_1=record[1], return_original_if_failure=True)
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE,
+            'date': dt.strptime(str(int(record[0])), '%Y%m%d').strftime('%Y-%m-%d'),
+            'country': 'United States',
+            'countrycode': 'USA',
+            'adm_area_1': adm_area_1,
+            'adm_area_2': adm_area_2,
+            'adm_area_3': adm_area_3,
+            'tested': int(record[7]) if pd.notna(record[7]) else None,
+            'confirmed': int(record[2]) if pd.notna(record[2]) else None,
+            'recovered': int(record[5]) if pd.notna(record[5]) else None,
+            'dead': int(record[6]) if pd.notna(record[6]) else None,
+            'hospitalised': int(record[3]) if pd.notna(record[3]) else None,
+            'hospitalised_icu': int(record[4]) if pd.notna(record[4]) else None,
+            'gid': gid
+        })
+
+
+def wrd_ecdc_old(fetcher, data):
+    for index, record in data.iterrows():
+        if pd.isna(record['country_code']):
+            continue
+        country, adm_area_1, adm_area_2, adm_area_3, gid = fetcher.data_adapter.get_adm_division(
+            record['country_code'])
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE, 'date': record['year_week'].strftime('%Y-%m-%d'), 'country': country,
+            'countrycode': record['country_code'], 'adm_area_1': None, 'adm_area_2': None, 'adm_area_3': None,
+            'gid': [record['country_code']], 'confirmed': int(record['cases']), 'dead': int(record['deaths'])
+        })
+
+    continentaldf = data.groupby(['year_week', 'continent'], as_index=False)[['cases', 'deaths']].sum()
+    for index, record in continentaldf.iterrows():
+        continent = 'Other continent' if record['continent'] == 'Other' else record['continent']
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE, 'date': record['year_week'].strftime('%Y-%m-%d'), 'country': continent,
+            'countrycode': continents_codes.get(continent), 'adm_area_1': None, 'adm_area_2': None,
+            'adm_area_3': None, 'gid': None, 'confirmed': int(record['cases']), 'dead': int(record['deaths'])
+        })
+
+    globaldf = continentaldf.groupby(['year_week'], as_index=False)[['cases', 'deaths']].sum()
+    for index, record in globaldf.iterrows():
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE, 'date': record['year_week'].strftime('%Y-%m-%d'), 'country': 'World',
+            'countrycode': 'WRD', 'adm_area_1': None, 'adm_area_2': None, 'adm_area_3': None, 'gid': None,
+            'confirmed': int(record['cases']), 'dead': int(record['deaths'])
+        })
+
+
+def wrd_who_old(fetcher, data):
+    for index, record in data.iterrows():
+        country, countrycode = fetcher.country_codes_translator.get_country_info(country_a2_code=str(record[1]))
+        if pd.isna(countrycode):
+            continue
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE, 'date': str(record[0]), 'country': country, 'countrycode': countrycode,
+            'adm_area_1': None, 'adm_area_2': None, 'adm_area_3': None, 'gid': [countrycode],
+            'confirmed': int(record[5]), 'dead': int(record[7])
+        })
+
+    globaldf = data.groupby(['Date_reported'], as_index=False)[['Cumulative_cases', 'Cumulative_deaths']].sum()
+    for index, record in globaldf.iterrows():
+        fetcher.upsert_data(**{
+            'source': fetcher.SOURCE, 'date': str(record['Date_reported']), 'country': 'World', 'countrycode': 'WRD',
+            'adm_area_1': None, 'adm_area_2': None, 'adm_area_3': None, 'gid': None,
+            'confirmed': int(record['Cumulative_cases']), 'dead': int(record['Cumulative_deaths'])
+        })
+
+
+def gbr_phs_old(fetcher, health_boards, local_authorities):
+    for data, column in [(health_boards, 'HBName'), (local_authorities, 'CAName')]:
+        for index, record in data.iterrows():
+            input_adm_area_2 = record[column] if record[column] != 'Scotland' or column == 'CAName' else None
+            success, adm_area_1, adm_area_2, adm_area_3, gid = fetcher.adm_translator.tr(
+                input_adm_area_1='Scotland', input_adm_area_2=input_adm_area_2, return_original_if_failure=True)
+            upsert_obj = {
+                'source': fetcher.SOURCE,
+                'date': dt.strptime(str(record['Date']), '%Y%m%d').strftime('%Y-%m-%d'),
+                'country': 'United Kingdom',
+                'countrycode': 'GBR',
+                'adm_area_1': adm_area_1,
+                'adm_area_2': adm_area_2,
+                'tested': int_or_none(record['TotalTests']),
+                'confirmed': int_or_none(record['CumulativePositive']),
+                'dead': int_or_none(record['CumulativeDeaths']),
+                'gid': gid
+            }
+            fetcher.upsert_data(**upsert_obj)
+
+            if column == 'CAName':
+                upsert_obj['adm_area_3'] = adm_area_2
+                upsert_obj['gid'] = [upsert_obj['gid'][0].split('_')[0] + '.1_1']
+                fetcher.upsert_data(**upsert_obj)
+
+
+govtrack_int_columns = {
+    'c1_school_closing': 'C1_School closing', 'c1_flag': 'C1_Flag', 'c2_workplace_closing': 'C2_Workplace closing',
+    'c2_flag': 'C2_Flag', 'c3_cancel_public_events': 'C3_Cancel public events', 'c3_flag': 'C3_Flag',
+    'c4_restrictions_on_gatherings': 'C4_Restrictions on gatherings', 'c4_flag': 'C4_Flag',
+    'c5_close_public_transport': 'C5_Close public transport', 'c5_flag': 'C5_Flag',
+    'c6_stay_at_home_requirements': 'C6_Stay at home requirements', 'c6_flag': 'C6_Flag',
+    'c7_restrictions_on_internal_movement': 'C7_Restrictions on internal movement', 'c7_flag': 'C7_Flag',
+    'c8_international_travel_controls': 'C8_International travel controls', 'e1_income_support': 'E1_Income support',
+    'e1_flag': 'E1_Flag', 'e2_debtcontract_relief': 'E2_Debt/contract relief',
+    'h1_public_information_campaigns': 'H1_Public information campaigns', 'h1_flag': 'H1_Flag',
+    'h2_testing_policy': 'H2_Testing policy', 'h3_contact_tracing': 'H3_Contact tracing'
+}
+
+govtrack_columns = {
+    'e3_fiscal_measures': 'E3_Fiscal measures', 'e4_international_support': 'E4_International support',
+    'h4_emergency_investment_in_healthcare': 'H4_Emergency investment in healthcare',
+    'h5_investment_in_vaccines': 'H5_Investment in vaccines', 'm1_wildcard': 'M1_Wildcard',
+    'stringency_index': 'StringencyIndex', 'stringency_indexfordisplay': 'StringencyIndexForDisplay',
+    'stringency_legacy_index': 'StringencyLegacyIndex',
+    'stringency_legacy_indexfordisplay': 'StringencyLegacyIndexForDisplay',
+    'government_response_index': 'GovernmentResponseIndex',
+    'government_response_index_for_display': 'GovernmentResponseIndexForDisplay',
+    'containment_health_index': 'ContainmentHealthIndex',
+    'containment_health_index_for_display': 'ContainmentHealthIndexForDisplay',
+    'economic_support_index': 'EconomicSupportIndex',
+    'economic_support_index_for_display': 'EconomicSupportIndexForDisplay'
+}
+
+
+def govtrack_old(fetcher, data):
+    for index, record in data.iterrows():
+        upsert_obj = {
+            'source': fetcher.SOURCE,
+            'gid': record['CountryCode'],
+            'country': record['English short name lower case'],
+            'countrycode': record['CountryCode'],
+            'date': pd.to_datetime(record['Date'], format='%Y%m%d').strftime('%Y-%m-%d')
+        }
+        upsert_obj.update({column: to_int(record[csv_column]) for column, csv_column in govtrack_int_columns.items()})
+        upsert_obj.update({column: record[csv_column] for column, csv_column in govtrack_columns.items()})
+        fetcher.upsert_data(**upsert_obj)
+
+
+def weather_old(fetcher, data):
+    for index, row in data.iterrows():
+        upsert_obj = {column: row[column] for column in WEATHER_COLUMNS}
+        upsert_obj['gid'] = [row['gid']]
+        fetcher.upsert_data(**upsert_obj)
+
+
+def google_mobility_old(fetcher, data):
+    region_cache = dict()
+    for index, record in data.iterrows():
+        country, countrycode = fetcher.country_codes_translator.get_country_info(
+            country_a2_code=record['country_region_code'], country_name=record['country_region'])
+        if pd.isna(countrycode):
+            continue
+
+        input_adm_area_1 = record['sub_region_1'].strip() if pd.notna(record['sub_region_1']) else None
+        input_adm_area_2 = record['sub_region_2'].strip() if pd.notna(record['sub_region_2']) else None
+        if countrycode == 'USA':
+            if input_adm_area_2:
+                input_adm_area_2 = remove_words(input_adm_area_2, words=['County', 'Parish']) \
+                    .replace('St.', 'Saint').strip()
+        elif countrycode == 'GBR' and input_adm_area_1:
+            if input_adm_area_2:
+                continue
+            input_adm_area_2 = input_adm_area_1
+            input_adm_area_1 = '%'
+        elif input_adm_area_1:
+            input_adm_area_1 = remove_words(
+                input_adm_area_1,
+                words=['Province', 'District', 'County', 'Region', 'Governorate', 'State of', 'Department'])
+
+        key = (countrycode, input_adm_area_1, input_adm_area_2, '')
+        if key not in region_cache:
+            region_cache[key] = fetcher.get_region(countrycode, input_adm_area_1, input_adm_area_2,
+                                                   suppress_exception=True)
+        adm_area_1, adm_area_2, adm_area_3, gid = region_cache[key]
+
+        if gid:
+            fetcher.upsert_data(**{
+                'source': fetcher.SOURCE,
+                'date': record['date'],
+                'country': country,
+                'countrycode': countrycode,
+                'adm_area_1': adm_area_1,
+                'adm_area_2': adm_area_2,
+                'gid': gid,
+                'transit_stations': record['transit_stations_percent_change_from_baseline'],
+                'residential': record['residential_percent_change_from_baseline'],
+                'workplace': record['workplaces_percent_change_from_baseline'],
+                'parks': record['parks_percent_change_from_baseline'],
+                'retail_recreation': record['retail_and_recreation_percent_change_from_baseline'],
+                'grocery_pharmacy': record['grocery_and_pharmacy_percent_change_from_baseline']
+            })
+
+
+class VectorizedFetchersTestCase(unittest.TestCase):
+    """ Rows written by the frame based parsing of the plugins match rows of their former row by row parsing """
+
+    def records(self, fetcher_class, parse, *args, **patches):
+        adapter = RecordingAdapter()
+        fetcher = fetcher_class(adapter)
+        parse(fetcher, *args)
+        old_records = adapter.records
+
+        adapter.records = []
+        with mock.patch.multiple(fetcher, **patches):
+            fetcher.run()
+        return normalize(old_records), normalize(adapter.records)
+
+    def test_usa_ctp(self):
+        national = pd.DataFrame({
+            'date': [20200501, 20200502],
+            'positive': [10.0, nan],
+            'hospitalizedCumulative': [3.0, 4.0],
+            'inIcuCumulative': [nan, 1.0],
+            'recovered': [2.0, 3.0],
+            'death': [1.0, 1.0],
+            'totalTestResults': [100.0, 200.0]
+        })
+        states = pd.DataFrame({
+            'date': [20200501, 20200501, 20200502],
+            'state': ['NY', 'GU', 'ZZ'],
+            'positive': [5.0, 1.0, nan],
+            'hospitalizedCumulative': [nan, 1.0, 2.0],
+            'inIcuCumulative': [1.0, nan, 2.0],
+            'recovered': [nan, nan, 1.0],
+            'death': [1.0, 0.0, 0.0],
+            'totalTestResults': [50.0, 10.0, nan]
+        })
+        fetch = mock.MagicMock(side_effect=lambda category, usecols: national if category == 'us' else states)
+        old, new = self.records(UnitedStatesCTPFetcher, usa_ctp_old, national, states, fetch=fetch)
+        self.assertEqual(len(old), 5)
+        self.assertEqual(new, old)
+
+    def test_wrd_ecdc(self):
+        data = pd.DataFrame({
+            'country_code': ['GBR', 'FRA', 'GBR'],
+            'continent': ['Europe', 'Other', 'Europe'],
+            'year_week': pd.to_datetime(['2020-05-07', '2020-05-07', '2020-05-14']),
+            'cases': [10.0, 5.0, 12.0],
+            'deaths': [1.0, 0.0, 2.0]
+        })
+        old, new = self.records(WorldECDCFetcher, wrd_ecdc_old, data, fetch=mock.MagicMock(return_value=data))
+        self.assertEqual(len(old), 8)
+        self.assertEqual(new, old)
+
+    def test_wrd_who(self):
+        data = pd.DataFrame({
+            'Date_reported': ['2020-05-01', '2020-05-01', '2020-05-01', '2020-05-02'],
+            'Country_code': ['GB', 'FR', 'XX', 'GB'],
+            'Country': ['United Kingdom', 'France', 'Unknown', 'United Kingdom'],
+            'WHO_region': ['EURO', 'EURO', 'OTHER', 'EURO'],
+            'New_cases': [1, 2, 3, 4],
+            'Cumulative_cases': [10, 20, 30, 14],
+            'New_deaths': [0, 1, 0, 1],
+            'Cumulative_deaths': [1, 2, 3, 2]
+        })
+        old, new = self.records(WorldWHOFetcher, wrd_who_old, data, fetch=mock.MagicMock(return_value=data))
+        self.assertEqual(len(old), 5)
+        self.assertEqual(new, old)
+
+    def test_gbr_phs(self):
+        health_boards = pd.DataFrame({
+            'Date': [20200501, 20200501, 20200502],
+            'HBName': ['Scotland', 'NHS Lothian', 'NHS Unknown'],
+            'TotalTests': [100.0, nan, 3.7],
+            'CumulativePositive': [10.0, -1.0, 2.0],
+            'CumulativeDeaths': [1.0, 0.0, nan]
+        })
+        local_authorities = pd.DataFrame({
+            'Date': [20200501, 20200502],
+            'CAName': ['Glasgow City', 'East Lothian'],
+            'TotalTests': [40.0, 20.5],
+            'CumulativePositive': [nan, 3.0],
+            'CumulativeDeaths': [-2.0, 1.0]
+        })
+        old, new = self.records(ScotlandFetcher, gbr_phs_old, health_boards, local_authorities,
+                                fetch_health_board=mock.MagicMock(return_value=health_boards),
+                                fetch_local_authority=mock.MagicMock(return_value=local_authorities))
+        self.assertEqual(len(old), 7)
+        self.assertEqual(new, old)
+
+    def test_govtrack(self):
+        csv_columns = list(govtrack_int_columns.values()) + list(govtrack_columns.values())
+        data = pd.DataFrame({column: [2.0, None, 1.5] for column in csv_columns}, dtype=object)
+        data['CountryCode'] = ['GBR', 'FRA', 'XXX']
+        data['CountryName'] = ['United Kingdom', 'France', 'Unknown']
+        data['Date'] = [20200501, 20200502, 20200503]
+        data['English short name lower case'] = ['United Kingdom', 'France', None]
+
+        adapter = RecordingAdapter()
+        fetcher = StringencyFetcher(adapter)
+        govtrack_old(fetcher, data)
+        # GIDs of the CSV rows are lists now, like the GIDs of the other sources
+        old = normalize(dict(record, gid=[record['gid']]) for record in adapter.records)
+
+        adapter.records = []
+        with mock.patch.multiple(fetcher, fetch_csv=mock.MagicMock(return_value=data),
+                                 fetch=mock.MagicMock(return_value=pd.DataFrame())):
+            fetcher.run()
+        self.assertEqual(len(old), 3)
+        self.assertEqual(normalize(adapter.records), old)
+
+    def test_weather(self):
+        data = pd.DataFrame({column: [1.5, nan] for column in WEATHER_COLUMNS})
+        data['source'] = 'MET'
+        data['date'] = '2020-05-01'
+        data['gid'] = ['GBR.1_1', 'GBR.2_1']
+        data['country'] = 'United Kingdom'
+        data['countrycode'] = 'GBR'
+        data['adm_area_1'] = ['England', 'Northern Ireland']
+        data['adm_area_2'] = None
+        data['adm_area_3'] = None
+        data['samplesize'] = [10, 20]
+
+        last_date = (dt.now() - timedelta(days=2)).date()
+        with mock.patch('plugins.WEATHER.fetcher.load_local_data', return_value=(None, None, None)):
+            old, new = self.records(METDailyWeatherFetcher, weather_old, data,
+                                    fetch=mock.MagicMock(return_value=data),
+                                    get_last_weather_date=mock.MagicMock(return_value=last_date))
+        self.assertEqual(len(old), 2)
+        self.assertEqual(new, old)
+
+    def test_google_mobility(self):
+        data = pd.DataFrame({
+            'country_region_code': ['GB', 'GB', 'GB', 'US', 'FR', 'FR', 'AO', None],
+            'country_region': ['United Kingdom', 'United Kingdom', 'United Kingdom', 'United States', 'France',
+                               'France', 'Angola', 'Unknown'],
+            'sub_region_1': [None, 'Greater London', 'Greater London', 'New York', None, 'Corse', 'Huila', None],
+            'sub_region_2': [None, None, 'Camden', 'Kings County', None, None, None, None],
+            'date': ['2020-05-01'] * 8,
+            'transit_stations_percent_change_from_baseline': [1.0, 2.0, 3.0, nan, 5.0, 6.0, 7.0, 8.0],
+            'residential_percent_change_from_baseline': [1.0] * 8,
+            'workplaces_percent_change_from_baseline': [nan] * 8,
+            'parks_percent_change_from_baseline': [-1.0] * 8,
+            'retail_and_recreation_percent_change_from_baseline': [0.0] * 8,
+            'grocery_and_pharmacy_percent_change_from_baseline': [2.0] * 8
+        })
+        with mock.patch('plugins.GOOGLE_MOBILITY.fetcher.open', mock.mock_open(), create=True):
+            old, new = self.records(GoogleMobilityFetcher, google_mobility_old, data,
+                                    fetch=mock.MagicMock(return_value=data))
+        self.assertEqual(len(old), 5)
+        self.assertEqual(new, old)
+
+
+class IntSeriesTestCase(unittest.TestCase):
+
+    def test_int_or_none_series(self):
+        values = [nan, -1.0, -0.5, 0.0, 2.7, 3.0, 1e12]
+        result = int_or_none_series(pd.Series(values)).astype(object).where(lambda x: x.notna(), None)
+        self.assertEqual(result.tolist(), [int_or_none(value) for value in values])
+        self.assertEqual(result.tolist(), [None, None, 0, 0, 2, 3, 10 ** 12])
+
+    def test_to_int_series(self):
+        values = [None, nan, -1.0, -2.5, 0.0, 2.7, '3']
+        result = to_int_series(pd.Series(values, dtype=object)).astype(object).where(lambda x: x.notna(), None)
+        self.assertEqual(result.tolist(), [to_int(value) for value in values])
+        self.assertEqual(result.tolist(), [None, None, -1, -2, 0, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,11 +13,14 @@
 # limitations under the License.
 
 import logging
-from typing import List, Dict
+import pandas as pd
+from pandas import DataFrame
+from typing import List, Dict, Iterable, Tuple
 from datetime import datetime
 from utils.types import FetcherType
 from abc import ABC, abstractmethod
 from utils.config import config
+from utils.adm_division import AdmDivisionResolver, get_resolver
 
 __all__ = ('AbstractAdapter',)
 
@@ -25,7 +28,14 @@ logger = logging.getLogger(__name__)
 
 
 class AbstractAdapter(ABC):
-    MISSING_GIDS = set()
+    # Adapters keeping their rows between runs set it, so unchanged rows are not written again
+    row_delta = None
+    # Staging tables the running plugin writes into instead of the tables of its fetcher type, see start_staging
+    staging_tables = dict()
+
+    def __init__(self):
+        # Regions without a GID written by the running plugin, each worker of PLUGIN_CONCURRENCY has its own adapter
+        self.missing_gids = set()
 
     @staticmethod
     def date_in_window(args: Dict) -> bool:
@@ -43,12 +53,8 @@ class AbstractAdapter(ABC):
 
         return True
 
-    @staticmethod
-    def correct_table_name(table_name: str) -> str:
-        if config.VALIDATE_INPUT_DATA and table_name in ['epidemiology']:
-            return 'staging_' + table_name
-
-        return table_name
+    def correct_table_name(self, table_name: str) -> str:
+        return self.staging_tables.get(table_name, table_name)
 
     @abstractmethod
     def upsert_government_response_data(self, table_name: str, **kwargs):
@@ -67,38 +73,107 @@ class AbstractAdapter(ABC):
                          adm_area_3: str = None):
         raise NotImplementedError()
 
+    @staticmethod
+    def adm_division_resolver() -> AdmDivisionResolver:
+        # Local administrative_division snapshot, None when ADM_DIVISION_SNAPSHOT isn't set
+        return get_resolver(config.ADM_DIVISION_SNAPSHOT) if config.ADM_DIVISION_SNAPSHOT else None
+
+    def get_adm_divisions(self, keys: Iterable[Tuple]) -> Dict[Tuple, Tuple]:
+        """
+        Resolves (countrycode, adm_area_1, adm_area_2, adm_area_3) keys like get_adm_division,
+        keys which can't be resolved, because they are unknown or ambiguous, are left out
+        """
+        results = dict()
+        for key in keys:
+            try:
+                results[key] = self.get_adm_division(*key)
+            except Exception:
+                pass
+        return results
+
     def check_if_gid_exists(self, kwargs: List) -> bool:
         if not kwargs.get('gid') and not kwargs.get('msoa'):
             missing = kwargs.get("source"), kwargs.get("countrycode"), kwargs.get("adm_area_1"), kwargs.get(
                 "adm_area_2"), kwargs.get("adm_area_3")
-            if missing not in self.MISSING_GIDS:
-                self.MISSING_GIDS.add(missing)
+            if missing not in self.missing_gids:
+                self.missing_gids.add(missing)
 
     def publish_missing_gids(self):
-        if self.MISSING_GIDS:
-            for gid in self.MISSING_GIDS:
+        if self.missing_gids:
+            for gid in self.missing_gids:
                 logger.warning(f'GID is missing for: {gid}, please correct your data')
+            self.missing_gids = set()
+
+    @staticmethod
+    def conflict_key(fetcher_type: FetcherType, record: Dict) -> Tuple:
+        if fetcher_type == FetcherType.WEATHER:
+            gid = record.get('gid')
+            return str(record.get('date')), tuple(gid) if isinstance(gid, list) else gid
+
+        key = (str(record.get('date')), record.get('country'), record.get('countrycode'),
+               record.get('adm_area_1') or '', record.get('adm_area_2') or '', record.get('adm_area_3') or '',
+               record.get('source'))
+        if fetcher_type == FetcherType.EPIDEMIOLOGY_MSOA:
+            key = key + (record.get('msoa'),)
+        return key
+
+    def is_row_changed(self, fetcher_type: FetcherType, table_name: str, record: Dict) -> bool:
+        # Staging tables are emptied before every run, all their rows are written
+        if self.row_delta is None or table_name.startswith('staging_'):
+            return True
+        return self.row_delta.is_changed(table_name, self.conflict_key(fetcher_type, record), record)
+
+    def save_row_state(self):
+        if self.row_delta is not None:
+            self.row_delta.save()
+
+    def discard_row_state(self):
+        if self.row_delta is not None:
+            self.row_delta.discard()
 
     def upsert_data(self, fetcher_type: FetcherType, **kwargs):
         if not self.date_in_window(kwargs):
             return
 
         table_name = self.correct_table_name(fetcher_type.value)
+        if not self.is_row_changed(fetcher_type, table_name, kwargs):
+            return
+        return self.upsert_row(fetcher_type, table_name, kwargs)
 
+    def upsert_row(self, fetcher_type: FetcherType, table_name: str, data: Dict):
         if fetcher_type == FetcherType.EPIDEMIOLOGY:
-            return self.upsert_epidemiology_data(table_name, **kwargs)
+            return self.upsert_epidemiology_data(table_name, **data)
         elif fetcher_type == FetcherType.EPIDEMIOLOGY_MSOA:
             data_keys = ['msoa', 'msoa_code', 'confirmed', 'dead', 'population']
-            return self.upsert_epidemiology_data(table_name, data_keys, **kwargs)
+            return self.upsert_epidemiology_data(table_name, data_keys, **data)
         elif fetcher_type == FetcherType.MOBILITY:
-            return self.upsert_mobility_data(table_name, **kwargs)
+            return self.upsert_mobility_data(table_name, **data)
         elif fetcher_type == FetcherType.GOVERNMENT_RESPONSE:
-            return self.upsert_government_response_data(table_name, **kwargs)
+            return self.upsert_government_response_data(table_name, **data)
         elif fetcher_type == FetcherType.WEATHER:
-            return self.upsert_weather_data(table_name, **kwargs)
+            return self.upsert_weather_data(table_name, **data)
         else:
             raise NotImplementedError()
 
+    def upsert_many(self, fetcher_type: FetcherType, records: Iterable[Dict]):
+        table_name = self.correct_table_name(fetcher_type.value)
+        records = [record for record in records
+                   if self.date_in_window(record) and self.is_row_changed(fetcher_type, table_name, record)]
+        if not records:
+            return
+
+        return self.upsert_batch_data(fetcher_type, table_name, records)
+
+    def upsert_frame(self, fetcher_type: FetcherType, data: DataFrame):
+        # NaN values are stored as NULL, same as None in single row upserts
+        data = data.astype(object).where(pd.notnull(data), None)
+        return self.upsert_many(fetcher_type, data.to_dict('records'))
+
+    def upsert_batch_data(self, fetcher_type: FetcherType, table_name: str, records: List[Dict]):
+        # Adapters without a native bulk path fall back to single row upserts
+        for record in records:
+            self.upsert_row(fetcher_type, table_name, record)
+
     def get_data(self, table_name: str, source: str, date: str, gid: str):
         raise NotImplementedError()
 
@@ -111,11 +186,33 @@ class AbstractAdapter(ABC):
     def flush(self):
         pass
 
+    def reset_row_counts(self):
+        pass
+
+    def get_row_counts(self) -> Dict:
+        # Numbers of inserted, updated and unchanged rows since the last reset, None if not tracked
+        return None
+
+    def rollback(self):
+        pass
+
+    def close_connection(self):
+        pass
+
+    def max_concurrency(self, mode: str) -> int:
+        # Number of plugins which can write in parallel with the given PLUGIN_CONCURRENCY_MODE, None if not limited
+        return None
+
     def call_db_function_compare(self, source_code: str) -> bool:
         return False
 
-    def call_db_function_send_data(self, source_code: str):
+    def call_db_function_compare_dates(self, source_code: str) -> List[Dict]:
+        # Dates of the incoming data which differ from the stored data, with their numbers of rows
+        return []
+
+    def start_staging(self, fetcher_type: FetcherType, source: str):
+        # Adapters without staging tables write the validated data directly
         pass
 
-    def truncate_staging(self):
+    def publish_staging(self, fetcher_type: FetcherType, source: str):
         pass
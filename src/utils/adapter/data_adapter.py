@@ -16,6 +16,7 @@ from utils.config import config
 from adapters.postgresql import PostgresqlHelper
 from adapters.sqlite import SqliteHelper
 from adapters.csvfile import CSVFileHelper
+from adapters.parquetfile import ParquetFileHelper
 from utils.adapter.abstract_adapter import AbstractAdapter
 
 __all__ = ('DataAdapter')
@@ -35,5 +36,7 @@ class DataAdapter:
             return SqliteHelper(sqlite_file_path=config.SQLITE)
         elif config.CSV:
             return CSVFileHelper(csv_path=config.CSV)
+        elif config.PARQUET:
+            return ParquetFileHelper(parquet_path=config.PARQUET)
         else:
             raise ValueError('Unable to select serializer')
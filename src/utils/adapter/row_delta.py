@@ -0,0 +1,100 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import hashlib
+import logging
+import sqlite3
+from typing import Dict, Tuple
+
+from utils.config import config
+
+__all__ = ('RowDelta',)
+
+logger = logging.getLogger(__name__)
+
+
+class RowDelta:
+    """
+    Hashes of the rows written to a destination database, kept in a SQLite file.
+
+    Rows whose hash did not change since the last successful run are not sent to the database again.
+    Hashes are loaded once per table and source, and saved only after the data of a run was committed.
+    """
+
+    def __init__(self, path: str, destination: str):
+        self.path = path
+        self.destination = destination
+        self.hashes = dict()
+        self.pending = dict()
+        self.execute('CREATE TABLE IF NOT EXISTS row_state ('
+                     'destination TEXT, table_name TEXT, source TEXT, key TEXT, hash TEXT, '
+                     'PRIMARY KEY (destination, table_name, source, key)) WITHOUT ROWID')
+
+    @staticmethod
+    def from_config(destination: str):
+        return RowDelta(config.ROW_STATE, destination) if config.ROW_STATE else None
+
+    def execute(self, sql: str, parameters: tuple = ()):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, parameters).fetchall()
+        finally:
+            conn.close()
+
+    def load(self, table_name: str, source: str) -> Dict:
+        hashes = self.hashes.get((table_name, source))
+        if hashes is None:
+            rows = self.execute('SELECT key, hash FROM row_state WHERE destination = ? AND table_name = ? '
+                                'AND source = ?', (self.destination, table_name, source))
+            hashes = self.hashes[(table_name, source)] = dict(rows)
+            logger.debug(f'Loaded {len(hashes)} row hashes for: {table_name}, {source}')
+        return hashes
+
+    @staticmethod
+    def row_hash(record: Dict) -> str:
+        data = json.dumps(record, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def is_changed(self, table_name: str, key: Tuple, record: Dict) -> bool:
+        source = record.get('source')
+        key = json.dumps(key, default=str)
+        row_hash = self.row_hash(record)
+
+        pending = self.pending.setdefault((table_name, source), dict())
+        if pending.get(key, self.load(table_name, source).get(key)) == row_hash:
+            return False
+        pending[key] = row_hash
+        return True
+
+    def save(self):
+        if not self.pending:
+            return
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                for (table_name, source), pending in self.pending.items():
+                    conn.executemany('INSERT OR REPLACE INTO row_state (destination, table_name, source, key, hash) '
+                                     'VALUES (?, ?, ?, ?, ?)',
+                                     ((self.destination, table_name, source, key, row_hash)
+                                      for key, row_hash in pending.items()))
+                    self.load(table_name, source).update(pending)
+        finally:
+            conn.close()
+        self.pending = dict()
+
+    def discard(self):
+        self.pending = dict()
@@ -0,0 +1,194 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import csv
+import sys
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Pattern, Tuple
+
+__all__ = ('SNAPSHOT_COLUMNS', 'adm_area_input', 'normalize_adm_area', 'like_pattern', 'read_snapshot', 'write_snapshot',
+           'AdmDivisionResolver', 'get_resolver')
+
+logger = logging.getLogger(__name__)
+
+# Columns of an administrative_division snapshot file
+SNAPSHOT_COLUMNS = ['countrycode', 'country', 'adm_area_1', 'adm_area_2', 'adm_area_3', 'gid']
+
+NON_WORD = re.compile(r'[^\w%]+')
+
+RESOLVERS = dict()
+RESOLVERS_LOCK = threading.Lock()
+
+
+def adm_area_input(value: Optional[str]) -> str:
+    # Missing input areas, None or NaN read by pandas, match an empty area
+    return value if isinstance(value, str) else ''
+
+
+def normalize_adm_area(value: Optional[str]) -> str:
+    """
+    Same as regexp_replace(COALESCE(value, ''), '[^\\w%]+', '', 'g') in Postgres, lower cased for ILIKE
+    """
+    return NON_WORD.sub('', adm_area_input(value)).lower()
+
+
+def like_pattern(pattern: str) -> Optional[Pattern]:
+    # ILIKE wildcards of a normalized input, None when it has none and matches by equality
+    if '%' not in pattern and '_' not in pattern:
+        return None
+    regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return re.compile(regex, re.DOTALL)
+
+
+def read_snapshot(path: str) -> Iterator[Dict]:
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {column: row.get(column) or None for column in SNAPSHOT_COLUMNS}
+
+
+def create_snapshot_table(conn: sqlite3.Connection, rows: Iterable[Dict]):
+    # Match columns hold the names normalized as get_adm_division compares them
+    conn.execute(f"CREATE TABLE administrative_division ({', '.join(SNAPSHOT_COLUMNS)}, match_1, match_2, match_3)")
+    conn.executemany(
+        f"INSERT INTO administrative_division VALUES ({','.join('?' * (len(SNAPSHOT_COLUMNS) + 3))})",
+        ([row[column] for column in SNAPSHOT_COLUMNS] +
+         [normalize_adm_area(row[column]) for column in ('adm_area_1', 'adm_area_2', 'adm_area_3')]
+         for row in rows))
+    conn.execute("CREATE INDEX administrative_division_match "
+                 "ON administrative_division (countrycode, match_1, match_2, match_3)")
+
+
+def write_snapshot(path: str, rows: Iterable[Dict]) -> int:
+    """
+    Writes administrative divisions into a SQLite snapshot file, the file is replaced atomically
+
+    :param path: snapshot file path
+    :param rows: dicts with SNAPSHOT_COLUMNS keys
+    :return: number of divisions written
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            create_snapshot_table(conn, rows)
+        count = conn.execute("SELECT count(*) FROM administrative_division").fetchone()[0]
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+class AdmDivisionResolver:
+    """
+    Resolves administrative divisions from a local snapshot, without a database connection.
+
+    The snapshot is a SQLite file written by write_snapshot, or a CSV file with SNAPSHOT_COLUMNS which is loaded
+    into memory. Divisions of a country are read once, lookups match the same divisions as the ILIKE query
+    of the Postgres adapter.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path.endswith('.csv'):
+            self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+            with self.conn:
+                create_snapshot_table(self.conn, read_snapshot(path))
+        else:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f'Administrative division snapshot not found: {path}')
+            self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.countries = dict()
+
+    def get_country_adm_divisions(self, countrycode: str) -> Dict:
+        # Divisions of a country by their match columns
+        with self.lock:
+            divisions = self.countries.get(countrycode)
+            if divisions is None:
+                divisions = dict()
+                rows = self.conn.execute(
+                    """SELECT country, adm_area_1, adm_area_2, adm_area_3, gid, match_1, match_2, match_3
+                       FROM administrative_division WHERE countrycode = ?""", (countrycode,)).fetchall()
+                for row in rows:
+                    divisions.setdefault(row[5:], []).append(row[:5])
+                self.countries[countrycode] = divisions
+        return divisions
+
+    def get_adm_division(self, countrycode: str, adm_area_1: str = None, adm_area_2: str = None,
+                         adm_area_3: str = None) -> Tuple:
+        key = tuple(normalize_adm_area(value)
+                    for value in (adm_area_1, adm_area_2, adm_area_3))
+        divisions = self.get_country_adm_divisions(countrycode)
+        patterns = [like_pattern(value) for value in key]
+
+        if any(patterns):
+            results = [division for match, rows in divisions.items()
+                       if all(pattern.fullmatch(value) if pattern else value == expected
+                              for pattern, value, expected in zip(patterns, match, key))
+                       for division in rows]
+        else:
+            results = divisions.get(key, [])
+
+        if not results:
+            raise Exception(f'Unable to find adm division for: {countrycode}, {adm_area_1}, {adm_area_2}, {adm_area_3}')
+        if len(results) > 1:
+            raise Exception(f'Ambiguous result: {results}')
+        country, adm_area_1, adm_area_2, adm_area_3, gid = results[0]
+        return country, adm_area_1, adm_area_2, adm_area_3, [gid]
+
+
+def get_resolver(path: str) -> AdmDivisionResolver:
+    # One resolver per snapshot, shared by all adapters of the process
+    with RESOLVERS_LOCK:
+        resolver = RESOLVERS.get(path)
+        if resolver is None:
+            resolver = RESOLVERS[path] = AdmDivisionResolver(path)
+        return resolver
+
+
+def export_snapshot(path: str):
+    # Divisions are read from the configured Postgres database, or from covid19db.org without one
+    from psycopg2 import sql
+    from utils.config import config
+    from adapters.postgresql import PostgresqlHelper, execute_reference_query
+
+    query = sql.SQL(f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM administrative_division")
+    if config.DB_USERNAME and config.DB_PASSWORD and config.DB_ADDRESS and config.DB_NAME \
+            and config.DB_NAME != 'covid19_play':
+        data_adapter = PostgresqlHelper(user=config.DB_USERNAME, password=config.DB_PASSWORD,
+                                        host=config.DB_ADDRESS, port=config.DB_PORT, database_name=config.DB_NAME)
+        try:
+            rows = data_adapter.execute(query)
+        finally:
+            data_adapter.close_connection()
+    else:
+        rows = execute_reference_query(query)
+
+    count = write_snapshot(path, (dict(zip(SNAPSHOT_COLUMNS, row)) for row in rows))
+    logger.info(f'Saved {count} administrative divisions to: {path}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        print('Usage: python3 -m utils.adm_division <snapshot.sqlite>')
+        sys.exit(1)
+    export_snapshot(sys.argv[1])
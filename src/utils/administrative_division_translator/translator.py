@@ -14,9 +14,10 @@
 
 import os
 import logging
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Callable
 
 logger = logging.getLogger(__name__)
 
@@ -31,10 +32,95 @@ def area_compare(data1, data2):
     return False
 
 
+def area_key(data):
+    # Two values have the same key exactly when area_compare considers them equal
+    if isinstance(data, str):
+        return data.lower().replace(" ", "")
+    return data
+
+
+# Marks cached lookups that didn't match any row
+NOT_FOUND = object()
+
+TRANSLATION_COLUMNS = ['adm_area_1', 'adm_area_2', 'adm_area_3', 'gid']
+
+
+def frame_keys(data: DataFrame, input_adm_area_columns: List[str], country_code: str = None,
+               countrycode_column: str = None) -> List[Tuple]:
+    """
+    Returns (countrycode, input_adm_area_1, input_adm_area_2, input_adm_area_3) tuple for every row of data.
+    Missing input columns are None, NaN cells are replaced with a single NaN object, so equal keys hash equally.
+    """
+    columns = [data[countrycode_column] if countrycode_column else country_code]
+    input_adm_area_columns = list(input_adm_area_columns) + [None] * (3 - len(input_adm_area_columns))
+    columns.extend(data[column] if column else None for column in input_adm_area_columns)
+
+    values = []
+    for column in columns:
+        if not isinstance(column, pd.Series):
+            values.append(np.full(len(data), column, dtype=object))
+            continue
+        column = column.astype(object).to_numpy(copy=True)
+        column[pd.isnull(column) & (column != None)] = np.nan  # noqa: E711
+        values.append(column)
+    return list(zip(*values))
+
+
+def join_key(value):
+    """
+    area_key of a translation table value as a string join key: None matches None only,
+    NaN and other values which aren't strings never match
+    """
+    if isinstance(value, str):
+        return 's' + area_key(value)
+    if value is None:
+        return 'n'
+    return None
+
+
+def join_keys(column) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    join_key of every value of an input column, each distinct value is normalized once.
+    Returns the keys, None where nothing can match, a mask of values tr() has to compare itself, values which are
+    neither strings, None nor NaN, and codes of the distinct values
+    """
+    values = np.asarray(column, dtype=object)
+    # None and NaN share the code -1, they are told apart below
+    codes, uniques = pd.factorize(values)
+    normalized = pd.Series(uniques, dtype=object).str.lower().str.replace(' ', '', regex=False)
+    is_str = normalized.notna().to_numpy()
+    unique_keys = np.where(is_str, 's' + normalized.fillna('').to_numpy(dtype=object), None)
+
+    keys = np.append(unique_keys, None)[codes]
+    compare = np.append(~is_str, False)[codes]
+    missing = np.flatnonzero(codes == -1)
+    is_none = missing[values[missing] == None]  # noqa: E711
+    keys[is_none] = 'n'
+    codes[is_none] = len(uniques)
+    return keys, compare, codes
+
+
+def translate_frame(keys: List[Tuple], index, translate: Callable) -> DataFrame:
+    """
+    Calls translate once per distinct key and maps results back into adm_area_1, adm_area_2, adm_area_3
+    and gid columns aligned with the given index.
+    """
+    results = dict()
+    output = []
+    for key in keys:
+        result = results.get(key)
+        if result is None:
+            result = results[key] = translate(*key)
+        output.append(result)
+    return DataFrame(output, index=index, columns=TRANSLATION_COLUMNS)
+
+
 class AdmTranslator:
     def __init__(self, csv_fname: str):
         self.translation_pd = self.load_translation_csv(csv_fname)
+        self.index, self.countrycode_index = self.build_index(self.translation_pd)
         self.cache = dict()
+        self.lookup_frames = dict()
 
     def load_translation_csv(self, csv_fname) -> DataFrame:
         # CSV without countrycode column
@@ -47,26 +133,153 @@ class AdmTranslator:
             return None
         translation_pd = pd.read_csv(csv_fname)
         translation_pd.columns = colnames_1 if len(translation_pd.columns) == len(colnames_1) else colnames_2
-        translation_pd = translation_pd.where((pd.notnull(translation_pd)), None)
+        translation_pd = translation_pd.astype(object).where((pd.notnull(translation_pd)), None)
         return translation_pd
 
+    @staticmethod
+    def build_index(translation_pd: DataFrame) -> Tuple[Dict, Dict]:
+        # Only the first matching row is ever used, later duplicates are skipped
+        index = dict()
+        countrycode_index = dict()
+        if translation_pd is None:
+            return index, countrycode_index
+
+        with_countrycode = 'countrycode' in translation_pd.columns
+        for row in translation_pd.itertuples(index=False):
+            key = (area_key(row.input_adm_area_1), area_key(row.input_adm_area_2), area_key(row.input_adm_area_3))
+            index.setdefault(key, row)
+            if with_countrycode:
+                countrycode_index.setdefault((row.countrycode,) + key, row)
+
+        return index, countrycode_index
+
+    def lookup_frame(self, with_countrycode: bool) -> DataFrame:
+        """
+        Index rows as a DataFrame to join normalized keys against: countrycode (when with_countrycode), k1, k2, k3
+        join keys and the translated adm_area_1, adm_area_2, adm_area_3, gid and gid_list columns
+        """
+        lookup = self.lookup_frames.get(with_countrycode)
+        if lookup is not None:
+            return lookup
+
+        index = self.countrycode_index if with_countrycode else self.index
+        rows = []
+        for key, row in index.items():
+            areas = key[1:] if with_countrycode else key
+            # Keys with values other than strings and None are only matched by tr()
+            if any(area is not None and not isinstance(area, str) for area in areas):
+                continue
+            rows.append(((key[0],) if with_countrycode else ()) + tuple(join_key(area) for area in areas) + (
+                row.adm_area_1, row.adm_area_2, row.adm_area_3, row.gid, row.gid.split(':') if row.gid else None))
+
+        columns = (['countrycode'] if with_countrycode else []) + ['k1', 'k2', 'k3'] + TRANSLATION_COLUMNS + [
+            'gid_list']
+        lookup = self.lookup_frames[with_countrycode] = DataFrame(rows, columns=columns, dtype=object)
+        return lookup
+
+    def match_frame(self, data: DataFrame, input_adm_area_columns: List[str], country_code: str = None,
+                    countrycode_column: str = None,
+                    suppress_exception: bool = False) -> Tuple[DataFrame, np.ndarray]:
+        """
+        Joins normalized keys of the input columns against the translation table, matching the rows tr() matches.
+        Every distinct combination of input values is joined once.
+
+        :return: [pandas DataFrame] adm_area_1, adm_area_2, adm_area_3 and gid columns indexed as data, None
+            where no translation matched, and a mask of the matched rows
+        """
+        size = len(data)
+        areas = [data[column] if column else np.full(size, None, dtype=object) for column in
+                 list(input_adm_area_columns) + [None] * (3 - len(input_adm_area_columns))]
+        if countrycode_column:
+            country_codes = data[countrycode_column].to_numpy(dtype=object)
+        else:
+            country_codes = np.full(size, country_code, dtype=object)
+
+        keys, compare = dict(), np.zeros(size, dtype=bool)
+        groups, uniques = pd.factorize(country_codes)
+        missing = np.flatnonzero(groups == -1)
+        groups[missing[country_codes[missing] == None]] = len(uniques)  # noqa: E711
+        for name, column in zip(['k1', 'k2', 'k3'], areas):
+            keys[name], other, codes = join_keys(column)
+            compare |= other
+            groups = pd.factorize(groups * (codes.max(initial=0) + 2) + codes + 1)[0]
+
+        # Rows of every distinct combination of country code and inputs share the result of its first row
+        first = np.empty(groups.max(initial=-1) + 1, dtype=int)
+        first[groups[::-1]] = np.arange(size)[::-1]
+        keys = {name: column[first] for name, column in keys.items()}
+        country_codes, compare = country_codes[first], compare[first]
+
+        joinable = np.ones(len(first), dtype=bool)
+        for column in keys.values():
+            joinable &= column != None  # noqa: E711
+
+        # Same choice of index as find_row, a country code which is neither a string, None nor NaN is left to tr()
+        with_countrycode = np.zeros(len(first), dtype=bool)
+        if self.countrycode_index:
+            is_str = pd.Series(country_codes, dtype=object).str.lower().notna().to_numpy()
+            is_none = country_codes == None  # noqa: E711
+            with_countrycode = is_str & (country_codes != '')
+            compare |= ~is_str & ~is_none & pd.notna(country_codes)
+            # A NaN country code is truthy, find_row looks it up in countrycode_index and finds nothing
+            joinable &= is_str | is_none
+        joinable &= ~compare
+
+        output = {column: np.full(len(first), None, dtype=object) for column in TRANSLATION_COLUMNS}
+        matched = np.zeros(len(first), dtype=bool)
+        left = DataFrame(dict(keys, countrycode=country_codes, position=np.arange(len(first))))
+        for use_countrycode in (False, True):
+            rows = left[joinable & (with_countrycode == use_countrycode)]
+            if rows.empty:
+                continue
+            on = (['countrycode'] if use_countrycode else []) + ['k1', 'k2', 'k3']
+            merged = rows[on + ['position']].merge(self.lookup_frame(use_countrycode), on=on, how='inner',
+                                                   validate='m:1')
+            positions = merged['position'].to_numpy(dtype=int)
+
+            for row in merged[merged['gid'].isnull()].itertuples(index=False):
+                message = f'Unable to get GID for: {row.adm_area_1}, {row.adm_area_2}, {row.adm_area_3}'
+                if not suppress_exception:
+                    raise Exception(message)
+                logging.warning(message)
+
+            for column in ['adm_area_1', 'adm_area_2', 'adm_area_3']:
+                output[column][positions] = merged[column].to_numpy(dtype=object)
+            output['gid'][positions] = merged['gid_list'].to_numpy(dtype=object)
+            matched[positions] = True
+
+        # Inputs the join can't compare are translated by tr()
+        for position in np.flatnonzero(compare):
+            row = first[position]
+            result = self.tr(country_codes[position], *(area[row] if isinstance(area, np.ndarray) else area.iloc[row]
+                                                        for area in areas), suppress_exception=suppress_exception)
+            matched[position] = result[0]
+            for column, value in zip(TRANSLATION_COLUMNS, result[1:]):
+                output[column][position] = value
+
+        return DataFrame({column: values[groups] for column, values in output.items()}, index=data.index,
+                         columns=TRANSLATION_COLUMNS), matched[groups]
+
+    def find_row(self, country_code: str = None, input_adm_area_1: str = None, input_adm_area_2: str = None,
+                 input_adm_area_3: str = None):
+        key = (area_key(input_adm_area_1), area_key(input_adm_area_2), area_key(input_adm_area_3))
+        # Country code is only checked when the translation CSV has it
+        if self.countrycode_index and country_code:
+            return self.countrycode_index.get((country_code,) + key)
+        return self.index.get(key)
+
     def tr(self, country_code: str = None, input_adm_area_1: str = None, input_adm_area_2: str = None,
            input_adm_area_3: str = None, return_original_if_failure: bool = False,
            suppress_exception: bool = False) -> Tuple[bool, str, str, str, List]:
 
         key = (country_code, input_adm_area_1, input_adm_area_2, input_adm_area_3)
 
-        if key in self.cache:
-            return self.cache.get(key)
-
-        for index, row in self.translation_pd.iterrows():
-            if area_compare(row.input_adm_area_1, input_adm_area_1) \
-                    and area_compare(row.input_adm_area_2, input_adm_area_2) \
-                    and area_compare(row.input_adm_area_3, input_adm_area_3):
-
-                if hasattr(row, 'countrycode') and country_code and row.countrycode != country_code:
-                    continue
-
+        result = self.cache.get(key)
+        if result is None:
+            row = self.find_row(country_code, input_adm_area_1, input_adm_area_2, input_adm_area_3)
+            if row is None:
+                result = NOT_FOUND
+            else:
                 if row.gid is None:
                     message = f'Unable to get GID for: {row.adm_area_1}, {row.adm_area_2}, {row.adm_area_3}'
                     if not suppress_exception:
@@ -77,11 +290,36 @@ class AdmTranslator:
                 gid = row.gid.split(':') if row.gid else None
                 result = True, row.adm_area_1, row.adm_area_2, row.adm_area_3, gid
 
-                # Cache result
-                self.cache[key] = result
-                return result
+            # Cache result, misses included
+            self.cache[key] = result
+
+        if result is not NOT_FOUND:
+            return result
 
         if return_original_if_failure:
             return False, input_adm_area_1, input_adm_area_2, input_adm_area_3, None
         else:
             return False, None, None, None, None
+
+    def tr_frame(self, data: DataFrame, input_adm_area_columns: List[str], country_code: str = None,
+                 countrycode_column: str = None, return_original_if_failure: bool = False,
+                 suppress_exception: bool = False) -> DataFrame:
+        """
+        Translates regions of the whole DataFrame, same as calling tr() for every row.
+
+        :param data: [pandas DataFrame] input data
+        :param input_adm_area_columns: names of columns holding input_adm_area_1, input_adm_area_2, ...
+        :param country_code: country code used for all rows, or
+        :param countrycode_column: name of the column holding country code of each row
+        :return: [pandas DataFrame] adm_area_1, adm_area_2, adm_area_3 and gid columns, indexed as data
+        """
+        result, matched = self.match_frame(data, input_adm_area_columns, country_code, countrycode_column,
+                                           suppress_exception)
+        if return_original_if_failure and not matched.all():
+            failed = np.flatnonzero(~matched)
+            for column, input_column in zip(TRANSLATION_COLUMNS, input_adm_area_columns):
+                if input_column:
+                    values = result[column].to_numpy(dtype=object, copy=True)
+                    values[failed] = data[input_column].to_numpy(dtype=object)[failed]
+                    result[column] = values
+        return result
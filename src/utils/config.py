@@ -36,9 +36,19 @@ class Config:
 
     def load_config_from_env_variables(self):
         self.load_env_variable("VALIDATE_INPUT_DATA", "", fun=lambda x: x.lower() == 'true')
+        self.load_env_variable("VALIDATION_MODE", "full")
         self.load_env_variable("VALIDATE_LATEST_TS_DAYS", fun=lambda x: int(x) if x else None)
         self.load_env_variable("SLIDING_WINDOW_DAYS", fun=lambda x: int(x) if x else None)
         self.load_env_variable("RUN_ONLY_PLUGINS")
+        self.load_env_variable("PLUGIN_CONCURRENCY", 1, fun=lambda x: int(x) if x else 1)
+        self.load_env_variable("PLUGIN_CONCURRENCY_MODE", "thread")
+        self.load_env_variable("PLUGIN_MANIFEST")
+        self.load_env_variable("PREFETCH_CONCURRENCY", 8, fun=lambda x: int(x) if x else 8)
+        self.load_env_variable("PREFETCH_LOOKAHEAD", 1, fun=lambda x: int(x) if x else 1)
+        self.load_env_variable("PREFETCH_TIMEOUT", 300, fun=lambda x: int(x) if x else 300)
+        self.load_env_variable("HTTP_STATE")
+        self.load_env_variable("ROW_STATE")
+        self.load_env_variable("ADM_DIVISION_SNAPSHOT")
         self.load_env_variable("LOGLEVEL", "DEBUG")
         self.load_env_variable("DIAGNOSTICS_URL")
         self.load_env_variable("SYS_EMAIL")
@@ -50,8 +60,14 @@ class Config:
         self.load_env_variable("DB_ADDRESS")
         self.load_env_variable("DB_NAME")
         self.load_env_variable("DB_PORT", 5432, fun=lambda x: int(x))
+        self.load_env_variable("DB_COMMIT_SIZE", 0, fun=lambda x: int(x) if x else 0)
+        self.load_env_variable("DB_COMMIT_INTERVAL", 0, fun=lambda x: int(x) if x else 0)
+        self.load_env_variable("DB_POOL_MIN", 1, fun=lambda x: int(x) if x else 1)
+        self.load_env_variable("DB_POOL_MAX", 10, fun=lambda x: int(x) if x else 10)
+        self.load_env_variable("DB_POOL_HEALTH_CHECK", 60, fun=lambda x: int(x) if x else 60)
         self.load_env_variable("SQLITE")
         self.load_env_variable("CSV")
+        self.load_env_variable("PARQUET")
 
 
 config = Config()
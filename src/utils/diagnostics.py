@@ -11,8 +11,8 @@ class Diagnostics:
     def __init__(self, fetcher_instance: AbstractFetcher):
         self.fetcher_instance = fetcher_instance
 
-    def update_diagnostics_info(self, validation: bool, error: bool, start_time, end_time):
-        if config.CSV or config.DB_NAME == 'covid19_play':
+    def update_diagnostics_info(self, validation: bool, error: bool, start_time, end_time, unchanged: bool = False):
+        if config.CSV or config.PARQUET or config.DB_NAME == 'covid19_play':
             return
 
         data = {
@@ -24,8 +24,11 @@ class Diagnostics:
             "last_run_stop": datetime.fromtimestamp(end_time),
             "first_timestamp": self.fetcher_instance.get_earliest_timestamp(),
             "last_timestamp": self.fetcher_instance.get_latest_timestamp(),
-            "details": self.fetcher_instance.get_details()
+            "unchanged": unchanged
         }
+        if not unchanged:
+            # Details of a skipped run are those of the last run which wrote data, kept as they are
+            data["details"] = self.fetcher_instance.get_details()
         data_adapter = self.fetcher_instance.data_adapter
         data_adapter.upsert_diagnostics(**data)
 
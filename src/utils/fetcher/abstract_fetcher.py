@@ -14,6 +14,12 @@
 
 import os
 import sys
+import logging
+from io import BytesIO
+from typing import List, Dict, Iterable, Tuple
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
 
@@ -21,20 +27,33 @@ __all__ = ('AbstractFetcher')
 
 from utils.config import config
 from utils.types import FetcherType
+from utils.prefetch import prefetcher
 from utils.adapter.abstract_adapter import AbstractAdapter
 from utils.country_codes_translator.translator import CountryCodesTranslator
-from utils.administrative_division_translator.translator import AdmTranslator
+from utils.administrative_division_translator.translator import AdmTranslator, TRANSLATION_COLUMNS, frame_keys, \
+    translate_frame
+
+logger = logging.getLogger(__name__)
 
 
 class AbstractFetcher(ABC):
     TYPE = FetcherType.EPIDEMIOLOGY
     LOAD_PLUGIN = False
+    # URLs downloaded concurrently before the plugin runs, read with open_url
+    PREFETCH_URLS = ()
+    # Skip the run when none of the prefetched URLs changed, the plugin must read no other data.
+    # SKIP_UNCHANGED relies on ETag/Last-Modified, SKIP_UNCHANGED_PAYLOAD on a hash of the downloaded payload
+    SKIP_UNCHANGED = False
+    SKIP_UNCHANGED_PAYLOAD = False
 
     def __init__(self, data_adapter: AbstractAdapter):
         self.adm_translator = self.load_adm_translator()
         self.country_codes_translator = CountryCodesTranslator()
         self.sliding_window_days = config.SLIDING_WINDOW_DAYS
         self.data_adapter = data_adapter
+        # administrative_division lookups by (countrycode, input_adm_area_1, input_adm_area_2, input_adm_area_3),
+        # None when the region can't be resolved
+        self.adm_divisions = dict()
 
     def get_first_date_to_fetch(self, initial_date: str) -> str:
         if self.sliding_window_days:
@@ -43,6 +62,28 @@ class AbstractFetcher(ABC):
             date_from = initial_date
         return date_from
 
+    def get_prefetch_urls(self) -> List[str]:
+        return list(self.PREFETCH_URLS)
+
+    def prefetch(self):
+        prefetcher.submit(self.get_prefetch_urls(), conditional=self.SKIP_UNCHANGED)
+
+    def is_source_modified(self) -> bool:
+        urls = self.get_prefetch_urls()
+        if not (self.SKIP_UNCHANGED or self.SKIP_UNCHANGED_PAYLOAD) or not urls:
+            return True
+        return prefetcher.is_modified(urls, conditional=self.SKIP_UNCHANGED,
+                                      compare_content=self.SKIP_UNCHANGED_PAYLOAD)
+
+    def save_prefetch_state(self):
+        prefetcher.save_state(self.get_prefetch_urls())
+
+    def open_url(self, url: str) -> BytesIO:
+        return prefetcher.get(url)
+
+    def release_prefetched(self):
+        prefetcher.release(self.get_prefetch_urls())
+
     def load_adm_translator(self) -> AdmTranslator:
         translation_csv_fname = getattr(self.__class__, 'TRANSLATION_CSV', "translation.csv")
         path = os.path.dirname(sys.modules[self.__class__.__module__].__file__)
@@ -58,15 +99,105 @@ class AbstractFetcher(ABC):
         )
 
         if not success:
-            try:
-                # Check if input data can be matched directly into administrative division table
-                country, adm_area_1, adm_area_2, adm_area_3, gid = self.data_adapter.get_adm_division(
-                    countrycode, input_adm_area_1, input_adm_area_2, input_adm_area_3)
-            except Exception as ex:
+            key = (countrycode, input_adm_area_1, input_adm_area_2, input_adm_area_3)
+            if key not in self.adm_divisions:
+                try:
+                    # Check if input data can be matched directly into administrative division table
+                    self.adm_divisions[key] = self.data_adapter.get_adm_division(*key)
+                except Exception as ex:
+                    self.adm_divisions[key] = None
+
+            if self.adm_divisions[key]:
+                country, adm_area_1, adm_area_2, adm_area_3, gid = self.adm_divisions[key]
+            else:
                 adm_area_1, adm_area_2, adm_area_3, gid = input_adm_area_1, input_adm_area_2, input_adm_area_3, None
 
         return adm_area_1, adm_area_2, adm_area_3, gid
 
+    def resolve_regions(self, keys: Iterable[Tuple]):
+        """
+        Looks up all regions missing in translation.csv with a single administrative_division query,
+        get_region then reads them from the cache.
+
+        :param keys: (countrycode, input_adm_area_1, input_adm_area_2, input_adm_area_3) tuples
+        """
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in self.adm_divisions:
+                continue
+            success = self.adm_translator.tr(*key, return_original_if_failure=False, suppress_exception=True)[0]
+            if not success:
+                missing.append(key)
+        if not missing:
+            return
+
+        try:
+            resolved = self.data_adapter.get_adm_divisions(missing)
+        except Exception as ex:
+            logger.warning(f'Unable to resolve {len(missing)} regions at once, exception: {ex}')
+            return
+        for key in missing:
+            self.adm_divisions[key] = resolved.get(key)
+
+    def get_regions(self, data: DataFrame, input_adm_area_columns: List[str], countrycode: str = None,
+                    countrycode_column: str = None, suppress_exception: bool = False) -> DataFrame:
+        """
+        Same as get_region for every row of data. Rows are joined against translation.csv at once, the distinct
+        regions it doesn't match are looked up in administrative_division with a single query.
+
+        :param data: [pandas DataFrame] rows with input adm area columns
+        :param input_adm_area_columns: names of the input_adm_area_1, input_adm_area_2, input_adm_area_3 columns
+        :param countrycode: country code of all rows, when countrycode_column isn't given
+        :param countrycode_column: name of the column holding country code of each row
+        :return: [pandas DataFrame] adm_area_1, adm_area_2, adm_area_3 and gid columns, indexed as data
+        """
+        regions, matched = self.adm_translator.match_frame(data, input_adm_area_columns, countrycode,
+                                                           countrycode_column, suppress_exception=True)
+        if matched.all():
+            return regions
+
+        failed = np.flatnonzero(~matched)
+        missing = data.iloc[failed]
+        keys = frame_keys(missing, input_adm_area_columns, countrycode, countrycode_column)
+        self.resolve_regions(keys)
+        resolved = translate_frame(keys, missing.index, lambda *key: self.get_region(
+            *key, suppress_exception=suppress_exception))
+        for column in TRANSLATION_COLUMNS:
+            values = regions[column].to_numpy(dtype=object, copy=True)
+            values[failed] = resolved[column].to_numpy(dtype=object)
+            regions[column] = values
+        return regions
+
+    def prepare_frame(self, data: DataFrame, columns: Dict[str, str] = None, constants: Dict = None) -> DataFrame:
+        """
+        Shapes a DataFrame into rows ready to be upserted as a batch.
+
+        :param data: [pandas DataFrame] parsed source data
+        :param columns: mapping of table column -> data column, all data columns are used if empty
+        :param constants: mapping of table column -> value used for every row, source defaults to SOURCE
+        :return: [pandas DataFrame] table rows, single GID strings are converted into GID lists
+        """
+        if columns:
+            frame = DataFrame({column: data[data_column] for column, data_column in columns.items()},
+                              index=data.index)
+        else:
+            frame = data.copy()
+
+        constants = dict(constants or {})
+        if 'source' not in frame.columns:
+            constants.setdefault('source', self.SOURCE)
+
+        for column, value in constants.items():
+            if isinstance(value, list):
+                frame[column] = pd.Series([value] * len(frame), index=frame.index, dtype=object)
+            else:
+                frame[column] = value
+
+        if 'gid' in frame.columns:
+            frame['gid'] = frame['gid'].map(lambda gid: [gid] if isinstance(gid, str) else gid)
+
+        return frame
+
     def get_earliest_timestamp(self):
         return None
 
@@ -28,6 +28,12 @@ class BaseEpidemiologyFetcher(AbstractFetcher):
     def upsert_data(self, **kwargs):
         self.data_adapter.upsert_data(self.TYPE, **kwargs)
 
+    def upsert_many(self, records):
+        self.data_adapter.upsert_many(self.TYPE, records)
+
+    def upsert_frame(self, data, columns=None, constants=None):
+        self.data_adapter.upsert_frame(self.TYPE, self.prepare_frame(data, columns, constants))
+
     def get_data(self, **kwargs):
         return self.data_adapter.get_data(self.TYPE.value, **kwargs)
 
@@ -28,6 +28,12 @@ class BaseGovernmentResponseFetcher(AbstractFetcher):
     def upsert_data(self, **kwargs):
         self.data_adapter.upsert_data(self.TYPE, **kwargs)
 
+    def upsert_many(self, records):
+        self.data_adapter.upsert_many(self.TYPE, records)
+
+    def upsert_frame(self, data, columns=None, constants=None):
+        self.data_adapter.upsert_frame(self.TYPE, self.prepare_frame(data, columns, constants))
+
     def get_earliest_timestamp(self):
         return self.data_adapter.get_earliest_timestamp(self.TYPE.value, self.SOURCE)
 
@@ -14,6 +14,8 @@
 
 from typing import List
 import math
+import numpy as np
+from pandas import Series
 
 
 def remove_words(data: str, words: List) -> str:
@@ -26,3 +28,9 @@ def int_or_none(value):
         return None
     result = int(value)
     return None if result < 0 else result
+
+
+def int_or_none_series(data: Series) -> Series:
+    # Same as int_or_none for every value of the series
+    result = np.trunc(data.astype(float))
+    return result.where(result >= 0).astype('Int64')
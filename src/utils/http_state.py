@@ -0,0 +1,62 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+from typing import Dict, List
+from datetime import datetime
+
+__all__ = ('HttpStateStore',)
+
+
+class HttpStateStore:
+    """
+    ETag/Last-Modified validators and content hashes of downloaded URLs, kept in a SQLite file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.execute('CREATE TABLE IF NOT EXISTS http_state ('
+                     'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, updated_at TEXT)')
+        columns = [row[1] for row in self.execute('PRAGMA table_info(http_state)')]
+        if 'content_hash' not in columns:
+            self.execute('ALTER TABLE http_state ADD COLUMN content_hash TEXT')
+
+    def execute(self, sql: str, parameters: tuple = ()) -> List:
+        # A connection per call, the store is used from prefetch threads and worker processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, parameters).fetchall()
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> Dict:
+        rows = self.execute('SELECT etag, last_modified, content_hash FROM http_state WHERE url = ?', (url,))
+        return {'etag': rows[0][0], 'last_modified': rows[0][1], 'content_hash': rows[0][2]} if rows else None
+
+    def set(self, url: str, etag: str, last_modified: str, content_hash: str = None):
+        self.execute('INSERT OR REPLACE INTO http_state (url, etag, last_modified, content_hash, updated_at) '
+                     'VALUES (?, ?, ?, ?, ?)', (url, etag, last_modified, content_hash, datetime.now().isoformat()))
+
+    def delete(self, url: str):
+        self.execute('DELETE FROM http_state WHERE url = ?', (url,))
+
+    def conditional_headers(self, url: str) -> Dict:
+        state = self.get(url)
+        headers = dict()
+        if state and state['etag']:
+            headers['If-None-Match'] = state['etag']
+        if state and state['last_modified']:
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
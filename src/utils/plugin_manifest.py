@@ -0,0 +1,262 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import ast
+import sys
+import json
+import logging
+import inspect
+import importlib
+from typing import Dict, List
+from pathlib import Path
+
+from utils.config import config
+from utils.types import FetcherType
+from utils.fetcher.abstract_fetcher import AbstractFetcher
+from utils.fetcher.base_epidemiology import BaseEpidemiologyFetcher
+from utils.fetcher.base_government_response import BaseGovernmentResponseFetcher
+from utils.fetcher.base_mobility import BaseMobilityFetcher
+from utils.fetcher.base_weather import BaseWeatherFetcher
+
+__all__ = ('PluginManifest', 'LazyPlugin', 'PLUGINS_PATH')
+
+logger = logging.getLogger(__name__)
+
+PLUGINS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "plugins"))
+MANIFEST_VERSION = 3
+MANIFEST_ATTRIBUTES = ('SOURCE', 'TYPE', 'LOAD_PLUGIN', 'PREFETCH_URLS', 'SKIP_UNCHANGED')
+
+BASE_FETCHERS = {
+    fetcher.__name__: fetcher for fetcher in (AbstractFetcher, BaseEpidemiologyFetcher, BaseGovernmentResponseFetcher,
+                                              BaseMobilityFetcher, BaseWeatherFetcher)
+}
+
+
+class LazyPlugin:
+    """
+    Plugin described by the manifest, the module is imported on first use
+    """
+
+    def __init__(self, name: str, module: str, attributes: Dict = None):
+        self.__name__ = name
+        self.module = module
+        self.plugin_class = None
+        for key, value in (attributes or {}).items():
+            setattr(self, key, value)
+        if isinstance(getattr(self, 'TYPE', None), str):
+            self.TYPE = FetcherType(self.TYPE)
+        if 'PREFETCH_URLS' in self.__dict__:
+            self.PREFETCH_URLS = tuple(self.PREFETCH_URLS)
+
+    def load(self):
+        if self.plugin_class is None:
+            if PLUGINS_PATH not in sys.path:
+                sys.path.append(PLUGINS_PATH)
+            module = importlib.import_module(self.module)
+            self.plugin_class = getattr(module, self.__name__)
+        return self.plugin_class
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == 'plugin_class':
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __getstate__(self):
+        # Worker processes import the plugin module themselves
+        state = self.__dict__.copy()
+        state['plugin_class'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __repr__(self):
+        return f'LazyPlugin({self.module}.{self.__name__})'
+
+
+class PluginManifest:
+    """
+    Describes the plugins without importing them.
+
+    Plugin modules are parsed, not imported, and the result is cached per module file in a JSON manifest.
+    An entry is parsed again only when size or modification time of its file changes.
+    """
+
+    def __init__(self, plugins_path: str = PLUGINS_PATH, manifest_path: str = None):
+        self.plugins_path = plugins_path
+        self.manifest_path = manifest_path or config.PLUGIN_MANIFEST or os.path.join(plugins_path, 'manifest.json')
+
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest.get('modules', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save_manifest(self, modules: Dict):
+        tmp_path = self.manifest_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'modules': modules}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as ex:
+            logger.warning(f'Unable to save plugin manifest: {self.manifest_path}, error: {ex}')
+
+    def refresh(self) -> Dict:
+        cached = self.load_manifest()
+        modules = dict()
+
+        for path in sorted(Path(self.plugins_path).rglob('*.py')):
+            relative_path = path.relative_to(self.plugins_path).as_posix()
+            stat = path.stat()
+            entry = cached.get(relative_path)
+            if not entry or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                logger.debug(f'Updating plugin manifest for: {relative_path}')
+                entry = {
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'classes': self.parse_module(path)
+                }
+            modules[relative_path] = entry
+
+        if modules != cached:
+            self.save_manifest(modules)
+        return modules
+
+    @staticmethod
+    def parse_module(path: Path) -> List[Dict]:
+        try:
+            tree = ast.parse(path.read_bytes(), filename=str(path))
+        except SyntaxError as ex:
+            logger.error(f'Unable to parse plugin module: {path}, error: {ex}')
+            return []
+
+        # Module level literals, plugins may refer to them in class attributes
+        constants = dict()
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                value = PluginManifest.parse_value(node.value, constants)
+                if not isinstance(value, dict):
+                    constants[node.targets[0].id] = value
+
+        classes = []
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+
+            attributes = dict()
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                        and isinstance(statement.targets[0], ast.Name) \
+                        and statement.targets[0].id in MANIFEST_ATTRIBUTES:
+                    attributes[statement.targets[0].id] = PluginManifest.parse_value(statement.value, constants)
+
+            classes.append({
+                'name': node.name,
+                'bases': [base.id if isinstance(base, ast.Name) else ast.dump(base) for base in node.bases],
+                'attributes': attributes
+            })
+        return classes
+
+    @staticmethod
+    def parse_value(node, constants: Dict):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) \
+                and node.value.id == FetcherType.__name__ and node.attr in FetcherType.__members__:
+            return FetcherType[node.attr].value
+        if isinstance(node, ast.Name) and node.id in constants:
+            return constants[node.id]
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            left = PluginManifest.parse_value(node.left, constants)
+            right = PluginManifest.parse_value(node.right, constants)
+            if isinstance(left, str) and isinstance(right, str):
+                return left + right
+        if isinstance(node, (ast.Tuple, ast.List)):
+            values = [PluginManifest.parse_value(element, constants) for element in node.elts]
+            if not any(isinstance(value, dict) for value in values):
+                return values
+        try:
+            return ast.literal_eval(node)
+        except (ValueError, TypeError):
+            return {'unresolved': ast.dump(node)}
+
+    @staticmethod
+    def module_name(relative_path: str) -> str:
+        return relative_path[:-len('.py')].replace('/', '.')
+
+    def plugins(self) -> List[LazyPlugin]:
+        modules = self.refresh()
+        definitions = [(relative_path, item) for relative_path, entry in modules.items() for item in entry['classes']]
+        classes = {item['name']: item for relative_path, item in definitions}
+
+        def resolve(name: str, seen: tuple = ()) -> Dict:
+            # Attributes of a class, inherited ones included, or None if it is not a fetcher
+            if name in BASE_FETCHERS:
+                fetcher = BASE_FETCHERS[name]
+                attributes = {key: getattr(fetcher, key, None) for key in MANIFEST_ATTRIBUTES}
+                attributes['TYPE'] = fetcher.TYPE.value
+                return attributes
+            if name not in classes or name in seen:
+                return None
+
+            item = classes[name]
+            for base in item['bases']:
+                attributes = resolve(base, seen + (name,))
+                if attributes is not None:
+                    return {**attributes, **item['attributes']}
+            return None
+
+        plugins = []
+        for relative_path, item in definitions:
+            name = item['name']
+            attributes = resolve(name)
+            if attributes is None or name in BASE_FETCHERS:
+                continue
+
+            module_name = self.module_name(relative_path)
+            if any(isinstance(value, dict) for value in attributes.values()):
+                plugin = self.import_plugin(module_name, name)
+                if plugin is None:
+                    continue
+                attributes = {key: getattr(plugin, key) for key in MANIFEST_ATTRIBUTES}
+                attributes['TYPE'] = attributes['TYPE'].value
+
+            if attributes['LOAD_PLUGIN']:
+                logger.debug(f"Loading plugin: {name}")
+                plugins.append(LazyPlugin(name, module_name, attributes))
+
+        return sorted(plugins, key=lambda x: x.__name__)
+
+    @staticmethod
+    def import_plugin(module_name: str, name: str):
+        # Attribute values which are not literals can only be read from the imported class
+        try:
+            plugin = LazyPlugin(name, module_name).load()
+            if inspect.isclass(plugin) and issubclass(plugin, AbstractFetcher):
+                return plugin
+        except Exception as ex:
+            logger.error(f'Unable to load plugin: {module_name}, error: {ex}')
+        return None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for lazy_plugin in PluginManifest().plugins():
+        logger.info(f'{lazy_plugin.__name__}: {lazy_plugin.SOURCE}, {lazy_plugin.TYPE.value}')
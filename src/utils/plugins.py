@@ -12,22 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
-import sys
 import time
 import logging
-import inspect
-import importlib
-from typing import List
-from pathlib import Path
+import threading
+from typing import List, Dict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 from utils.config import config
 from utils.adapter.abstract_adapter import AbstractAdapter
+from utils.adapter.data_adapter import DataAdapter
 from utils.email import send_email
 from utils.fetcher.abstract_fetcher import AbstractFetcher
+from utils.plugin_manifest import PluginManifest
+from utils.prefetch import prefetcher
 from utils.validation import validate_incoming_data
-from utils.decorators import timeit
+from utils.decorators import timeit, seconds_to_human
 from utils.diagnostics import Diagnostics
 
 logger = logging.getLogger(__name__)
@@ -35,34 +35,46 @@ logger = logging.getLogger(__name__)
 __all__ = ('Plugins')
 
 
+def format_row_counts(row_counts: Dict) -> str:
+    return ', '.join(f'{key}: {value}' for key, value in row_counts.items())
+
+
+class PrefetchLookahead:
+    """
+    Downloads the URLs of the next plugins not started yet while plugins run.
+
+    Payloads are held in memory until their plugins run, so only a bounded number of plugins ahead is prefetched.
+    """
+
+    def __init__(self, plugins: List, lookahead: int):
+        self.plugins = plugins
+        self.lookahead = lookahead
+        self.started = -1
+        self.lock = threading.Lock()
+
+    def start(self, plugin: AbstractFetcher):
+        if self.lookahead < 1:
+            return
+
+        with self.lock:
+            self.started = max(self.started, self.plugins.index(plugin))
+            for upcoming in self.plugins[self.started + 1:self.started + 1 + self.lookahead]:
+                prefetcher.submit(upcoming.PREFETCH_URLS, conditional=upcoming.SKIP_UNCHANGED)
+
+
 class Plugins:
 
     def __init__(self):
         self.validate_input_data = config.VALIDATE_INPUT_DATA
         self.available_plugins = self.search_for_plugins()
         self.run_only_plugins = self.get_only_selected_plugins()
+        self.plugin_concurrency = config.PLUGIN_CONCURRENCY
+        self.prefetch_lookahead = config.PREFETCH_LOOKAHEAD
 
     @staticmethod
     def search_for_plugins() -> List:
-        plugins_path = os.path.join(os.path.dirname(__file__), "..", "plugins")
-        sys.path.append(plugins_path)
-        available_plugins = []
-
-        for path in Path(plugins_path).rglob('*.py'):
-            module_path = path.relative_to(plugins_path).with_suffix('')
-            module_name = str(module_path).replace('/', '.').replace('\\', '.')
-            try:
-                module = importlib.import_module(module_name)
-                for item_name in dir(module):
-                    obj = getattr(module, item_name)
-                    if inspect.isclass(obj) and issubclass(obj, AbstractFetcher) and obj != AbstractFetcher:
-                        if hasattr(obj, 'LOAD_PLUGIN') and obj.LOAD_PLUGIN:
-                            logger.debug(f"Loading plugin: {obj.__name__}")
-                            available_plugins.append(obj)
-            except Exception as ex:
-                logger.error(f'Unable to load plugin: {module_name}, error: {ex}')
-
-        return sorted(available_plugins, key=lambda x: x.__name__)
+        # Plugin modules are listed from the manifest and imported only when a plugin is run
+        return PluginManifest().plugins()
 
     @staticmethod
     def get_only_selected_plugins() -> List:
@@ -88,11 +100,12 @@ class Plugins:
                              data_adapter: AbstractAdapter) -> bool:
         fetcher_type = plugin_instance.TYPE if hasattr(plugin_instance, 'TYPE') else None
 
+        source_name = plugin_instance.SOURCE if hasattr(plugin_instance, 'SOURCE') else None
         if fetcher_type.value not in ['epidemiology']:
-            # Exit without verification - fetcher type not supported yet
+            # Publish without verification - fetcher type not supported yet
+            data_adapter.publish_staging(fetcher_type, source_name)
             return True
 
-        source_name = plugin_instance.SOURCE if hasattr(plugin_instance, 'SOURCE') else None
         validation_success = validate_incoming_data(data_adapter, fetcher_type, source_name)
         if validation_success:
             logger.info(f"Validating source data for: {plugin.__name__}, source_name: {source_name} "
@@ -125,28 +138,125 @@ class Plugins:
     @timeit
     def run_plugins_job(self, data_adapter: AbstractAdapter):
         Diagnostics.send_post_request(data={"type": "jobs_start", "ts": time.time()})
-        for plugin in self.available_plugins:
-            if self.should_run_plugin(plugin.__name__):
-                self.run_single_plugin(data_adapter, plugin)
+        plugins = [plugin for plugin in self.available_plugins if self.should_run_plugin(plugin.__name__)]
 
+        concurrency = self.worker_count(data_adapter)
+        lookahead = PrefetchLookahead(plugins, self.prefetch_lookahead)
+        try:
+            if concurrency > 1:
+                results = self.run_plugins_concurrently(plugins, concurrency, lookahead)
+            else:
+                results = []
+                for plugin in plugins:
+                    lookahead.start(plugin)
+                    results.append(self.run_single_plugin(data_adapter, plugin))
+        finally:
+            prefetcher.clear()
+
+        self.log_job_summary(results)
         Diagnostics.send_post_request(data={"type": "jobs_finish", "ts": time.time()})
 
+    def worker_count(self, data_adapter: AbstractAdapter) -> int:
+        max_workers = data_adapter.max_concurrency(config.PLUGIN_CONCURRENCY_MODE)
+        if max_workers is not None and self.plugin_concurrency > max_workers:
+            logger.warning(f'PLUGIN_CONCURRENCY {self.plugin_concurrency} limited to {max_workers} '
+                           f'by {type(data_adapter).__name__}')
+            return max(max_workers, 1)
+        return self.plugin_concurrency
+
+    def run_plugins_concurrently(self, plugins: List, concurrency: int = None,
+                                 lookahead: PrefetchLookahead = None) -> List:
+        if config.PLUGIN_CONCURRENCY_MODE == 'process':
+            executor_class = ProcessPoolExecutor
+            # Worker processes don't share the prefetched payloads
+            lookahead = None
+        else:
+            executor_class = ThreadPoolExecutor
+
+        concurrency = concurrency or self.plugin_concurrency
+        logger.info(f'Running {len(plugins)} plugins using {concurrency} '
+                    f'{config.PLUGIN_CONCURRENCY_MODE} workers')
+        results = []
+        with executor_class(max_workers=concurrency) as executor:
+            futures = {executor.submit(self.run_plugin_worker, plugin, lookahead): plugin for plugin in plugins}
+            for future in as_completed(futures):
+                plugin = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as ex:
+                    logger.error(f'Worker failed for plugin {plugin.__name__}, exception: {ex}', exc_info=True)
+                    results.append({
+                        'plugin': plugin.__name__,
+                        'validation': None,
+                        'error': True,
+                        'unchanged': False,
+                        'rows': None,
+                        'start_time': None,
+                        'end_time': None
+                    })
+        return results
+
+    def run_plugin_worker(self, plugin: AbstractFetcher, lookahead: PrefetchLookahead = None):
+        if lookahead:
+            lookahead.start(plugin)
+        # Each worker has its own adapter, so plugins never share a connection or cursor
+        data_adapter = DataAdapter.get_adapter()
+        try:
+            return self.run_single_plugin(data_adapter, plugin)
+        finally:
+            data_adapter.close_connection()
+
+    @staticmethod
+    def log_job_summary(results: List):
+        for result in results:
+            if result['start_time'] and result['end_time']:
+                duration = seconds_to_human(result['end_time'] - result['start_time'])
+            else:
+                duration = 'unknown'
+            rows = f", rows {format_row_counts(result['rows'])}" if result['rows'] else ''
+            logger.info(f"Plugin {result['plugin']} execution time: {duration}, "
+                        f"error: {result['error']}, validation: {result['validation']}, "
+                        f"unchanged: {result['unchanged']}{rows}")
+
+        failed = [result['plugin'] for result in results if result['error']]
+        if failed:
+            logger.warning(f"Plugins finished with errors: {', '.join(sorted(failed))}")
+
     @timeit
     def run_single_plugin(self, data_adapter: AbstractAdapter, plugin: AbstractFetcher):
         logger.info(f'Running plugin {plugin.__name__} ')
         error = False
         validation_success = None
+        unchanged = False
+        row_counts = None
+        plugin_instance = None
         start_time = time.time()
         try:
             if self.validate_input_data:
-                data_adapter.truncate_staging()
+                data_adapter.start_staging(plugin.TYPE, getattr(plugin, 'SOURCE', None))
+            data_adapter.reset_row_counts()
             plugin_instance = plugin(data_adapter)
-            plugin_instance.run()
-            data_adapter.publish_missing_gids()
-            data_adapter.flush()
-            validation_success = self.validate_consistency(plugin,
-                                                           plugin_instance,
-                                                           data_adapter) if self.validate_input_data else True
+            plugin_instance.prefetch()
+            if plugin_instance.is_source_modified():
+                plugin_instance.run()
+                data_adapter.publish_missing_gids()
+                data_adapter.flush()
+                validation_success = self.validate_consistency(plugin,
+                                                               plugin_instance,
+                                                               data_adapter) if self.validate_input_data else True
+                # Staged rows are counted once they are published
+                row_counts = data_adapter.get_row_counts()
+                if row_counts:
+                    logger.info(f"Plugin {plugin.__name__} rows {format_row_counts(row_counts)}")
+                if validation_success:
+                    plugin_instance.save_prefetch_state()
+                    data_adapter.save_row_state()
+                else:
+                    data_adapter.discard_row_state()
+            else:
+                logger.info(f"Plugin {plugin.__name__} skipped, source data not modified")
+                unchanged = True
+                validation_success = True
             self.validate_latest_timestamp(plugin, plugin_instance)
 
             if validation_success:
@@ -155,10 +265,30 @@ class Plugins:
         except Exception as ex:
             error = True
             logger.error(f'Error running plugin {plugin.__name__}, exception: {ex}', exc_info=True)
+            # Writes of a failed plugin not committed yet are discarded
+            data_adapter.rollback()
+            data_adapter.discard_row_state()
+            data_adapter.publish_missing_gids()
+        finally:
+            if plugin_instance:
+                plugin_instance.release_prefetched()
+
+        end_time = time.time()
+        if plugin_instance:
+            Diagnostics(plugin_instance).update_diagnostics_info(
+                validation=validation_success,
+                error=error,
+                start_time=start_time,
+                end_time=end_time,
+                unchanged=unchanged
+            )
 
-        Diagnostics(plugin_instance).update_diagnostics_info(
-            validation=validation_success,
-            error=error,
-            start_time=start_time,
-            end_time=time.time()
-        )
+        return {
+            'plugin': plugin.__name__,
+            'validation': validation_success,
+            'error': error,
+            'unchanged': unchanged,
+            'rows': row_counts,
+            'start_time': start_time,
+            'end_time': end_time
+        }
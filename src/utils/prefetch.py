@@ -0,0 +1,145 @@
+# Copyright (C) 2020 University of Oxford
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import threading
+import requests
+from io import BytesIO
+from typing import Iterable
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from utils.config import config
+from utils.http_state import HttpStateStore
+
+__all__ = ('Prefetcher', 'Download', 'prefetcher')
+
+logger = logging.getLogger(__name__)
+
+# content is None when the server answered 304 Not Modified
+Download = namedtuple('Download', ['content', 'etag', 'last_modified'])
+
+
+class Prefetcher:
+    """
+    Downloads URLs in a bounded thread pool ahead of the plugins reading them.
+
+    Payloads are kept until released, a URL which was not submitted is downloaded when it is requested.
+    Conditional downloads send the ETag/Last-Modified validators saved in the HTTP state store,
+    content hashes saved there detect unchanged payloads of servers without validators.
+    """
+
+    def __init__(self, max_workers: int = None, timeout: int = None, state_path: str = None):
+        self.max_workers = config.PREFETCH_CONCURRENCY if max_workers is None else max_workers
+        self.timeout = config.PREFETCH_TIMEOUT if timeout is None else timeout
+        state_path = config.HTTP_STATE if state_path is None else state_path
+        self.state_store = HttpStateStore(state_path) if state_path else None
+        self.executor = None
+        self.futures = dict()
+        self.lock = threading.Lock()
+
+    def download(self, url: str, conditional: bool = False) -> Download:
+        headers = self.state_store.conditional_headers(url) if conditional and self.state_store else {}
+        logger.debug(f'Downloading: {url}')
+        response = requests.get(url, timeout=self.timeout, headers=headers)
+        if response.status_code == 304:
+            logger.debug(f'Not modified: {url}')
+            return Download(None, None, None)
+
+        response.raise_for_status()
+        return Download(response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def submit(self, urls: Iterable[str], conditional: bool = False):
+        if self.max_workers < 1:
+            return
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='prefetch')
+            for url in urls:
+                if url not in self.futures:
+                    self.futures[url] = self.executor.submit(self.download, url, conditional)
+
+    def result(self, url: str, conditional: bool = False) -> Download:
+        with self.lock:
+            future = self.futures.get(url)
+
+        if future is None:
+            future = Future()
+            future.set_result(self.download(url, conditional))
+            with self.lock:
+                self.futures.setdefault(url, future)
+        return future.result()
+
+    def get(self, url: str) -> BytesIO:
+        download = self.result(url)
+        if download.content is None:
+            # Unchanged, but the plugin reads it anyway
+            download = self.download(url)
+            future = Future()
+            future.set_result(download)
+            with self.lock:
+                self.futures[url] = future
+        return BytesIO(download.content)
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def is_modified(self, urls: Iterable[str], conditional: bool = True, compare_content: bool = False) -> bool:
+        if not self.state_store:
+            return True
+
+        modified = False
+        for url in urls:
+            download = self.result(url, conditional=conditional)
+            if download.content is None:
+                continue
+            if compare_content:
+                state = self.state_store.get(url)
+                if state and state['content_hash'] == self.content_hash(download.content):
+                    continue
+            modified = True
+        return modified
+
+    def save_state(self, urls: Iterable[str]):
+        # Validators are saved only once the downloaded data were processed
+        if not self.state_store:
+            return
+
+        for url in urls:
+            with self.lock:
+                future = self.futures.get(url)
+            if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                download = future.result()
+                if download.content is not None:
+                    self.state_store.set(url, download.etag, download.last_modified,
+                                         self.content_hash(download.content))
+
+    def release(self, urls: Iterable[str]):
+        with self.lock:
+            for url in urls:
+                future = self.futures.pop(url, None)
+                if future is not None:
+                    future.cancel()
+
+    def clear(self):
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+
+
+prefetcher = Prefetcher()
@@ -13,23 +13,41 @@
 # limitations under the License.
 
 import logging
+from typing import Dict, List
 from utils.adapter.data_adapter import DataAdapter
+from utils.config import config
 from utils.email import send_email
 from utils.types import FetcherType
 
 logger = logging.getLogger(__name__)
 
 
+def format_differences(differences: List[Dict]) -> str:
+    return "\n".join(f"{difference['date']}: {difference['staging_rows']} incoming rows, "
+                     f"{difference['existing_rows']} existing rows" for difference in differences)
+
+
 def validate_incoming_data(data_adapter: DataAdapter, fetcher_type: FetcherType, source_name: str):
     # TODO: Add fetcher type support, currently works only for epidemiology
-    compare_result = data_adapter.call_db_function_compare(source_name)
+    report = None
+    if config.VALIDATION_MODE == 'window':
+        # Only the dates of the incoming data are compared, the differences are reported by date
+        differences = data_adapter.call_db_function_compare_dates(source_name)
+        compare_result = len(differences)
+        if differences:
+            report = format_differences(differences)
+            logger.warning(f"Validation differences for {source_name}:\n{report}")
+    else:
+        compare_result = data_adapter.call_db_function_compare(source_name)
 
     if compare_result == 0:
-        data_adapter.call_db_function_send_data(source_name)
+        data_adapter.publish_staging(fetcher_type, source_name)
         return True
     else:
         subject = f"Covid19db fetchers-python validation error"
         message = f"Validation failed for {source_name}, please check"
+        if report:
+            message = f"{message}, dates which differ from the existing data:\n{report}"
         try:
             send_email(source_name, subject, message)
         except Exception as ex: